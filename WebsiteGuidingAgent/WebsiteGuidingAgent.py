@@ -1,68 +1,364 @@
 from bedrock_agentcore import BedrockAgentCoreApp
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from command_channel import CommandChannel, open_channels
+from connection_cache import ConnectionCache
+from history_compaction import HistoryCompactor, estimate_tokens
+from intent_router import RoutePlan
+from knowledge_index import load_site_knowledge
+from model_tiers import EscalationGuard, ModelTierRouter, TierAttempt, current_attempt
+from response_cache import ResponseCache
+from tracing import Trace, TracingHooks, current_trace, log, span
+from transport import client_config, model_client_config, run_io
+from turn_recorder import RecordingHooks, TurnRecording, current_recording, result_error
+from session_manager import SessionPool
+from site_map import UI_TOOL_ARGUMENTS
+from site_registry import SiteRegistry
 from strands import Agent, tool
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+from strands.models import BedrockModel
+from strands.tools.executors import SequentialToolExecutor
+import asyncio
 import boto3
+import contextvars
 import json
+import os
+import time
 
 
 app = BedrockAgentCoreApp()
 
-websocket_url = "https://zqkltcnh87.execute-api.us-east-1.amazonaws.com/development/"
+# Management API endpoint of the WebSocket API, with stage
+websocket_url = os.environ.get('WEBSOCKET_URL', "https://zqkltcnh87.execute-api.us-east-1.amazonaws.com/development/")
 
-if websocket_url:
-    apigateway_client = boto3.client(
-        'apigatewaymanagementapi',
-        endpoint_url=websocket_url,
-        region_name="us-east-1"
-    )
+# Clients are built at import, before the runtime serves its first request,
+# so no turn pays for endpoint and credential resolution.
+apigateway_client = boto3.client(
+    'apigatewaymanagementapi',
+    endpoint_url=websocket_url,
+    region_name=os.environ.get('WEBSOCKET_REGION', "us-east-1"),
+    config=client_config
+) if websocket_url else None
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = boto3.resource('dynamodb', config=client_config)
 connections_table = dynamodb.Table('WebSocketConnections')
+# clientId -> connections, keyed (clientId, connectionId). When configured,
+# lookups are strongly consistent single-partition queries instead of the
+# eventually consistent clientId-index GSI (see the websocket Lambdas README).
+client_connection_table_name = os.environ.get('CLIENT_CONNECTION_TABLE')
+client_connections_table = dynamodb.Table(client_connection_table_name) if client_connection_table_name else None
+# Connection rows expire (DynamoDB TTL on expiresAt) unless refreshed by activity
+connection_ttl_seconds = int(os.environ.get('CONNECTION_TTL_SECONDS', '3600'))
+
+# client_id of the invocation currently being served. Each entrypoint call
+# runs in its own context, so tools read the right client under concurrency.
+current_client_id = contextvars.ContextVar('client_id', default=None)
+# Command channel of the session being served, when pipelining is enabled
+current_channel = contextvars.ContextVar('command_channel', default=None)
+# (tool, args) of the UI commands dispatched by the model turn being served
+current_commands = contextvars.ContextVar('dispatched_commands', default=None)
+# Off while an intent-router plan runs: no model is waiting to read the outcome
+awaiting_acks = contextvars.ContextVar('awaiting_acks', default=True)
+# Site (see site_registry.Site) the invocation being served is for
+current_site = contextvars.ContextVar('site', default=None)
+
+# Queue UI commands on a per-session channel instead of awaiting each send
+command_pipelining = os.environ.get('AGENT_PIPELINE_COMMANDS', '1') != '0'
+
+# Wait for the browser to report whether each pipelined UI command worked
+# (see CommandChannel.wait_ack) before the tool returns to the model
+tool_acks_enabled = os.environ.get('AGENT_TOOL_ACKS', '1') != '0'
+tool_ack_timeout = int(os.environ.get('AGENT_TOOL_ACK_TIMEOUT_MS', '1500')) / 1000
+# Commands whose outcome depends on the page; pause and end are not waited on
+acked_tools = frozenset({'navigate_to_page', 'scroll_to_section', 'fill_input', 'click_element'})
+
+# Short-lived, so a tab opened without a ping (see warm_up) is reached within seconds
+connection_cache = ConnectionCache(
+    max_entries=1024, ttl_seconds=float(os.environ.get('AGENT_CONNECTION_CACHE_TTL', '5')))
+
+# Maximum concurrent posts when one message fans out to several tabs
+fanout_parallelism = int(os.environ.get('AGENT_FANOUT_PARALLELISM', '8'))
+
+# Strong references to fire-and-forget TTL refreshes until they finish
+ttl_refresh_tasks = set()
+
+async def lookup_connection_ids(client_id):
+    """
+    Resolve all WebSocket connectionIds of a client (one per open tab), using
+    the in-process cache before falling back to DynamoDB: a consistent query
+    on the client connections table when configured, otherwise the
+    clientId-index GSI.
+
+    Returns:
+        tuple: connectionIds, empty if the client is not connected
+    """
+    connection_ids = connection_cache.get(client_id)
+    if connection_ids:
+        return connection_ids
+
+    if client_connections_table is not None:
+        with span('dynamodb', op='query', consistent=True):
+            response = await run_io(
+                client_connections_table.query,
+                KeyConditionExpression=Key('clientId').eq(client_id),
+                ConsistentRead=True
+            )
+        # TTL deletion is lazy, so expired rows can still be returned
+        now = time.time()
+        items = [i for i in response['Items'] if int(i.get('expiresAt', now + 1)) > now]
+        refresh = [i['connectionId'] for i in items
+                   if int(i.get('expiresAt', 0)) - now < connection_ttl_seconds / 2]
+        if refresh:
+            task = asyncio.get_running_loop().create_task(refresh_connection_ttl(client_id, refresh))
+            ttl_refresh_tasks.add(task)
+            task.add_done_callback(ttl_refresh_tasks.discard)
+    else:
+        with span('dynamodb', op='query'):
+            response = await run_io(
+                connections_table.query,
+                IndexName='clientId-index',   # your GSI name
+                KeyConditionExpression=Key('clientId').eq(client_id)
+            )
+        items = response['Items']
+
+    connection_ids = tuple(item['connectionId'] for item in items)
+    if connection_ids:
+        connection_cache.put(client_id, connection_ids)
+    return connection_ids
+
+async def refresh_connection_ttl(client_id, connection_ids):
+    """
+    Push expiresAt forward on both rows of active connections. Runs in the
+    background and at most once per cache miss, for rows past half their TTL.
+    """
+    expires_at = int(time.time()) + connection_ttl_seconds
+    for connection_id in connection_ids:
+        # Both writes run to completion even when one fails
+        results = await asyncio.gather(
+            run_io(client_connections_table.update_item,
+                   Key={'clientId': client_id, 'connectionId': connection_id},
+                   UpdateExpression='SET expiresAt = :e',
+                   ConditionExpression='attribute_exists(connectionId)',
+                   ExpressionAttributeValues={':e': expires_at}),
+            run_io(connections_table.update_item,
+                   Key={'connectionId': connection_id},
+                   UpdateExpression='SET expiresAt = :e',
+                   ConditionExpression='attribute_exists(connectionId)',
+                   ExpressionAttributeValues={':e': expires_at}),
+            return_exceptions=True
+        )
+        for error in [r for r in results if isinstance(r, Exception)]:
+            # The connection went away meanwhile; nothing to refresh
+            log('connection_ttl_refresh_failed', client_id=client_id, connection_id=connection_id, error=str(error))
+
+def is_gone_error(error):
+    """True if post_to_connection failed because the connection no longer exists (410)."""
+    if not isinstance(error, ClientError):
+        return False
+    return (error.response.get('Error', {}).get('Code') == 'GoneException'
+            or error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 410)
+
+async def delete_stale_connection(client_id, connection_id):
+    """Remove the rows of a connection API Gateway reports as gone."""
+    try:
+        with span('dynamodb', op='delete_item'):
+            deletes = [run_io(connections_table.delete_item, Key={'connectionId': connection_id})]
+            if client_connections_table is not None:
+                deletes.append(run_io(client_connections_table.delete_item,
+                                      Key={'clientId': client_id, 'connectionId': connection_id}))
+            await asyncio.gather(*deletes)
+        log('stale_connection_deleted', client_id=client_id, connection_id=connection_id)
+    except Exception as e:
+        log('stale_connection_delete_failed', client_id=client_id, connection_id=connection_id, error=str(e))
+
+async def post_to_connections(client_id, connection_ids, data):
+    """
+    Post one frame to several connections concurrently, at most
+    fanout_parallelism at a time. Gone connections are deleted from the
+    connections table as part of the same pass.
+
+    Returns:
+        dict: connectionId -> 'sent', 'gone' or the error message
+    """
+    limit = asyncio.Semaphore(fanout_parallelism)
+
+    async def post(connection_id):
+        async with limit:
+            try:
+                with span('post_to_connection', connection_id=connection_id):
+                    await run_io(
+                        apigateway_client.post_to_connection,
+                        ConnectionId=connection_id,
+                        Data=data
+                    )
+                return 'sent'
+            except Exception as e:
+                if not is_gone_error(e):
+                    return str(e)
+        await delete_stale_connection(client_id, connection_id)
+        return 'gone'
+
+    outcomes = await asyncio.gather(*[post(c) for c in connection_ids])
+    return dict(zip(connection_ids, outcomes))
 
 async def send_message_to_client(client_id, message):
     """
     Send message from backend to frontend using clientId
     No custom route needed - direct API Gateway Management API call
+
+    The message is delivered to every live connection of the client (one per
+    open tab) in parallel. Connections that are gone (410) are deleted from
+    the table in the same pass. A gone connection means the cached list is
+    out of date (the tab may have reconnected), so the client's
+    connection_cache entry is invalidated and the message is sent once more
+    to connections a fresh DynamoDB lookup adds.
+
+    The blocking boto3 calls run on the shared I/O executor (see
+    transport.run_io) so concurrent tool calls and sessions don't serialize
+    on network I/O.
     
     Args:
         client_id: Target client ID (userId, deviceId, etc.)
         message_data: Message to send (dict)
     
     Returns:
-        dict: {'success': bool, 'error': str (optional)}
+        dict: {'success': bool, 'error': str (optional), 'delivered': int,
+            'connections': {connectionId: 'sent' | 'gone' | error}}.
+            success means at least one connection received the message.
     """
     
+    outcomes = {}
     try:
-        # 1. Lookup connectionId from DynamoDB
-        response = connections_table.query(
-            IndexName='clientId-index',   # your GSI name
-            KeyConditionExpression=Key('clientId').eq(client_id)
-        )
+        data = json.dumps(message).encode('utf-8')
+        # 1. Lookup connectionIds (cache, then DynamoDB)
+        connection_ids = await lookup_connection_ids(client_id)
+        for attempt in range(2):
+            pending = [c for c in connection_ids if c not in outcomes]
+            if not pending:
+                break
 
-        if not response['Items']:
-            return {
-                'success': False,
-                'error': f'Client {client_id} not found or not connected'
-            }
-        
-        connection_id = response['Items'][0]['connectionId']
-        print(f"Connection ID: {connection_id}")
-        # 4. Send message directly to connection
-        apigateway_client.post_to_connection(
-            ConnectionId=connection_id,
-            Data=json.dumps(message).encode('utf-8')
-        )
+            # 2. Send message directly to every connection not tried yet
+            results = await post_to_connections(client_id, pending, data)
+            outcomes.update(results)
+            gone = [c for c, outcome in results.items() if outcome == 'gone']
+            if not gone:
+                break
+            log('connection_gone', client_id=client_id, connection_ids=gone)
+            connection_cache.invalidate(client_id)
+            connection_ids = await lookup_connection_ids(client_id)
+
+        delivered = sum(1 for outcome in outcomes.values() if outcome == 'sent')
+        if delivered:
+            return {'success': True, 'delivered': delivered, 'connections': outcomes}
         
-        print(f"Message sent successfully to client {client_id}")
-        return {'success': True}
+        errors = [outcome for outcome in outcomes.values() if outcome not in ('sent', 'gone')]
+        error = errors[0] if errors else f'Client {client_id} not found or not connected'
+        log('send_failed', client_id=client_id, error=error, connections=outcomes)
+        return {'success': False, 'error': error, 'delivered': 0, 'connections': outcomes}
         
     except Exception as e:
-        print(f"Error sending message: {str(e)}")
+        log('send_failed', client_id=client_id, error=str(e))
         return {
             'success': False,
-            'error': str(e)
+            'error': str(e),
+            'delivered': 0,
+            'connections': outcomes
         }
 
+async def dispatch_command(message):
+    """
+    Deliver a UI command to the browser of the current invocation.
+
+    With pipelining the command is queued on the session's CommandChannel and
+    the tool returns without waiting for the WebSocket round trip; otherwise
+    it is sent directly. For page commands issued by the model, the tool then
+    awaits the browser's ack for up to tool_ack_timeout seconds: a command
+    the browser could not run (element not found) fails, and one it ran is
+    confirmed with the page the browser is on. Without an ack in time the
+    result stays unconfirmed, as without acks.
+
+    During a light-tier attempt the command is held on the attempt instead,
+    with an unconfirmed result, until the attempt has passed (see
+    send_held_commands).
+
+    Returns:
+        dict: {'success': bool, 'error': str (optional), 'confirmed': bool,
+            'location': str (optional)}
+    """
+    attempt = current_attempt.get()
+    if attempt is not None:
+        attempt.held.append(message)
+        result = {'success': True}
+    else:
+        result = await deliver_command(message)
+    commands = current_commands.get()
+    if commands is not None and result['success']:
+        commands.append((message['tool'], message.get('args', {})))
+    return result
+
+async def deliver_command(message):
+    """Send or queue one UI command and await its ack where one is expected (see dispatch_command)."""
+    channel = current_channel.get()
+    wait = (channel is not None and tool_acks_enabled and awaiting_acks.get()
+            and message['tool'] in acked_tools and channel.expects_acks)
+    if channel is not None:
+        result = channel.enqueue(message, ack=wait)
+    else:
+        result = await send_message_to_client(current_client_id.get(), message)
+    if wait and result['success']:
+        with span('tool_ack', tool=message['tool']):
+            ack = await channel.wait_ack(result['seq'], tool_ack_timeout)
+        if ack is None:
+            log('tool_ack_timeout', client_id=channel.client_id, tool=message['tool'], seq=result['seq'])
+        elif not ack.get('ok'):
+            log('tool_failed_in_browser', client_id=channel.client_id, tool=message['tool'], error=ack.get('error'))
+            result = {'success': False, 'error': ack.get('error') or 'The browser could not run the command'}
+        else:
+            result = dict(result, confirmed=True, location=ack.get('location'))
+    return result
+
+async def send_held_commands(attempt):
+    """
+    Deliver the UI commands of a light-tier attempt that passed its plan
+    checks, in order, each awaiting its ack as the tool would have. A command
+    that fails (in the browser or in delivery) fails the attempt with
+    'browser_error', so the turn is rerun on the full tier, which sees
+    failures in its tool results; the commands before it have run.
+    """
+    held, attempt.held = attempt.held, []
+    for message in held:
+        result = await deliver_command(message)
+        if not result['success']:
+            attempt.fail('browser_error')
+            return
+
+def ack_note(result):
+    """Tool result suffix for a command the browser confirmed."""
+    if not result.get('confirmed'):
+        return ""
+    location = result.get('location')
+    return f" (done, the user is now on {location})" if location else " (done)"
+
+def bind_channel(session, client_id):
+    """Return the session's command channel (None if pipelining is off)."""
+    if not command_pipelining:
+        return None
+    if session.channel is None or session.channel.client_id != client_id:
+        session.channel = CommandChannel(client_id, send_message_to_client)
+    return session.channel
+
+async def drain_channel(channel):
+    """
+    Returns:
+        str | None: the first delivery error of the turn, if any
+    """
+    if channel is not None:
+        error = await channel.drain()
+        if error:
+            log('command_delivery_failed', client_id=channel.client_id, error=error)
+        return error
+    return None
+
 @tool   
 async def navigate_to_page(path: str) -> str:
     """Navigate to a specified page.
@@ -70,9 +366,11 @@ async def navigate_to_page(path: str) -> str:
     Args:
         path: Path to navigate to
     """
-    result = await send_message_to_client(client_id, {"tool": "navigate_to_page", "args": {"path": path}})
+    result = active_site().site_map_index.check_path(path)
+    if result['success']:
+        result = await dispatch_command({"tool": "navigate_to_page", "args": {"path": path}})
     if result['success']:
-        return f"Navigating to {path}"
+        return f"Navigating to {path}{ack_note(result)}"
     else:
         return f"Error navigating to {path}: {result['error']}"
 
@@ -83,9 +381,11 @@ async def scroll_to_section(selector_id: str) -> str:
     Args:
         selector_id: Based on the ID mention in the knowledge base, select the section to scroll to
     """
-    result = await send_message_to_client(client_id, {"tool": "scroll_to_section", "args": {"selector_id":       selector_id}})
+    result = active_site().site_map_index.check_section(selector_id)
     if result['success']:
-        return f"Scrolling to section {selector_id}"
+        result = await dispatch_command({"tool": "scroll_to_section", "args": {"selector_id":       selector_id}})
+    if result['success']:
+        return f"Scrolling to section {selector_id}{ack_note(result)}"
     else:
         return f"Error scrolling to section {selector_id}: {result['error']}"
 
@@ -97,9 +397,11 @@ async def fill_input(selector: str, value: str) -> str:
         selector: CSS selector for the input element
         value: Value to fill in the input field
     """
-    result = await send_message_to_client(client_id, {"tool": "fill_input", "args": {"selector": selector, "value": value}})
+    result = active_site().site_map_index.check_selector(selector)
+    if result['success']:
+        result = await dispatch_command({"tool": "fill_input", "args": {"selector": selector, "value": value}})
     if result['success']:
-        return f"Filling input {selector} with value '{value}'"
+        return f"Filling input {selector} with value '{value}'{ack_note(result)}"
     else:
         return f"Error filling input {selector}: {result['error']}"
 
@@ -110,16 +412,18 @@ async def click_element(selector: str) -> str:
     Args:
         selector: CSS selector for the element to click
     """
-    result =  await send_message_to_client(client_id, {"tool": "click_element", "args": {"selector": selector}})
+    result = active_site().site_map_index.check_selector(selector)
+    if result['success']:
+        result = await dispatch_command({"tool": "click_element", "args": {"selector": selector}})
     if result['success']:
-        return f"Clicking element {selector}"
+        return f"Clicking element {selector}{ack_note(result)}"
     else:
         return f"Error clicking element {selector}: {result['error']}"
 
 @tool
 async def end_call() -> str:
     """End the current call/conversation."""
-    result = await send_message_to_client(client_id, {"tool": "end_call"})
+    result = await dispatch_command({"tool": "end_call"})
     if result['success']:
         return "Call ended successfully"
     else:
@@ -128,15 +432,40 @@ async def end_call() -> str:
 @tool
 async def pause_call() -> str:
     """Pause the current call/conversation."""
-    result = await send_message_to_client(client_id, {"tool": "pause_call"})
+    result = await dispatch_command({"tool": "pause_call"})
     if result['success']:
         return "Call paused successfully"
     else:
         return f"Error pausing call: {result['error']}"
 
-agent = Agent(
-    model="amazon.nova-pro-v1:0",
-    system_prompt="""You are a Digital Innovation Hub Website Guide designed to help users understand and explore the Digital Innovation Hub website features. You provide comprehensive guidance about website features, explain how they work, and help users navigate to relevant sections. You are operating in a Speech-to-Speech (STS) environment where your responses will be converted into speech, so keep them concise, natural, friendly, and engaging.
+agent_model = "amazon.nova-pro-v1:0"
+# Faster model for simple turns; see model_tiers.py
+light_model = os.environ.get('AGENT_LIGHT_MODEL', "amazon.nova-lite-v1:0")
+model_tiers_enabled = os.environ.get('AGENT_MODEL_TIERS', '1') != '0'
+# Bedrock model providers shared by all sessions, by model ID (built on first use)
+bedrock_models = {}
+
+def shared_model(model=None):
+    """
+    The model provider for a model ID (agent_model by default), shared by
+    every session's agent.
+
+    Passing a model ID to Agent builds a new BedrockModel, with its own boto3
+    session and Bedrock Runtime client, for every session. One provider per
+    model is built instead and reused, so new sessions skip client
+    construction and share its connection pool.
+    """
+    model = agent_model if model is None else model
+    if not isinstance(model, str):
+        return model
+    if model not in bedrock_models:
+        bedrock_models[model] = BedrockModel(model_id=model, boto_client_config=model_client_config)
+    return bedrock_models[model]
+
+def tier_model(tier):
+    return shared_model(light_model if tier == 'light' else agent_model)
+
+system_prompt_template = """You are a {site_name} Website Guide designed to help users understand and explore the {site_name} website features. You provide comprehensive guidance about website features, explain how they work, and help users navigate to relevant sections. You are operating in a Speech-to-Speech (STS) environment where your responses will be converted into speech, so keep them concise, natural, friendly, and engaging.
 
 **CRITICAL FOR STS ENVIRONMENT:**
 - Keep responses under 2-3 sentences maximum
@@ -184,185 +513,12 @@ agent = Agent(
 6. **pause_call()** → Pause the current call/conversation
 
 
-### Available Section IDs for Navigation
-When users want to navigate to specific sections, use these section IDs with the `scroll_to_section` tool:
-
-**Home Page (`/`):**
-- `hero` - Hero section with main CTA
-- `stats` - Company statistics
-- `features` - Why Choose Us section
-- `testimonials` - Client testimonials
-- `cta` - Call to action section
-- `featured-products` - Featured products section
-
-**Home Page Buttons:**
-- `#hero-cta-btn` - Get Started Today button
-- `#hero-learn-more-btn` - Learn More button
-- `#cta-start-trial-btn` - Start Free Trial button
-- `#cta-schedule-demo-btn` - Schedule Demo button
-
-**About Page (`/about`):**
-- `hero` - Hero section
-- `story` - Company story
-- `values` - Company values
-- `team` - Team members
-- `achievements` - Company achievements
-- `timeline` - Company timeline
-- `culture` - Company culture
-
-**About Page Buttons:**
-- `#learn-more-btn` - Learn More About Our Culture button
-
-**Services Page (`/services`):**
-- `hero` - Hero section
-- `services` - Services grid
-- `pricing` - Pricing plans
-- `process` - Our process
-- `success-stories` - Success stories
-- `cta` - Call to action
-
-**Services Page Buttons:**
-- `#contact-btn` - Get Started button (pricing plans)
-- `#services-get-quote-btn` - Get Free Quote button
-- `#services-schedule-consultation-btn` - Schedule Consultation button
-
-**Blog Page (`/blog`):**
-- `hero` - Hero section
-- `featured-posts` - Featured articles
-- `search-filter` - Search and filter
-- `blog-posts` - All articles
-- `newsletter` - Newsletter signup
-- `categories` - Popular categories
-
-**Blog Page Buttons:**
-- `#featured-read-more-btn` - Read More button (featured posts)
-- `#blog-read-more-btn` - Read More button (blog posts)
-- `#newsletter-subscribe-btn` - Subscribe button
-
-**Contact Page (`/contact`):**
-- `hero` - Hero section
-- `contact-form` - Contact form
-- `offices` - Office locations
-- `business-hours` - Business hours
-- `faq` - Frequently asked questions
-- `social-media` - Social media links
-
-**Contact Page Buttons:**
-- `#agent-submit` - Send Message button (contact form)
-
-### Navigation
-The website defines these valid paths:  
-- `/` → Home Page  
-- `/about` → About Page  
-- `/services` → Services Page  
-- `/blog` → Blog Page  
-- `/contact` → Contact Page  
-
-Only use these when navigating.  
-
----
-
-### Comprehensive Website Knowledge Base
-
-**Home Page (`/`)** - Digital Innovation Hub
-- Hero Section (ID: `hero`) with gradient background and main CTA: `.hero-cta-btn`
-- Company tagline: "Transform your business with cutting-edge technology solutions"
-- Stats Section (ID: `stats`): 10K+ Happy Customers, 99.9% Uptime, 50+ Countries, 24/7 Support
-- Features Section (ID: `features`): Fast Performance, Secure & Reliable, Mobile Ready, Modern Design
-- Testimonials Section (ID: `testimonials`): Sarah Johnson (CEO TechCorp), Michael Chen (Marketing Director), Emily Rodriguez (Small Business Owner)
-- Call-to-Action Section (ID: `cta`): "Ready to Get Started?" with Start Free Trial and Schedule Demo buttons
-- Featured Products Section (ID: `featured-products`): `.featured-products`
-  - Business Suite: Starting at $29/month (CRM, analytics, automation)
-  - E-commerce Platform: Starting at $49/month (online store management)
-  - Analytics Pro: Starting at $19/month (performance tracking)
-
-**About Page (`/about`)** - Company Information
-- Hero Section (ID: `hero`): Company introduction and mission overview
-- Company Story Section (ID: `story`): Founded in 2019, started as small team, now full-service digital agency
-- Mission: "To empower businesses through innovative digital solutions"
-- Values Section (ID: `values`): Innovation, Excellence, Collaboration, Growth
-- Team Section (ID: `team`): `.team`
-  - Sarah Johnson (CEO & Founder): 15+ years in tech innovation
-  - Michael Chen (CTO): Technical architect, AI/ML, Cloud expertise
-  - Emily Rodriguez (Head of Design): UX/UI, Branding, Product Design
-  - David Thompson (Lead Developer): React, Node.js, DevOps
-- Achievements Section (ID: `achievements`): 500+ Projects, 150+ Happy Clients, 5 Years Experience, 99% Client Satisfaction
-- Timeline Section (ID: `timeline`): 2019 Founded → 2020 First Major Client → 2021 Team Expansion → 2022 Award Recognition → 2023 Global Expansion → 2024 AI Integration
-- Company Culture Section (ID: `culture`): Flexible Work Environment, Continuous Learning, Open Communication
-- Mission Statement: `.mission`
-- Learn More Button: `.learn-more-btn`
-
-**Services Page (`/services`)** - Service Offerings
-- Hero Section (ID: `hero`): "We offer comprehensive range of digital services"
-- Services Section (ID: `services`): 6 Main Services:
-  1. Web Development: React & Vue.js, Node.js Backend ($2,500+)
-  2. Mobile App Development: iOS & Android, React Native, Flutter ($5,000+)
-  3. UI/UX Design: User Research, Wireframing, Prototyping ($1,500+)
-  4. Digital Consulting: Strategy Planning, Technology Audit ($150/hour)
-  5. E-commerce Solutions: Shopify & WooCommerce, Payment Integration ($3,000+)
-  6. Cloud & DevOps: AWS & Azure, CI/CD Pipelines ($2,000+)
-- Pricing Section (ID: `pricing`): Pricing Plans:
-  - Starter: $2,500 per project (5 pages, basic SEO, 1 month support)
-  - Professional: $7,500 per project (15 pages, advanced features, 3 months support) - Most Popular
-  - Enterprise: Custom quote (unlimited pages, dedicated PM, 6 months support)
-- Process Section (ID: `process`): Discovery & Planning → Design & Prototyping → Development → Testing & Launch
-- Success Stories Section (ID: `success-stories`):
-  - TechStart Inc: 300% increase in user engagement
-  - RetailPlus: 150% boost in online sales
-  - HealthCare Pro: 50,000+ app downloads
-- Call-to-Action Section (ID: `cta`): Contact CTA Button: `.contact-btn`
-
-**Blog Page (`/blog`)** - Content Hub
-- Hero Section (ID: `hero`): "Stay updated with latest trends, tutorials, and insights"
-- Blog Stats: 8+ Articles, 15,000+ Subscribers
-- Featured Posts Section (ID: `featured-posts`): Featured Articles (3):
-  - "Getting Started with React Hooks" by Sarah Johnson (Tutorial, 8 min read)
-  - "Modern CSS Grid Layout Techniques" by Emily Rodriguez (Design, 12 min read)
-  - "AI Integration in Web Development" by Sarah Johnson (Technology, 14 min read)
-- Search and Filter Section (ID: `search-filter`): Search Functionality: `#blog-search`
-- Categories: All, Development, Design, Tutorial, Business, Technology
-- Blog Posts Section (ID: `blog-posts`): All Articles Section: `.blog-article`
-- Article Categories:
-  - Development (2 articles): JavaScript ES2024, Node.js Performance
-  - Design (2 articles): Responsive Web Apps, UI/UX Trends 2024
-  - Tutorial (1 article): React Hooks
-  - Business (1 article): Startup Growth Strategies
-  - Technology (1 article): AI Integration
-- Newsletter Section (ID: `newsletter`): 15,000+ subscribers, weekly updates
-- Categories Section (ID: `categories`): Popular Categories: Development (💻), Design (🎨), Tutorial (📚), Business (💼), Technology (🔬)
-- Read More Button: `.read-more-btn`
-
-**Contact Page (`/contact`)** - Get in Touch
-- Hero Section (ID: `hero`): "Ready to start your next project? We'd love to hear from you"
-- Contact Form Section (ID: `contact-form`):
-  - Name Input: `#agent-name`
-  - Email Input: `#agent-email`
-  - Message Input: `#agent-message`
-  - Submit Button: `#agent-submit`
-- Contact Information:
-  - Email: hello@digitalinnovation.com
-  - Phone: +1 (555) 123-4567
-  - Headquarters: 123 Business St, San Francisco, CA 94105
-- Office Locations Section (ID: `offices`):
-  - San Francisco: 123 Tech Street, CA 94105 (+1 (555) 123-4567)
-  - New York: 456 Business Ave, NY 10001 (+1 (555) 234-5678)
-  - London: 789 Innovation Lane, UK EC1A 1AA (+44 20 7123 4567)
-- Business Hours Section (ID: `business-hours`):
-  - Monday-Friday: 9:00 AM - 6:00 PM
-  - Saturday: 10:00 AM - 4:00 PM
-  - Sunday: Closed
-  - Emergency Support: 24/7 (+1 (555) 911-TECH)
-- FAQ Section (ID: `faq`): 5 questions:
-  - Response time: 24 hours during business days
-  - Services: Web dev, mobile apps, UI/UX, consulting, e-commerce, cloud
-  - International clients: Yes, offices in SF, NY, London
-  - Project timeline: 2-4 weeks (simple) to 3-6 months (complex)
-  - Support: 1 month to 1 year packages
-- Social Media Section (ID: `social-media`):
-  - Twitter: @digitalinnovation
-  - LinkedIn: /company/digitalinnovation
-  - GitHub: /digitalinnovation
-  - Instagram: @digitalinnovation
+### Site Map and Knowledge
+The valid paths and section IDs of the website, and the site knowledge relevant to the user's current query, are listed at the end of these instructions under **Site Map** and **Relevant Site Knowledge**.
+- Only navigate to the listed paths
+- Only scroll to the listed section IDs of the page you are on (or navigating to)
+- Only click or fill the selectors listed in the relevant knowledge
+- Answer factual questions from the relevant knowledge; if it does not cover the question, say you're not sure rather than guessing
 
 ### Response Style for STS Environment
 - When users ask about features, explain the feature thoroughly AND navigate to the relevant page immediately
@@ -384,24 +540,552 @@ Only use these when navigating.
 - **For navigation**: Always combine explanations with actual navigation to relevant pages
 - **Visual Feedback Priority**: User must be able to see what's happening - never perform actions in hidden or off-screen elements
 - **Response Style**: Be engaging, to-the-point, and answer exactly what the user is asking
-""",
-        tools=[navigate_to_page, scroll_to_section, fill_input, click_element, end_call, pause_call]
+"""
+
+# Each site's knowledge is one JSON file, named by the "site" key of the
+# payload. Only the site map and the sections relevant to the current query
+# are sent with each turn. The default site is site_knowledge.json; others
+# are read from AGENT_SITES_DIR, then from AGENT_SITES_BUCKET in S3.
+default_site_key = os.environ.get('AGENT_DEFAULT_SITE', 'default')
+default_knowledge_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'site_knowledge.json')
+sites_dir = os.environ.get('AGENT_SITES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sites'))
+sites_bucket = os.environ.get('AGENT_SITES_BUCKET')
+sites_prefix = os.environ.get('AGENT_SITES_PREFIX', 'sites/')
+s3_client = boto3.client('s3', config=client_config) if sites_bucket else None
+
+def load_site(key):
+    """
+    Read the knowledge of one site. Blocking; SiteRegistry calls it on the
+    I/O executor, with key already checked against SITE_KEY_PATTERN.
+
+    Returns:
+        dict | None: None if no site has this key
+    """
+    if key == default_site_key:
+        return load_site_knowledge(default_knowledge_path)
+    path = os.path.join(sites_dir, f'{key}.json')
+    if os.path.exists(path):
+        return load_site_knowledge(path)
+    if s3_client is None:
+        return None
+    try:
+        response = s3_client.get_object(Bucket=sites_bucket, Key=f'{sites_prefix}{key}.json')
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(response['Body'].read())
+
+# Compiled prompt, retrieval index, tool-argument validators and intent router
+# per site, compiled on a site's first request. The default site is compiled
+# at import and never evicted.
+site_registry = SiteRegistry(
+    load_site, system_prompt_template,
+    max_sites=int(os.environ.get('AGENT_MAX_SITES', '64')),
+    pinned=[default_site_key]
+)
+default_site = site_registry.get(default_site_key)
+
+def active_site():
+    """The site of the invocation being served, or the default site outside one."""
+    return current_site.get() or default_site
+
+def check_tool_call(name, args):
+    """
+    Check a planned tool call without running it or counting it in the
+    validation stats.
+
+    Returns:
+        str | None: 'unknown_tool', 'missing_argument' or 'invalid_<kind>',
+            None if the call is valid
+    """
+    if name not in tools_by_name:
+        return 'unknown_tool'
+    if name not in UI_TOOL_ARGUMENTS:
+        return None
+    argument, kind = UI_TOOL_ARGUMENTS[name]
+    value = args.get(argument)
+    if not value:
+        return 'missing_argument'
+    return None if active_site().site_map_index.contains(kind, value) else f'invalid_{kind}'
+
+# Number of knowledge snippets per turn; 0 inlines the whole knowledge base
+knowledge_top_k = int(os.environ.get('AGENT_KNOWLEDGE_TOP_K', '4'))
+
+def build_system_prompt(site, query, location=None):
+    """
+    The site's base instructions plus its site map and the knowledge snippets
+    relevant to this query and the user's current page.
+    """
+    index = site.knowledge_index
+    if knowledge_top_k > 0:
+        with span('retrieval'):
+            knowledge = index.render(index.search(query, location, knowledge_top_k))
+    else:
+        knowledge = index.render_all()
+    return (
+        f"{site.system_prompt}\n### Site Map\n{site.site_map}\n\n"
+        f"### Relevant Site Knowledge\n{knowledge or 'No specific site knowledge matched this query.'}\n"
     )
+
+agent_tools = [navigate_to_page, scroll_to_section, fill_input, click_element, end_call, pause_call]
+tools_by_name = {t.tool_name: t for t in agent_tools}
+
+# Simple navigation / pause / end commands are answered without the model,
+# by the site's intent router
+router_enabled = os.environ.get('AGENT_INTENT_ROUTER', '1') != '0'
+
+# Answers to repeated factual questions, replayed without the model
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get('AGENT_RESPONSE_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.environ.get('AGENT_RESPONSE_CACHE_TTL_SECONDS', '3600'))
+)
+response_cache_enabled = os.environ.get('AGENT_RESPONSE_CACHE', '1') != '0'
+
+# Log each turn's query, location and tool calls as a "turn_recording" line,
+# for replay and tool-efficiency scoring (benchmarks/bench_tool_efficiency.py).
+# Off by default: recordings hold what users typed.
+record_turns = os.environ.get('AGENT_RECORD_TURNS', '0') != '0'
+
+# Light or full model tier per model turn
+model_tier_router = ModelTierRouter(
+    max_light_words=int(os.environ.get('AGENT_LIGHT_MAX_WORDS', '20'))
+)
+
+def create_agent():
+    """Build a fresh Strands agent with the site guide prompt and UI tools."""
+    return Agent(
+        model=shared_model(),
+        system_prompt=build_system_prompt(default_site, ""),
+        tools=agent_tools,
+        # UI commands must reach the browser in the order the model issued them
+        # (navigate -> scroll -> click/fill). Now that sends no longer block the
+        # event loop, concurrent execution could reorder them.
+        tool_executor=SequentialToolExecutor(),
+        # Bound per-session history so memory and per-turn tokens stay flat
+        conversation_manager=new_conversation_manager(),
+        # Span per model hop and per tool call on the current turn's trace;
+        # light-tier attempts stop at their first invalid tool plan
+        hooks=[TracingHooks(), EscalationGuard(check_tool_call), RecordingHooks()],
+        # No stdout echo of streamed text; logs stay one JSON record per line
+        callback_handler=None
+    )
+
+# One agent conversation per session, bounded in count, idle age and history.
+max_history_messages = int(os.environ.get('AGENT_HISTORY_MESSAGES', '20'))
+# Old exchanges are folded into a state summary (see history_compaction.py);
+# AGENT_HISTORY_COMPACTION=0 falls back to a sliding window of messages
+history_compaction_enabled = os.environ.get('AGENT_HISTORY_COMPACTION', '1') != '0'
+history_exchanges = int(os.environ.get('AGENT_HISTORY_EXCHANGES', '3'))  # kept verbatim
+history_token_budget = int(os.environ.get('AGENT_HISTORY_TOKEN_BUDGET', '1200'))  # estimated input tokens
+
+def new_conversation_manager():
+    if history_compaction_enabled:
+        return HistoryCompactor(keep_exchanges=history_exchanges, token_budget=history_token_budget)
+    return SlidingWindowConversationManager(window_size=max_history_messages)
+
+session_pool = SessionPool(
+    create_agent,
+    max_sessions=int(os.environ.get('AGENT_MAX_SESSIONS', '200')),
+    idle_timeout=float(os.environ.get('AGENT_SESSION_IDLE_SECONDS', '900'))
+)
     
+def log_turn_metrics(site):
+    log('turn_metrics', site=site.key, sessions=session_pool.metrics(), router=site.intent_router.stats(),
+        model_tiers=model_tier_router.stats(), response_cache=response_cache.stats(),
+        connection_cache=connection_cache.stats(), tool_args=site.site_map_index.stats(),
+        sites=site_registry.stats())
+
+def reply_text(message):
+    return ''.join(block.get('text', '') for block in message.get('content', []))
+
+def cache_answer(site, query, location, message, commands, model_seconds, trace):
+    """Offer a completed model turn to the response cache."""
+    if response_cache.put(site.key, query, location, reply_text(message), commands, model_seconds,
+                          site.knowledge_hash):
+        trace.attrs['cache'] = 'stored'
+
+def record_turn(site, recording, message, **attrs):
+    """Log a turn's recording (see turn_recorder.py) with its tool-efficiency score."""
+    score = site.tool_scorer.score_turn(recording.tool_calls, recording.location, recording.model_hops)
+    log('turn_recording', **recording.to_record(reply=reply_text(message), score=score, **attrs))
+
+def compact_history(agent, trace):
+    """
+    Compaction stage of a model turn: fold old exchanges into the state
+    summary before the turn's history is sent (and before a light-tier
+    attempt snapshots it).
+    """
+    manager = agent.conversation_manager
+    if isinstance(manager, HistoryCompactor):
+        with span('compaction'):
+            folded = manager.compact(agent)
+        if folded:
+            trace.attrs['compacted_exchanges'] = folded
+    trace.attrs['history_tokens'] = estimate_tokens(agent.messages)
+
+def discard_attempt(agent, history, attempt, trace):
+    """Drop a failed light-tier attempt from the conversation before the full-tier rerun."""
+    agent.messages[:] = history
+    # Only the full tier's commands describe the answer (see cache_answer)
+    commands = current_commands.get()
+    if commands is not None:
+        commands.clear()
+    recording = current_recording.get()
+    if recording is not None:
+        recording.discard()
+    model_tier_router.record_escalation(attempt.failure)
+    trace.attrs['escalation'] = attempt.failure
+    log('model_tier_escalated', reason=attempt.failure)
+
+async def run_model_turn(session, user_message, tier, trace):
+    """
+    Run a model turn on the given tier. A light-tier attempt that does not
+    produce a valid tool plan (see model_tiers.EscalationGuard) is removed
+    from the conversation and the turn is rerun on the full tier. The
+    attempt's UI commands are held until it has passed, so none of an
+    attempt that fails its plan checks reaches the browser; a passed attempt
+    whose command the browser could not run is rerun too (see
+    send_held_commands).
+
+    Returns:
+        tuple: (AgentResult, outcome), outcome is 'light', 'full' or 'escalated'
+    """
+    agent = session.agent
+    compact_history(agent, trace)
+    if tier == 'light':
+        history = list(agent.messages)
+        attempt = TierAttempt()
+        token = current_attempt.set(attempt)
+        agent.model = tier_model('light')
+        try:
+            result = await agent.invoke_async(user_message)
+        except Exception as e:
+            attempt.fail('model_error')
+            log('light_tier_failed', error=str(e))
+        finally:
+            current_attempt.reset(token)
+        if attempt.failure is None:
+            await send_held_commands(attempt)
+        if attempt.failure is None:
+            return result, 'light'
+        discard_attempt(agent, history, attempt, trace)
+    agent.model = tier_model('full')
+    return await agent.invoke_async(user_message), 'escalated' if tier == 'light' else 'full'
+
+async def stream_model_turn(session, user_message, tier, trace, turn):
+    """
+    Streaming counterpart of run_model_turn. Yields {"text": chunk} and a
+    final {"result": AgentResult}; the outcome is stored in turn['outcome'].
+
+    Light-tier text is held until the whole attempt has passed: every model
+    response has passed the plan check and the held commands have run (see
+    send_held_commands). It is then released at once, so nothing of an
+    attempt that escalates is spoken. Full-tier text streams as it arrives.
+    """
+    agent = session.agent
+    compact_history(agent, trace)
+    if tier == 'light':
+        history = list(agent.messages)
+        attempt = TierAttempt()
+        token = current_attempt.set(attempt)
+        agent.model = tier_model('light')
+        text, result = '', None
+        try:
+            async for event in agent.stream_async(user_message):
+                if "data" in event:
+                    text += event["data"]
+                elif "result" in event:
+                    result = event["result"]
+        except Exception as e:
+            attempt.fail('model_error')
+            log('light_tier_failed', error=str(e))
+        finally:
+            current_attempt.reset(token)
+        if attempt.failure is None:
+            await send_held_commands(attempt)
+        if attempt.failure is None:
+            if text:
+                yield {"text": text}
+            turn['outcome'] = 'light'
+            yield {"result": result}
+            return
+        discard_attempt(agent, history, attempt, trace)
+    agent.model = tier_model('full')
+    async for event in agent.stream_async(user_message):
+        if "data" in event:
+            yield {"text": event["data"]}
+        elif "result" in event:
+            turn['outcome'] = 'escalated' if tier == 'light' else 'full'
+            yield {"result": event["result"]}
+
+async def run_route_plan(session, user_message, plan):
+    """
+    Execute an intent-router plan directly, without calling the model.
+
+    Returns:
+        dict: assistant message with the templated spoken reply
+    """
+    reply = plan.reply
+    recording = current_recording.get()
+    acks_token = awaiting_acks.set(False)
+    try:
+        async with session.lock:
+            for name, args in plan.commands:
+                tool_started = time.perf_counter()
+                with span('tool', tool=name):
+                    result = await tools_by_name[name](**args)
+                if recording is not None:
+                    recording.add_tool_call(name, args, result_error(result), tool_started,
+                                            source='cache' if plan.intent == 'cache' else 'router')
+                if result.startswith("Error"):
+                    reply = "Sorry, I couldn't do that right now. Please try again."
+                    break
+            # Keep the exchange in the conversation so follow-up turns have context
+            session.agent.messages.extend([
+                {"role": "user", "content": [{"text": user_message}]},
+                {"role": "assistant", "content": [{"text": reply}]}
+            ])
+            await drain_channel(current_channel.get())
+            session_pool.record_turn(session)
+    finally:
+        awaiting_acks.reset(acks_token)
+    return {"role": "assistant", "content": [{"text": reply}]}
+
+def finish_failed_turn(trace, error, **attrs):
+    """Emit the trace of a turn that raised ('error') or was cancelled ('cancelled')."""
+    status = 'error' if isinstance(error, Exception) else 'cancelled'
+    trace.finish(status=status, error=str(error) or type(error).__name__, **attrs)
+
+async def stream_turn(session, client_id, site, user_message, turn_prompt, tier, cache_key, started, trace,
+                      recording):
+    """
+    Run one turn and yield the reply incrementally.
+
+    Yields:
+        dict: {"text": chunk} for every text delta from the model, then a
+            final {"result": message} with the complete assistant message
+    """
+    # Async generators run in the per-invocation context the runtime creates,
+    # so the binding lasts exactly as long as this turn.
+    current_client_id.set(client_id)
+    current_site.set(site)
+    current_trace.set(trace)
+    current_recording.set(recording)
+    # Commands are recorded for the response cache when cache_key (query, location) is set
+    commands = [] if cache_key else None
+    current_commands.set(commands)
+    result = None
+    turn = {}
+    try:
+        async with session.lock:
+            channel = bind_channel(session, client_id)
+            current_channel.set(channel)
+            session.agent.system_prompt = turn_prompt
+            model_started = time.perf_counter()
+            async for event in stream_model_turn(session, user_message, tier, trace, turn):
+                if "text" in event:
+                    yield event
+                else:
+                    result = event["result"]
+            model_seconds = time.perf_counter() - model_started
+            model_tier_router.record_latency(turn['outcome'], model_seconds)
+            delivery_error = await drain_channel(channel)
+            session_pool.record_turn(session)
+    except BaseException as e:
+        # Also a client that stopped reading the stream (GeneratorExit)
+        finish_failed_turn(trace, e, path='model', stream=True, tier=turn.get('outcome'))
+        raise
+
+    if commands is not None and not delivery_error:
+        cache_answer(site, *cache_key, result.message, commands, model_seconds, trace)
+    elapsed = time.perf_counter() - started
+    site.intent_router.record_latency('model', elapsed)
+    trace.finish(path='model', stream=True, tier=turn['outcome'], status='ok')
+    if recording is not None:
+        record_turn(site, recording, result.message, path='model', tier=turn['outcome'],
+                    duration_ms=round(elapsed * 1000, 1))
+    log_turn_metrics(site)
+    yield {"result": result.message}
+
+async def warm_connection(call, **kwargs):
+    """Make one cheap request so the client's pool holds an open connection."""
+    try:
+        await run_io(call, **kwargs)
+    except ClientError:
+        # Any response from the service means the connection is up
+        pass
+    except Exception as e:
+        log('warm_up_failed', operation=getattr(call, '__name__', str(call)), error=str(e))
+
+async def warm_up(session_id):
+    """
+    Prepare this container and session for a first turn without calling the
+    model: build the shared model client and the session's agent, and open
+    connections to DynamoDB and the Management API.
+
+    Returns:
+        dict: {"status": "warm", "init_ms": float, "session_created": bool}
+    """
+    started = time.perf_counter()
+    created_before = session_pool.created
+    session_pool.get(session_id)
+    created = session_pool.created > created_before
+    if model_tiers_enabled:
+        tier_model('light')
+    table = client_connections_table if client_connections_table is not None else connections_table
+    calls = [warm_connection(table.query, KeyConditionExpression=Key('clientId').eq('warm-up'), Limit=1,
+                             **({} if table is client_connections_table else {'IndexName': 'clientId-index'}))]
+    if apigateway_client is not None:
+        calls.append(warm_connection(apigateway_client.get_connection, ConnectionId='warm-up'))
+    await asyncio.gather(*calls)
+    init_ms = round((time.perf_counter() - started) * 1000, 1)
+    log('warm_up', session_id=session_id, init_ms=init_ms, session_created=created)
+    return {"status": "warm", "init_ms": init_ms, "session_created": created}
+
+def acknowledge_command(payload):
+    """
+    Hand a browser ack, relayed by the WebSocket ack route, to the tool
+    waiting for it. Runs outside the session lock, which the waiting turn holds.
+
+    Returns:
+        dict: {"status": "acked" | "late" | "unknown_channel"}; late means no
+            tool was waiting any more (timed out or already acked by another tab)
+    """
+    channel_id, seq = payload.get("channel"), payload.get("seq")
+    # The ack comes from the browser: a channel or seq of the wrong type is malformed
+    if not isinstance(channel_id, str) or not isinstance(seq, int) or isinstance(seq, bool):
+        return {"status": "unknown_channel"}
+    channel = open_channels.get(channel_id)
+    if channel is None or channel.client_id != payload.get("client_id"):
+        return {"status": "unknown_channel"}
+    ack = {"ok": bool(payload.get("ok")), "error": payload.get("error"), "location": payload.get("location")}
+    return {"status": "acked" if channel.acknowledge(seq, ack) else "late"}
+
 @app.entrypoint
-def invoke(payload):
-    """Your AI agent function with memory"""
-    global client_id
+async def invoke(payload, context):
+    """Your AI agent function with memory
+
+    The calling client_id is bound to a context variable for the duration of
+    the turn, so tools running for this invocation always address this
+    client's browser even while other invocations are in flight. The
+    conversation is looked up by runtimeSessionId (or client_id) in
+    session_pool, separately per site.
 
+    "site" in the payload picks the website (default_site_key if absent);
+    its prompt, knowledge, validators and router come from site_registry.
+    Simple navigation, pause and end commands are served by the site's
+    intent router without a model call, and repeated factual questions by response_cache
+    (replaying the UI commands of the cached answer). Other turns go to the
+    light or the full model tier as model_tier_router decides, escalating to
+    the full tier when the light one does not produce a valid tool plan.
+    With "stream": true in the payload the reply of a model turn is returned
+    as an async generator (served as server-sent events) instead of a single
+    JSON body.
+
+    {"action": "ping"} only warms the container, the site and the session
+    (see warm_up); the model is not called. {"action": "ack"} carries the
+    browser's result for a UI command (see acknowledge_command).
+    """
+    started = time.perf_counter()
     client_id = payload.get("client_id")
     user_message = payload.get("prompt", "Hello! How can I help you today?")
-    
-    
-    # Create agent with session manager
-    # Process the user message
-    result = agent(user_message)
-    
-    return {"result": result.message}
+    query = payload.get("query") or user_message
+    location = payload.get("location")
+    session_id = getattr(context, 'session_id', None) or client_id
+    if payload.get("action") == "ack":
+        return acknowledge_command(payload)
+    site_key = payload.get("site") or default_site_key
+    site = None
+    # Anything but a string (e.g. a list or a number from a malformed payload) names no site
+    if isinstance(site_key, str):
+        # Compiling a site on its first request blocks, so it runs off the event loop
+        site = site_registry.lookup(site_key) or await run_io(site_registry.get, site_key)
+    if site is None:
+        log('unknown_site', client_id=client_id, site=site_key)
+        return {"error": f"Unknown site: {site_key}"}
+    if site.key != default_site_key:
+        session_id = f'{session_id}@{site.key}'
+    if payload.get("action") == "ping":
+        # Sent when a tab opens its WebSocket: its connection is not cached yet
+        connection_cache.invalidate(client_id)
+        return await warm_up(session_id)
+    session = session_pool.get(session_id)
+    # trace_id is set by the invocation Lambda so both sides of a turn correlate
+    trace = Trace('agent_turn', trace_id=payload.get("trace_id"), client_id=client_id, session_id=session_id,
+                  site=site.key)
+    trace_token = current_trace.set(trace)
+    recording = TurnRecording(query, location) if record_turns else None
+
+    plan = cached = None
+    try:
+        with span('router'):
+            plan = site.intent_router.route(query, location) if router_enabled and payload.get("query") else None
+        caching = response_cache_enabled and bool(payload.get("query"))
+        if plan is None and caching:
+            with span('response_cache'):
+                cached = response_cache.get(site.key, query, location, site.knowledge_hash)
+            if cached is not None:
+                plan = RoutePlan('cache', cached.commands, cached.reply)
+                trace.attrs['cache'] = 'hit'
+        tier = None
+        if plan is None:
+            tier, tier_reason = model_tier_router.route(query) if model_tiers_enabled else ('full', 'disabled')
+            trace.attrs['tier_reason'] = tier_reason
+        if plan is None and payload.get("stream"):
+            turn_prompt = build_system_prompt(site, query, location)
+            cache_key = (query, location) if caching else None
+            return stream_turn(session, client_id, site, user_message, turn_prompt, tier, cache_key, started, trace,
+                               recording)
+
+        token = current_client_id.set(client_id)
+        site_token = current_site.set(site)
+        channel_token = current_channel.set(bind_channel(session, client_id))
+        commands = [] if caching and plan is None else None
+        commands_token = current_commands.set(commands)
+        recording_token = current_recording.set(recording)
+        try:
+            if plan is not None:
+                message = await run_route_plan(session, user_message, plan)
+            else:
+                # Process the user message
+                async with session.lock:
+                    session.agent.system_prompt = build_system_prompt(site, query, location)
+                    model_started = time.perf_counter()
+                    result, outcome = await run_model_turn(session, user_message, tier, trace)
+                    model_seconds = time.perf_counter() - model_started
+                    model_tier_router.record_latency(outcome, model_seconds)
+                    trace.attrs['tier'] = outcome
+                    delivery_error = await drain_channel(current_channel.get())
+                    session_pool.record_turn(session)
+                message = result.message
+                if commands is not None and not delivery_error:
+                    cache_answer(site, query, location, message, commands, model_seconds, trace)
+        finally:
+            current_recording.reset(recording_token)
+            current_commands.reset(commands_token)
+            current_channel.reset(channel_token)
+            current_site.reset(site_token)
+            current_client_id.reset(token)
+    except BaseException as e:
+        finish_failed_turn(trace, e, path='cache' if cached is not None else 'router' if plan else 'model')
+        raise
+    else:
+        elapsed = time.perf_counter() - started
+        if cached is not None:
+            response_cache.record_saving(cached, elapsed)
+            path = 'cache'
+        else:
+            path = 'router' if plan else 'model'
+            site.intent_router.record_latency(path, elapsed)
+        trace.finish(path=path, status='ok')
+        if recording is not None:
+            record_turn(site, recording, message, path=path, tier=trace.attrs.get('tier'),
+                        duration_ms=round(elapsed * 1000, 1))
+        log_turn_metrics(site)
+        return {"result": message}
+    finally:
+        current_trace.reset(trace_token)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import asyncio
+import uuid
+import weakref
+
+# channel_id -> live CommandChannel, so browser acks can be routed back
+open_channels = weakref.WeakValueDictionary()
+
+
+class CommandChannel:
+    """
+    Per-session, ordered UI command channel to one browser.
+
+    Tools enqueue commands and return immediately instead of awaiting their
+    own post_to_connection. Each command gets a monotonically increasing
+    sequence number. A single background flush loop per channel sends
+    everything pending as one batched WebSocket frame:
+
+        {"channel": "<id>", "commands": [{"seq": 1, "tool": ..., "args": ...}, ...]}
+
+    Frames are sent one at a time, so commands leave in sequence order.
+    Commands queued while a frame is in flight go out together in the next
+    frame. The frontend applies commands in seq order and uses the channel id
+    to detect a new sequence after the session was recreated.
+
+    A command enqueued with ack=True can be awaited with wait_ack: after
+    running it, the browser reports {"ok", "error", "location"} for
+    (channel, seq), which acknowledge() hands to the waiting tool. Waiting
+    is bounded by a timeout. A browser that has never acknowledged anything
+    on this channel is not waited on again after its first timeout.
+    """
+
+    def __init__(self, client_id, send, linger=0.005):
+        """
+        Args:
+            client_id: Target client ID
+            send: async callable (client_id, message) -> {'success': bool, 'error': str}
+            linger: Seconds to wait before the first flush so commands issued
+                back to back in one model hop share a frame
+        """
+        self.client_id = client_id
+        self.channel_id = uuid.uuid4().hex[:12]
+        self.linger = linger
+        self._send = send
+        self._next_seq = 1
+        self._pending = []
+        self._flusher = None
+        self.error = None
+        self.frames_sent = 0
+        self.commands_sent = 0
+        # seq -> future resolved by acknowledge()
+        self._acks = {}
+        self.acks_received = 0
+        self.ack_timeouts = 0
+        self.late_acks = 0
+        open_channels[self.channel_id] = self
+
+    @property
+    def expects_acks(self):
+        """False once the browser has let an ack time out without ever sending one."""
+        return self.acks_received > 0 or self.ack_timeouts == 0
+
+    def enqueue(self, command, ack=False):
+        """
+        Queue a command for delivery without waiting for the network.
+
+        Args:
+            command: {"tool": ..., "args": ...}
+            ack: Expect a browser ack for this command (see wait_ack)
+
+        Returns:
+            dict: {'success': True, 'seq': int}, or {'success': False, 'error': str}
+                if an earlier flush in this turn already failed
+        """
+        if self.error:
+            return {'success': False, 'error': self.error}
+        command = dict(command, seq=self._next_seq)
+        self._next_seq += 1
+        self._pending.append(command)
+        if ack:
+            self._acks[command['seq']] = asyncio.get_running_loop().create_future()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+        return {'success': True, 'seq': command['seq']}
+
+    async def _flush_loop(self):
+        if self.linger:
+            await asyncio.sleep(self.linger)
+        while self._pending:
+            batch, self._pending = self._pending, []
+            result = await self._send(self.client_id, {'channel': self.channel_id, 'commands': batch})
+            self.frames_sent += 1
+            if not result['success']:
+                # Later enqueues in this turn report the failure to the model
+                self.error = result['error']
+                self._pending = []
+                # Nothing will come back for commands that never left
+                for seq in list(self._acks):
+                    self._resolve(seq, {'ok': False, 'error': self.error})
+                return
+            self.commands_sent += len(batch)
+
+    async def drain(self):
+        """
+        Wait until every queued command has been delivered (or failed).
+
+        Returns:
+            str | None: the delivery error of this turn, if any. The error is
+                cleared so the next turn starts fresh.
+        """
+        if self._flusher is not None:
+            await self._flusher
+        error, self.error = self.error, None
+        return error
+
+    async def wait_ack(self, seq, timeout):
+        """
+        Wait for the browser's ack of command seq without blocking the loop.
+
+        Returns:
+            dict | None: {"ok": bool, "error": str, "location": str} as sent by
+                the browser, or None if none arrived within timeout seconds
+        """
+        future = self._acks.get(seq)
+        if future is None:
+            return None
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.ack_timeouts += 1
+            return None
+        finally:
+            self._acks.pop(seq, None)
+
+    def acknowledge(self, seq, ack):
+        """
+        Deliver a browser ack. Must be called on the event loop of the turn.
+
+        Returns:
+            bool: True if a tool was waiting for it
+        """
+        self.acks_received += 1
+        if self._resolve(seq, ack):
+            return True
+        self.late_acks += 1
+        return False
+
+    def _resolve(self, seq, ack):
+        future = self._acks.get(seq)
+        if future is None or future.done():
+            return False
+        future.set_result(ack)
+        return True
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ConnectionCache:
+    """
+    In-process clientId -> connectionIds cache with a size cap and TTL.
+
+    Every tool call needs the WebSocket connections of the calling client (one
+    per open tab). Resolving them through the clientId-index GSI on every call
+    costs one DynamoDB round trip per tool, so recent lookups are kept here as
+    tuples of connectionIds and evicted least-recently-used once max_entries
+    is reached.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, client_id):
+        """
+        Return the cached connectionIds for client_id, or None on a miss.
+        Expired entries count as misses and are dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is not None:
+                connection_ids, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(client_id)
+                    self.hits += 1
+                    return connection_ids
+                del self._entries[client_id]
+            self.misses += 1
+            return None
+
+    def put(self, client_id, connection_ids):
+        with self._lock:
+            self._entries[client_id] = (tuple(connection_ids), time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(client_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, client_id):
+        with self._lock:
+            if self._entries.pop(client_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: hit/miss counters, hit ratio and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries)
+            }
@@ -0,0 +1,189 @@
+import json
+import re
+from collections import deque
+
+from strands.agent.conversation_manager import ConversationManager
+from strands.types.exceptions import ContextWindowOverflowException
+
+
+# Marks the text block that carries the state summary in the first kept message
+SUMMARY_HEADER = "[Earlier in this conversation]"
+PROMPT_PATTERN = re.compile(r"^User's query: (.*)\. Location: (.*)$", re.DOTALL)
+
+
+def estimate_tokens(messages):
+    """Rough input size of a message list: four characters per token of its JSON."""
+    return len(json.dumps(messages, default=str)) // 4
+
+
+def is_prompt(message):
+    """True for a user message that starts an exchange (not a batch of tool results)."""
+    return message['role'] == 'user' and not any('toolResult' in block for block in message['content'])
+
+
+def clip(text, limit):
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+def describe_action(name, args):
+    """Short past-tense note for a UI command that succeeded, or None for tools not worth keeping."""
+    if name == 'navigate_to_page':
+        return f"navigated to {args.get('path')}"
+    if name == 'scroll_to_section':
+        return f"scrolled to {args.get('selector_id')}"
+    if name == 'fill_input':
+        return f"filled {args.get('selector')} with '{args.get('value')}'"
+    if name == 'click_element':
+        return f"clicked {args.get('selector')}"
+    if name == 'pause_call':
+        return 'paused the call'
+    if name == 'end_call':
+        return 'ended the call'
+    return None
+
+
+class HistoryCompactor(ConversationManager):
+    """
+    Conversation manager that keeps voice-session history flat.
+
+    The last keep_exchanges exchanges (a user prompt and everything the agent
+    did for it) stay verbatim. Older ones are folded into a short state
+    summary: the page the user ended up on, the last max_actions UI
+    commands that succeeded, and a clipped note of the last max_notes
+    question/answer pairs. Their tool-call/tool-result pairs are dropped.
+    The summary is the first text block of the first kept user message, so
+    roles still alternate. If the history is still over token_budget
+    (estimated input tokens), more exchanges are folded, down to the latest
+    one, and then the oldest notes are dropped.
+
+    Compaction runs when compact() is called at the start of a model turn,
+    not at the end of every agent invocation (apply_management), so a
+    light-tier attempt that is discarded afterwards never folds anything.
+    """
+
+    def __init__(self, keep_exchanges=3, token_budget=1200, max_actions=8, max_notes=6):
+        super().__init__()
+        self.keep_exchanges = keep_exchanges
+        self.token_budget = token_budget
+        self.page = None
+        self.actions = deque(maxlen=max_actions)
+        self.notes = deque(maxlen=max_notes)
+        self.compactions = 0
+        self.folded_exchanges = 0
+
+    def apply_management(self, agent, **kwargs):
+        pass
+
+    def reduce_context(self, agent, e=None, **kwargs):
+        """Context window overflow: fold everything but the latest exchange."""
+        if not self.compact(agent, keep_exchanges=1) and e is not None:
+            raise ContextWindowOverflowException("Unable to compact conversation history") from e
+
+    def compact(self, agent, keep_exchanges=None):
+        """
+        Fold old exchanges of agent.messages (in place) into the state summary.
+
+        Returns:
+            int: number of exchanges folded
+        """
+        keep = max(1, self.keep_exchanges if keep_exchanges is None else keep_exchanges)
+        messages = agent.messages
+        folded = 0
+        while self._fold_oldest(messages, keep):
+            folded += 1
+        if folded:
+            self._write_summary(messages)
+        # Over budget: fold down to the latest exchange, then drop the oldest notes
+        while estimate_tokens(messages) > self.token_budget and self._fold_oldest(messages, 1):
+            folded += 1
+            self._write_summary(messages)
+        while estimate_tokens(messages) > self.token_budget and self.notes:
+            self.notes.popleft()
+            self._write_summary(messages)
+        if folded:
+            self.compactions += 1
+            self.folded_exchanges += folded
+        return folded
+
+    def _fold_oldest(self, messages, keep):
+        """
+        Fold the oldest exchange if more than keep are left.
+
+        Returns:
+            bool: True if an exchange was folded
+        """
+        starts = [i for i, message in enumerate(messages) if is_prompt(message)]
+        if len(starts) <= keep:
+            return False
+        end = starts[1] if starts[0] == 0 else starts[0]
+        self._fold(messages[:end])
+        del messages[:end]
+        self.removed_message_count += end
+        return True
+
+    def _fold(self, exchange):
+        """Add one exchange's successful UI commands and its question/answer to the state."""
+        results = {}
+        for message in exchange:
+            for block in message['content']:
+                if 'toolResult' in block:
+                    result = block['toolResult']
+                    text = ''.join(c.get('text', '') for c in result.get('content', []))
+                    results[result['toolUseId']] = result.get('status') == 'success' and not text.startswith('Error')
+        question, answer, navigated = '', '', False
+        for message in exchange:
+            for block in message['content']:
+                if 'toolUse' in block:
+                    use = block['toolUse']
+                    if not results.get(use['toolUseId']):
+                        continue
+                    args = use.get('input') or {}
+                    if use['name'] == 'navigate_to_page':
+                        self.page, navigated = args.get('path'), True
+                    action = describe_action(use['name'], args)
+                    if action:
+                        self.actions.append(action)
+                elif 'text' in block and not block['text'].startswith(SUMMARY_HEADER):
+                    if message['role'] == 'user' and not question:
+                        question = block['text']
+                    elif message['role'] == 'assistant':
+                        answer = block['text']
+        match = PROMPT_PATTERN.match(question)
+        if match:
+            question, location = match.groups()
+            if not navigated:
+                self.page = location
+        if question:
+            self.notes.append(f"User: {clip(question, 120)} / You: {clip(answer, 160)}")
+
+    def _write_summary(self, messages):
+        lines = [SUMMARY_HEADER]
+        if self.page:
+            lines.append(f"Page after those turns: {self.page}")
+        if self.actions:
+            lines.append("Recent actions: " + '; '.join(self.actions))
+        lines.extend(f"- {note}" for note in self.notes)
+        first = messages[0]['content']
+        if first and 'text' in first[0] and first[0]['text'].startswith(SUMMARY_HEADER):
+            first.pop(0)
+        first.insert(0, {'text': '\n'.join(lines)})
+
+    def get_state(self):
+        state = super().get_state()
+        state.update(page=self.page, actions=list(self.actions), notes=list(self.notes))
+        return state
+
+    def restore_from_session(self, state):
+        result = super().restore_from_session(state)
+        self.page = state.get('page')
+        self.actions.extend(state.get('actions', []))
+        self.notes.extend(state.get('notes', []))
+        return result
+
+    def stats(self):
+        """
+        Returns:
+            dict: compaction passes and exchanges folded into the summary so far
+        """
+        return {'compactions': self.compactions, 'folded_exchanges': self.folded_exchanges}
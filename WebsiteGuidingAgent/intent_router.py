@@ -0,0 +1,146 @@
+import re
+import threading
+from collections import deque
+
+from tracing import latency_percentiles
+
+
+POLITE_PREFIX = re.compile(
+    r"^(?:(?:ok(?:ay)?|hey|hi|so|now|um+|uh+|please|(?:can|could|would|will) you(?: please)?|"
+    r"i (?:want|would like|'d like|need) to|let's|lets)\s+)+"
+)
+POLITE_SUFFIX = re.compile(r"(?:\s+(?:please|now|for me|thanks|thank you))+$")
+
+PAUSE = re.compile(
+    r"(?:pause(?: the (?:call|conversation))?|wait(?: a (?:moment|minute|second|sec))?|hold on|"
+    r"give me a (?:moment|minute|second|sec)|one (?:moment|minute|second|sec)|hang on)"
+)
+END = re.compile(
+    r"(?:(?:end|stop|finish|close|hang up)(?: the| this)? (?:call|conversation|chat)|hang up|goodbye|bye(?: bye)?)"
+)
+GO_VERBS = r"(?:go|take me|navigate|bring me|head|jump|move|open|show me|show|scroll|scroll down|scroll up|skip)"
+
+
+def normalize(text):
+    text = text.lower().strip()
+    text = re.sub(r"[^\w\s'/-]", ' ', text)
+    text = re.sub(r"\s+", ' ', text).strip()
+    text = POLITE_PREFIX.sub('', text)
+    return POLITE_SUFFIX.sub('', text).strip()
+
+
+class RoutePlan:
+    """A deterministic answer: UI commands to run and the reply to speak."""
+
+    def __init__(self, intent, commands, reply):
+        self.intent = intent
+        self.commands = commands
+        self.reply = reply
+
+
+class IntentRouter:
+    """
+    Pre-model router for trivially structured voice commands.
+
+    Recognizes "go to <page>", "scroll to <section>" (navigating first when
+    the section lives on another page), "pause" and "end the call" using
+    the paths, section IDs and aliases from the site knowledge. The whole
+    utterance must match; anything else, or any section name that exists on
+    several pages other than the current one, falls through to the model.
+    """
+
+    def __init__(self, site_knowledge, latency_window=1000):
+        self.pages = {}
+        self.page_aliases = {}
+        self.section_aliases = {}
+        for page in site_knowledge['pages']:
+            self.pages[page['path']] = page
+            for alias in [page['name'], page['path'].strip('/')] + page.get('aliases', []):
+                if alias:
+                    self.page_aliases[alias.lower()] = page['path']
+            for section in page.get('sections', []):
+                names = [section['id'], section['id'].replace('-', ' '), section['title']]
+                for alias in names + section.get('aliases', []):
+                    self.section_aliases.setdefault(alias.lower(), set()).add((page['path'], section['id']))
+
+        page_pattern = '|'.join(sorted((re.escape(a) for a in self.page_aliases), key=len, reverse=True))
+        section_pattern = '|'.join(sorted((re.escape(a) for a in self.section_aliases), key=len, reverse=True))
+        self.navigate_pattern = re.compile(
+            rf"{GO_VERBS}(?: (?:to|me|over to|back to))? (?:the )?(?P<page>{page_pattern})(?: page| section)?"
+        )
+        self.scroll_pattern = re.compile(
+            rf"{GO_VERBS}(?: (?:to|me|down to|up to|over to))? (?:the )?(?P<section>{section_pattern})"
+            rf"(?: section| part| area)?(?: (?:on|in|of) (?:the )?(?P<page>{page_pattern})(?: page)?)?"
+        )
+
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = 0
+        self.latencies = {'router': deque(maxlen=latency_window), 'model': deque(maxlen=latency_window)}
+
+    def route(self, query, location=None):
+        """
+        Returns:
+            RoutePlan | None: the plan, or None to fall through to the model
+        """
+        text = normalize(query)
+        plan = self._match(text, location)
+        with self._lock:
+            if plan:
+                self.hits[plan.intent] = self.hits.get(plan.intent, 0) + 1
+            else:
+                self.misses += 1
+        return plan
+
+    def _match(self, text, location):
+        if PAUSE.fullmatch(text):
+            return RoutePlan('pause', [('pause_call', {})],
+                             "Sure, I'll wait. Just let me know when you're ready.")
+        if END.fullmatch(text):
+            return RoutePlan('end', [('end_call', {})], "Thanks for visiting! Goodbye.")
+
+        match = self.navigate_pattern.fullmatch(text)
+        if match:
+            path = self.page_aliases[match.group('page')]
+            name = self.pages[path]['name']
+            if path == location:
+                return RoutePlan('navigate', [], f"You're already on the {name}.")
+            return RoutePlan('navigate', [('navigate_to_page', {'path': path})], f"Sure, taking you to the {name}.")
+
+        match = self.scroll_pattern.fullmatch(text)
+        if match:
+            candidates = self.section_aliases[match.group('section')]
+            if match.group('page'):
+                page_path = self.page_aliases[match.group('page')]
+                candidates = {c for c in candidates if c[0] == page_path}
+            elif len(candidates) > 1:
+                candidates = {c for c in candidates if c[0] == location}
+            if len(candidates) != 1:
+                return None
+            path, section_id = next(iter(candidates))
+            title = next(s['title'] for s in self.pages[path]['sections'] if s['id'] == section_id)
+            commands = [] if path == location else [('navigate_to_page', {'path': path})]
+            commands.append(('scroll_to_section', {'selector_id': section_id}))
+            return RoutePlan('scroll', commands, f"Sure, scrolling to the {title.lower()}.")
+        return None
+
+    def record_latency(self, path, seconds):
+        """Record the end-to-end latency of a turn served by 'router' or 'model'."""
+        with self._lock:
+            self.latencies[path].append(seconds)
+
+    def stats(self):
+        """
+        Returns:
+            dict: hit count per intent, misses, hit rate and p50/p95 latency
+                (ms) per path
+        """
+        with self._lock:
+            hits = sum(self.hits.values())
+            total = hits + self.misses
+            return {
+                'hits': dict(self.hits),
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0,
+                'latency': {path: latency_percentiles(samples) for path, samples in self.latencies.items()}
+            }
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9$]+(?:[.,'][a-z0-9]+)*")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'at', 'be', 'can', 'do', 'does', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'page',
+    'please', 'show', 'take', 'tell', 'that', 'the', 'this', 'to', 'us',
+    'user', 'user\'s', 'we', 'what', 'where', 'which', 'who', 'with', 'you', 'your',
+    'query', 'location'
+}
+
+
+def load_site_knowledge(path):
+    """Load the structured site knowledge (pages -> sections -> selectors -> facts)."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def knowledge_hash(site_knowledge):
+    """Content hash of the site knowledge; changes whenever any page, section or fact does."""
+    canonical = json.dumps(site_knowledge, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        # Light plural folding so "prices" matches "price", "hours" -> "hour"
+        if len(token) > 3 and token.endswith('s'):
+            tokens.append(token[:-1])
+    return tokens
+
+
+class KnowledgeDocument:
+    """One retrievable snippet: a page section, or a page's general facts."""
+
+    def __init__(self, page, section=None):
+        self.page = page
+        self.section = section
+        self.path = page['path']
+        self.section_id = section['id'] if section else None
+        self.text = self._render()
+        search_text = ' '.join([
+            page['name'], ' '.join(page.get('aliases', [])), self.text,
+            ' '.join(section.get('aliases', [])) if section else '',
+            (self.section_id or '').replace('-', ' ')
+        ])
+        self.term_counts = Counter(tokenize(search_text))
+        self.length = sum(self.term_counts.values())
+
+    def _render(self):
+        page = self.page
+        if self.section is None:
+            lines = [f"**{page['name']} (`{page['path']}`)** - {page.get('summary', '')}"]
+            lines += [f"- {fact}" for fact in page.get('facts', [])]
+            return '\n'.join(lines)
+
+        section = self.section
+        lines = [f"**{page['name']} (`{page['path']}`) - {section['title']} (ID: `{section['id']}`)**"]
+        lines += [f"- {fact}" for fact in section.get('facts', [])]
+        lines += [f"- `{s['selector']}` - {s['label']}" for s in section.get('selectors', [])]
+        return '\n'.join(lines)
+
+
+class KnowledgeIndex:
+    """
+    Local BM25 index over the site knowledge, one document per page section.
+
+    Only the snippets relevant to the current query (and the user's current
+    page) are put in front of the model, instead of the whole knowledge base
+    on every model call.
+    """
+
+    def __init__(self, knowledge, k1=1.2, b=0.75, location_boost=1.5):
+        self.knowledge = knowledge
+        self.k1 = k1
+        self.b = b
+        self.location_boost = location_boost
+        self.documents = []
+        for page in knowledge['pages']:
+            if page.get('facts'):
+                self.documents.append(KnowledgeDocument(page))
+            for section in page.get('sections', []):
+                self.documents.append(KnowledgeDocument(page, section))
+
+        self.average_length = sum(d.length for d in self.documents) / max(len(self.documents), 1)
+        document_frequency = Counter()
+        for document in self.documents:
+            document_frequency.update(document.term_counts.keys())
+        total = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for term, count in document_frequency.items()
+        }
+
+    def search(self, query, location=None, k=4):
+        """
+        Rank sections against the query.
+
+        Args:
+            query: User's query text
+            location: Current page path; its sections get a score boost
+            k: Maximum number of documents to return
+
+        Returns:
+            list[KnowledgeDocument]: best matches first, only those with a score > 0
+        """
+        terms = [t for t in tokenize(query) if t in self.idf]
+        if not terms:
+            return []
+
+        scored = []
+        for document in self.documents:
+            score = 0.0
+            for term in terms:
+                frequency = document.term_counts.get(term, 0)
+                if not frequency:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * document.length / self.average_length)
+                score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            if score and location and document.path == location:
+                score *= self.location_boost
+            if score:
+                scored.append((score, document))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [document for _, document in scored[:k]]
+
+    def render_site_map(self):
+        """Compact list of valid paths and section IDs, always sent to the model."""
+        lines = []
+        for page in self.knowledge['pages']:
+            section_ids = ', '.join(f"`{s['id']}`" for s in page.get('sections', []))
+            lines.append(f"- `{page['path']}` → {page['name']}: {section_ids}")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def render(documents):
+        return '\n\n'.join(d.text for d in documents)
+
+    def render_all(self):
+        return self.render(self.documents)
@@ -0,0 +1,180 @@
+import contextvars
+import re
+import threading
+from collections import deque
+
+from strands.hooks import AfterModelCallEvent, AfterToolsEvent, BeforeToolsEvent, HookProvider
+
+from tracing import latency_percentiles
+
+
+# Light-tier attempt of the turn being served; None for full-tier turns
+current_attempt = contextvars.ContextVar('model_tier_attempt', default=None)
+
+# Turns that drive the page beyond navigation need the full model's planning
+INTERACTION = re.compile(
+    r"\b(?:fill(?:ing)?|type|enter|submit|click|press|tap|sign ?up|register|subscribe|book|send (?:a|the|my))\b"
+)
+EXPLANATION = re.compile(
+    r"\b(?:explain|in detail|detailed|tell me more|more about|how does|how do (?:they|these|those)|why|"
+    r"compare|comparison|difference|versus|vs|walk me through|step by step|recommend|should i)\b"
+)
+MULTI_STEP = re.compile(r"\b(?:and then|then|after that|and also|as well as)\b")
+# A model writing a tool call as text instead of calling it
+TOOL_CALL_TEXT = re.compile(
+    r"\b(?:navigate_to_page|scroll_to_section|fill_input|click_element|end_call|pause_call)\s*\("
+)
+
+ESCALATION_NOTICE = "Not executed: this request is being handed to a larger model."
+
+
+def classify(query, max_light_words=20):
+    """
+    Pick the model tier for a user query with local rules (no model call).
+
+    Short questions, greetings and thanks go to the light tier. Form
+    filling and clicking, requests for detailed explanations or comparisons,
+    several steps in one utterance, and long utterances go to the full tier.
+
+    Returns:
+        tuple: (tier, reason), tier is 'light' or 'full'
+    """
+    text = re.sub(r"\s+", ' ', query.lower()).strip()
+    if INTERACTION.search(text):
+        return 'full', 'interaction'
+    if EXPLANATION.search(text):
+        return 'full', 'explanation'
+    if MULTI_STEP.search(text) or text.count('?') > 1:
+        return 'full', 'multi_step'
+    if len(text.split()) > max_light_words:
+        return 'full', 'long'
+    return 'light', 'simple'
+
+
+class TierAttempt:
+    """
+    Outcome of one light-tier attempt; failure is the first reason to
+    escalate. held collects the attempt's UI commands, which are only sent
+    once its model responses have passed.
+    """
+
+    def __init__(self):
+        self.failure = None
+        self.held = []
+
+    def fail(self, reason):
+        if self.failure is None:
+            self.failure = reason
+
+
+class EscalationGuard(HookProvider):
+    """
+    Strands hooks that stop a light-tier attempt at its first invalid plan.
+
+    Each model response of a light-tier turn is checked before any of its
+    tools run: every tool call must name a known tool with valid arguments
+    (check_tool_call), and the text must not contain tool calls written out
+    instead of made. On a failed check, or a model error, the tool batch is
+    cancelled and the turn ends without another model call, so the caller
+    can rerun the turn on the full tier. Commands of the attempt's valid
+    hops are held on the attempt (TierAttempt.held), not sent, until it
+    has passed. Full-tier turns are not affected.
+    """
+
+    def __init__(self, check_tool_call):
+        self.check_tool_call = check_tool_call
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(AfterModelCallEvent, self.after_model)
+        registry.add_callback(BeforeToolsEvent, self.before_tools)
+        registry.add_callback(AfterToolsEvent, self.after_tools)
+
+    def check_message(self, message):
+        """
+        Returns:
+            str | None: reason the response is not a valid plan, or None
+        """
+        for block in message.get('content', []):
+            if 'toolUse' in block:
+                reason = self.check_tool_call(block['toolUse']['name'], block['toolUse'].get('input') or {})
+                if reason:
+                    return reason
+            elif 'text' in block and TOOL_CALL_TEXT.search(block['text']):
+                return 'tool_call_as_text'
+        return None
+
+    def after_model(self, event):
+        attempt = current_attempt.get()
+        if attempt is None:
+            return
+        if event.exception is not None:
+            attempt.fail('model_error')
+        elif event.stop_response is not None:
+            reason = self.check_message(event.stop_response.message)
+            if reason:
+                attempt.fail(reason)
+
+    def before_tools(self, event):
+        attempt = current_attempt.get()
+        if attempt is not None and attempt.failure:
+            event.cancel = ESCALATION_NOTICE
+
+    def after_tools(self, event):
+        attempt = current_attempt.get()
+        if attempt is not None and attempt.failure:
+            event.end_turn = True
+
+
+class ModelTierRouter:
+    """
+    Routing decisions, escalations and per-tier latency for tiered model turns.
+
+    Latency is recorded per outcome: 'light' (served by the light tier),
+    'full' (routed to the full tier) and 'escalated' (light attempt plus the
+    full-tier rerun).
+    """
+
+    def __init__(self, max_light_words=20, latency_window=1000):
+        self.max_light_words = max_light_words
+        self._lock = threading.Lock()
+        self.decisions = {'light': 0, 'full': 0}
+        self.reasons = {}
+        self.escalations = {}
+        self.latencies = {tier: deque(maxlen=latency_window) for tier in ('light', 'full', 'escalated')}
+
+    def route(self, query):
+        """
+        Returns:
+            tuple: (tier, reason), see classify
+        """
+        tier, reason = classify(query, self.max_light_words)
+        with self._lock:
+            self.decisions[tier] += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return tier, reason
+
+    def record_escalation(self, reason):
+        with self._lock:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def record_latency(self, outcome, seconds):
+        """Record the model time of a turn by outcome: 'light', 'full' or 'escalated'."""
+        with self._lock:
+            self.latencies[outcome].append(seconds)
+
+    def stats(self):
+        """
+        Returns:
+            dict: decisions per tier and reason, escalations per reason,
+                escalation rate of light-tier turns and p50/p95 latency (ms)
+                per outcome
+        """
+        with self._lock:
+            escalated = sum(self.escalations.values())
+            return {
+                'decisions': dict(self.decisions),
+                'reasons': dict(self.reasons),
+                'escalations': dict(self.escalations),
+                'escalation_rate': escalated / self.decisions['light'] if self.decisions['light'] else 0.0,
+                'latency': {outcome: latency_percentiles(samples) for outcome, samples in self.latencies.items()}
+            }
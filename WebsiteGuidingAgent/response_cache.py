@@ -0,0 +1,144 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from intent_router import normalize
+from model_tiers import classify
+
+
+# Follow-ups that depend on the conversation, and personal statements
+CONTEXTUAL = re.compile(
+    r"\b(?:it|its|that|this|these|those|they|them|one|ones|other|else|again|more|previous|last|same|"
+    r"my|mine|i'm|i am|i've|i was)\b"
+)
+# UI commands a cached answer may replay; fills, clicks and call control are never cached
+REPLAYABLE_TOOLS = {'navigate_to_page', 'scroll_to_section'}
+
+
+def is_cacheable_query(query):
+    """
+    True for self-contained factual questions: short enough for the light
+    model tier, no reference to earlier turns and nothing about the user.
+    """
+    text = normalize(query)
+    return bool(text) and classify(text)[0] == 'light' and not CONTEXTUAL.search(text)
+
+
+class CachedResponse:
+    """A model answer to replay: spoken reply, UI commands and what the model turn cost."""
+
+    __slots__ = ('reply', 'commands', 'model_seconds', 'knowledge_hash', 'expires_at')
+
+    def __init__(self, reply, commands, model_seconds, knowledge_hash, expires_at):
+        self.reply = reply
+        self.commands = commands
+        self.model_seconds = model_seconds
+        self.knowledge_hash = knowledge_hash
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of model answers to repeated factual questions.
+
+    Keys are the site, the normalized query and the user's current location.
+    Every answer depends on where it was asked: the model navigates only when
+    the user is not already on the page, so an answer without commands may
+    just mean the user was there. Entries record
+    the content hash of the site knowledge they were answered from; an entry
+    whose hash no longer matches the current knowledge is dropped on lookup.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+
+    def get(self, site_key, query, location, knowledge_hash):
+        """
+        Returns:
+            CachedResponse | None: the answer for query at location on the
+                site, or None
+        """
+        key = (site_key, normalize(query), location)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.knowledge_hash != knowledge_hash:
+                    del self._entries[key]
+                    self.invalidations += 1
+                elif entry.expires_at <= time.monotonic():
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def put(self, site_key, query, location, reply, commands, model_seconds, knowledge_hash):
+        """
+        Store a model answer if it can be replayed: a cacheable query, a
+        non-empty reply and only navigation/scroll commands.
+
+        Args:
+            commands: list of (tool_name, args) the turn dispatched successfully
+
+        Returns:
+            bool: True if the answer was stored
+        """
+        if not reply or not is_cacheable_query(query):
+            return False
+        if any(name not in REPLAYABLE_TOOLS for name, _ in commands):
+            return False
+        key = (site_key, normalize(query), location)
+        entry = CachedResponse(reply, list(commands), model_seconds, knowledge_hash,
+                               time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def record_saving(self, entry, hit_seconds):
+        """Credit the model time a hit avoided (the original turn minus the replay)."""
+        with self._lock:
+            self.seconds_saved += max(entry.model_seconds - hit_seconds, 0.0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: hit/miss counters, hit ratio, drops by cause, size and
+                latency saved (total and per hit, ms)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'latency_saved_ms': round(self.seconds_saved * 1000, 1),
+                'latency_saved_ms_per_hit': round(self.seconds_saved * 1000 / self.hits, 1) if self.hits else 0.0
+            }
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class AgentSession:
+    """One live conversation: its agent, a turn lock and usage bookkeeping."""
+
+    def __init__(self, key, agent):
+        self.key = key
+        self.agent = agent
+        # Strands agents reject concurrent invocations; overlapping turns for
+        # the same session wait on this lock instead of failing.
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.turns = 0
+        self.bytes_held = 0
+        # Ordered UI command channel to the browser, created on first use
+        self.channel = None
+
+
+class SessionPool:
+    """
+    Keeps one agent conversation per session, bounded in count and age.
+
+    Sessions are keyed on the AgentCore runtimeSessionId (falling back to the
+    client_id). At most max_sessions stay resident; beyond that the least
+    recently used idle session is evicted, and any session unused for
+    idle_timeout seconds is dropped on the next access. History length per
+    session is bounded by the conversation manager the agent factory installs.
+    """
+
+    def __init__(self, agent_factory, max_sessions=200, idle_timeout=900.0):
+        self.agent_factory = agent_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, key):
+        """
+        Return the session for key, creating it (and evicting others) if needed.
+
+        Returns:
+            AgentSession
+        """
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(key)
+            if session is None:
+                session = AgentSession(key, self.agent_factory())
+                self._sessions[key] = session
+                self.created += 1
+                self._evict_over_capacity(keep=key)
+            self._sessions.move_to_end(key)
+            session.last_used = time.monotonic()
+            return session
+
+    def record_turn(self, session):
+        """Update usage bookkeeping after a completed turn."""
+        session.turns += 1
+        session.last_used = time.monotonic()
+        session.bytes_held = len(json.dumps(session.agent.messages, default=str))
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for key, session in list(self._sessions.items()):
+            if session.last_used < cutoff and not session.lock.locked():
+                del self._sessions[key]
+                self.evicted += 1
+
+    def _evict_over_capacity(self, keep):
+        # Oldest first; sessions with a turn in flight are never evicted.
+        for key, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if key != keep and not session.lock.locked():
+                del self._sessions[key]
+                self.evicted += 1
+
+    def metrics(self):
+        """
+        Returns:
+            dict: resident session count, approximate conversation bytes held,
+                and lifetime created/evicted counters
+        """
+        with self._lock:
+            return {
+                'resident_sessions': len(self._sessions),
+                'bytes_held': sum(s.bytes_held for s in self._sessions.values()),
+                'created': self.created,
+                'evicted': self.evicted
+            }
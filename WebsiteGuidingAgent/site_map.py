@@ -0,0 +1,87 @@
+import difflib
+import threading
+
+
+# Argument each UI tool takes from the site map, and its kind there
+UI_TOOL_ARGUMENTS = {
+    'navigate_to_page': ('path', 'path'),
+    'scroll_to_section': ('selector_id', 'section'),
+    'fill_input': ('selector', 'selector'),
+    'click_element': ('selector', 'selector'),
+}
+
+
+class SiteMapIndex:
+    """
+    Precompiled index of the valid tool arguments for the site.
+
+    Built once at startup from the site knowledge: the page paths, the
+    section IDs and the element selectors, each mapped to the pages they
+    appear on. Tools check their arguments with a set lookup before anything
+    is sent to the browser. An invalid argument is rejected immediately with
+    the nearest valid candidates, so the model can correct itself without a
+    DynamoDB lookup, a WebSocket post and a failed action in the browser.
+    """
+
+    def __init__(self, site_knowledge, max_candidates=3, cutoff=0.5):
+        self.max_candidates = max_candidates
+        self.cutoff = cutoff
+        self.paths = set()
+        self.sections = {}
+        self.selectors = {}
+        for page in site_knowledge['pages']:
+            self.paths.add(page['path'])
+            for section in page.get('sections', []):
+                self.sections.setdefault(section['id'], set()).add(page['path'])
+                for selector in section.get('selectors', []):
+                    self.selectors.setdefault(selector['selector'], set()).add(page['path'])
+
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejections = {}
+
+    def check_path(self, path):
+        return self._check('path', path, self.paths)
+
+    def check_section(self, section_id):
+        return self._check('section', section_id, self.sections)
+
+    def check_selector(self, selector):
+        return self._check('selector', selector, self.selectors)
+
+    def contains(self, kind, value):
+        """True if value is a known 'path', 'section' or 'selector'; not counted in stats()."""
+        valid = {'path': self.paths, 'section': self.sections, 'selector': self.selectors}[kind]
+        return value in valid
+
+    def _check(self, kind, value, valid):
+        """
+        Returns:
+            dict: {'success': True}, or {'success': False, 'error': str,
+                'candidates': list} with the nearest valid values
+        """
+        with self._lock:
+            self.checked += 1
+            if value in valid:
+                return {'success': True}
+            self.rejections[kind] = self.rejections.get(kind, 0) + 1
+
+        candidates = difflib.get_close_matches(str(value), list(valid), n=self.max_candidates, cutoff=self.cutoff)
+        if candidates:
+            error = f"Unknown {kind} '{value}'. Did you mean: {', '.join(candidates)}?"
+        else:
+            error = f"Unknown {kind} '{value}'. Use only the {kind}s listed in the site map."
+        return {'success': False, 'error': error, 'candidates': candidates}
+
+    def stats(self):
+        """
+        Returns:
+            dict: checks performed, rejections per argument kind and rejection rate
+        """
+        with self._lock:
+            rejected = sum(self.rejections.values())
+            return {
+                'checked': self.checked,
+                'rejected': dict(self.rejections),
+                'rejection_rate': rejected / self.checked if self.checked else 0.0
+            }
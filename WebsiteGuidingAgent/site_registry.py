@@ -0,0 +1,182 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from intent_router import IntentRouter
+from knowledge_index import KnowledgeIndex, knowledge_hash
+from site_map import SiteMapIndex
+from tool_efficiency import ToolEfficiencyScorer
+from tracing import latency_percentiles, log
+
+
+# Site keys come from the request payload and name a file or S3 object
+SITE_KEY_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+
+
+class Site:
+    """
+    One customer website, compiled once from its knowledge: the base
+    instructions with the site's name, the rendered site map, the retrieval
+    index, the tool-argument validators, the intent router and the scorer of
+    recorded turns.
+    """
+
+    def __init__(self, key, knowledge, prompt_template):
+        started = time.perf_counter()
+        self.key = key
+        self.knowledge = knowledge
+        self.name = knowledge.get('site') or key
+        self.system_prompt = prompt_template.format(site_name=self.name)
+        self.knowledge_index = KnowledgeIndex(knowledge)
+        self.site_map = self.knowledge_index.render_site_map()
+        self.site_map_index = SiteMapIndex(knowledge)
+        self.intent_router = IntentRouter(knowledge)
+        self.tool_scorer = ToolEfficiencyScorer(knowledge, index=self.site_map_index)
+        # Cached answers are only valid for the knowledge they were answered from
+        self.knowledge_hash = knowledge_hash(knowledge)
+        self.bytes_held = len(json.dumps(knowledge)) + len(self.system_prompt) + len(self.site_map)
+        self.compile_seconds = time.perf_counter() - started
+
+
+class SiteRegistry:
+    """
+    Lazily compiled per-site configuration, bounded in count.
+
+    load(key) returns a site's knowledge, or None if there is no such site.
+    A site is loaded and compiled (see Site) on first use and stays resident
+    while it is used. Beyond max_sites the least recently used site is
+    evicted and compiled again on its next use. Keys in pinned are never
+    evicted. Unknown keys, and keys whose site file does not parse or
+    compile (logged as site_malformed), are remembered for unknown_ttl
+    seconds so a bad key does not reach the store on every request.
+    Concurrent first uses of one key load it once.
+    """
+
+    def __init__(self, load, prompt_template, max_sites=64, pinned=(), unknown_ttl=60.0, latency_window=1000):
+        self.load = load
+        self.prompt_template = prompt_template
+        self.max_sites = max_sites
+        self.pinned = set(pinned)
+        self.unknown_ttl = unknown_ttl
+        self._sites = OrderedDict()
+        # key -> monotonic time until which it is known not to exist, oldest first
+        self._unknown = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.hits = 0
+        self.loads = 0
+        self.unknown = 0
+        self.evictions = 0
+        self.compile_times = deque(maxlen=latency_window)
+
+    def lookup(self, key):
+        """
+        Resident site for key, without loading anything.
+
+        Returns:
+            Site | None
+        """
+        with self._lock:
+            site = self._sites.get(key)
+            if site is not None:
+                self._sites.move_to_end(key)
+                self.hits += 1
+            return site
+
+    def get(self, key):
+        """
+        Site for key, loading and compiling it on first use. Blocks on a
+        miss; call it through transport.run_io from the event loop.
+
+        Returns:
+            Site | None: None if key names no site
+        """
+        site = self.lookup(key)
+        if site is not None:
+            return site
+        if not SITE_KEY_PATTERN.fullmatch(key or ''):
+            return self._count_unknown()
+        with self._lock:
+            if self._unknown.get(key, 0) > time.monotonic():
+                self.unknown += 1
+                return None
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            # Another request may have compiled it while we waited
+            site = self.lookup(key)
+            if site is not None:
+                return site
+            try:
+                site = self._compile(key)
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+            # Insert before dropping the key's lock: a request arriving in between
+            # must find the site, not start another load
+            with self._lock:
+                if site is None:
+                    self._remember_unknown(key)
+                else:
+                    self._sites[key] = site
+                    self.loads += 1
+                    self.compile_times.append(site.compile_seconds)
+                    self._evict_over_capacity(keep=key)
+                self._loading.pop(key, None)
+            return site
+
+    def _compile(self, key):
+        """
+        Returns:
+            Site | None: None if key names no site or its file is malformed;
+                errors reaching the store are raised
+        """
+        try:
+            knowledge = self.load(key)
+            return Site(key, knowledge, self.prompt_template) if knowledge is not None else None
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            log('site_malformed', site=key, error=f'{type(e).__name__}: {e}')
+            return None
+
+    def _count_unknown(self):
+        with self._lock:
+            self.unknown += 1
+        return None
+
+    def _evict_over_capacity(self, keep):
+        for key in list(self._sites):
+            if len(self._sites) <= self.max_sites:
+                break
+            if key != keep and key not in self.pinned:
+                del self._sites[key]
+                self.evictions += 1
+
+    def _remember_unknown(self, key):
+        self.unknown += 1
+        now = time.monotonic()
+        while self._unknown and (next(iter(self._unknown.values())) <= now
+                                 or len(self._unknown) >= self.max_sites * 4):
+            self._unknown.popitem(last=False)
+        self._unknown[key] = now + self.unknown_ttl
+
+    def stats(self):
+        """
+        Returns:
+            dict: resident sites, approximate bytes held, hits, loads (first
+                uses and reloads after eviction), unknown keys, evictions and
+                p50/p95 compile time (ms)
+        """
+        with self._lock:
+            compile_ms = latency_percentiles(self.compile_times)
+            return {
+                'resident_sites': len(self._sites),
+                'bytes_held': sum(s.bytes_held for s in self._sites.values()),
+                'hits': self.hits,
+                'loads': self.loads,
+                'unknown': self.unknown,
+                'evictions': self.evictions,
+                'compile_p50_ms': compile_ms['p50_ms'],
+                'compile_p95_ms': compile_ms['p95_ms']
+            }
@@ -0,0 +1,104 @@
+from site_map import UI_TOOL_ARGUMENTS, SiteMapIndex
+
+
+COUNTERS = ('tool_calls', 'model_hops', 'redundant_navigations', 'redundant_scrolls', 'missing_scrolls',
+            'invalid_arguments', 'off_page_actions', 'failed_calls')
+
+
+class ToolEfficiencyScorer:
+    """
+    Scores the UI tool calls of recorded turns against the guide's rules.
+
+    A turn starts on the page the browser reported (its location). Calls are
+    replayed in order on that page model and counted as:
+
+    - redundant_navigations: navigate_to_page to the page the user is on
+    - redundant_scrolls: scroll_to_section to the section just scrolled to
+    - missing_scrolls: fill_input / click_element without first scrolling,
+      on the current page, to a section holding the selector
+    - invalid_arguments: a path, section ID or selector not in the site map
+    - off_page_actions: a scroll, fill or click on a page without that target
+    - failed_calls: calls whose result was an error, for any reason
+
+    Calls that failed do not move the page model.
+    """
+
+    def __init__(self, site_knowledge, index=None):
+        # Only membership is looked up, so the tools' own index can be shared
+        self.index = index if index is not None else SiteMapIndex(site_knowledge)
+        # selector -> section IDs holding it
+        self.selector_sections = {}
+        for page in site_knowledge['pages']:
+            for section in page.get('sections', []):
+                for selector in section.get('selectors', []):
+                    self.selector_sections.setdefault(selector['selector'], set()).add(section['id'])
+
+    def score_turn(self, tool_calls, location, model_hops=0):
+        """
+        Args:
+            tool_calls: list of {"tool", "args", "error"} in issue order
+            location: path the user was on when the turn started
+
+        Returns:
+            dict: the COUNTERS for this turn, plus "wasted_calls" (redundant
+                or invalid calls) and "page" (where the turn left the user)
+        """
+        counts = dict.fromkeys(COUNTERS, 0)
+        counts['model_hops'] = model_hops
+        page, scrolled = location, None
+        for call in tool_calls:
+            counts['tool_calls'] += 1
+            if call.get('error'):
+                counts['failed_calls'] += 1
+            if call['tool'] not in UI_TOOL_ARGUMENTS:
+                continue
+            argument, kind = UI_TOOL_ARGUMENTS[call['tool']]
+            value = (call.get('args') or {}).get(argument)
+            if not value or not self.index.contains(kind, value):
+                counts['invalid_arguments'] += 1
+                continue
+            if kind == 'path':
+                if value == page:
+                    counts['redundant_navigations'] += 1
+                elif not call.get('error'):
+                    page, scrolled = value, None
+                continue
+            on_pages = self.index.sections[value] if kind == 'section' else self.index.selectors[value]
+            if page not in on_pages:
+                counts['off_page_actions'] += 1
+            if kind == 'section':
+                if value == scrolled:
+                    counts['redundant_scrolls'] += 1
+                if not call.get('error'):
+                    scrolled = value
+            elif scrolled not in self.selector_sections[value]:
+                counts['missing_scrolls'] += 1
+        counts['wasted_calls'] = (counts['redundant_navigations'] + counts['redundant_scrolls']
+                                  + counts['invalid_arguments'])
+        counts['page'] = page
+        return counts
+
+
+def summarize(turn_scores, tool_ms=None):
+    """
+    Totals and per-task rates over scored turns; one user turn is one task.
+
+    Args:
+        turn_scores: results of ToolEfficiencyScorer.score_turn
+        tool_ms: optional total milliseconds spent in tool calls
+
+    Returns:
+        dict: tasks, totals of every counter, "<counter>_per_task" rates and
+            efficiency (share of tool calls that were not wasted)
+    """
+    tasks = len(turn_scores)
+    summary = {'tasks': tasks}
+    for counter in COUNTERS + ('wasted_calls',):
+        total = sum(score[counter] for score in turn_scores)
+        summary[counter] = total
+        summary[f'{counter}_per_task'] = total / tasks if tasks else 0.0
+    calls = summary['tool_calls']
+    summary['efficiency'] = 1 - summary['wasted_calls'] / calls if calls else 1.0
+    if tool_ms is not None:
+        summary['tool_ms_per_task'] = tool_ms / tasks if tasks else 0.0
+    return summary
@@ -0,0 +1,205 @@
+import contextvars
+import json
+import os
+import time
+import uuid
+
+from strands.hooks import (AfterModelCallEvent, AfterToolCallEvent, BeforeModelCallEvent,
+                           BeforeToolCallEvent, HookProvider)
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'WebsiteGuidingAgent')
+# Span name -> metric name prefix, where capitalizing the span name is not enough
+METRIC_NAMES = {'dynamodb': 'DynamoDB'}
+
+# The trace of the turn being handled by the current invocation
+current_trace = contextvars.ContextVar('trace', default=None)
+
+
+class Span:
+    """Times one operation of a trace; used as a context manager."""
+
+    __slots__ = ('trace', 'name', 'attrs', 'start')
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.attrs['error'] = str(exc)
+        self.trace.record(self.name, self.start, time.perf_counter(), self.attrs)
+        return False
+
+
+class _NoSpan:
+    """Stand-in used when no trace is active; costs one attribute lookup."""
+
+    attrs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Trace:
+    """
+    Spans and timings of one turn, emitted as a single JSON log line.
+
+    The line carries the trace ID, client_id and session ID for correlation,
+    every span (name, offset and duration in ms, attributes), per-span totals,
+    and a CloudWatch embedded metric format (EMF) block. CloudWatch turns that
+    block into metrics without any API calls from the hot path.
+    """
+
+    def __init__(self, name, trace_id=None, **attrs):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.spans = []
+        self._open = {}
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def begin(self, key, name, **attrs):
+        """Start a span that is ended by a separate callback (see TracingHooks)."""
+        self._open[key] = Span(self, name, attrs)
+
+    def end(self, key, **attrs):
+        span = self._open.pop(key, None)
+        if span is not None:
+            span.attrs.update(attrs)
+            span.__exit__(None, None, None)
+
+    def record(self, name, start, end, attrs):
+        self.spans.append({
+            'name': name,
+            'offset_ms': round((start - self.start) * 1000, 1),
+            'duration_ms': round((end - start) * 1000, 1),
+            **attrs
+        })
+
+    def totals(self):
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span['name'], {'count': 0, 'ms': 0.0})
+            total['count'] += 1
+            total['ms'] = round(total['ms'] + span['duration_ms'], 1)
+        return totals
+
+    def finish(self, **attrs):
+        """
+        Emit the trace. attrs (e.g. path='router') become properties of the
+        record; 'path' is also the metric dimension.
+
+        Returns:
+            dict: the emitted record
+        """
+        duration = round((time.perf_counter() - self.start) * 1000, 1)
+        totals = self.totals()
+        metrics = {'TurnLatency': duration}
+        for name, total in totals.items():
+            metric = METRIC_NAMES.get(name) or ''.join(part.capitalize() for part in name.split('_'))
+            metrics[f'{metric}Latency'] = total['ms']
+            metrics[f'{metric}Calls'] = total['count']
+        record = {
+            'trace': self.name,
+            'trace_id': self.trace_id,
+            **self.attrs,
+            **attrs,
+            'duration_ms': duration,
+            'spans': sorted(self.spans, key=lambda s: s['offset_ms']),
+            'totals': totals,
+            **metrics,
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['path']] if 'path' in attrs else [[]],
+                    'Metrics': [
+                        {'Name': name, 'Unit': 'Count' if name.endswith('Calls') else 'Milliseconds'}
+                        for name in metrics
+                    ]
+                }]
+            }
+        }
+        print(json.dumps(record, default=str))
+        return record
+
+
+def span(name, **attrs):
+    """Time an operation under the current turn's trace (a no-op without one)."""
+    trace = current_trace.get()
+    if trace is None:
+        return NO_SPAN
+    return trace.span(name, **attrs)
+
+
+def latency_percentiles(samples):
+    """
+    Returns:
+        dict: count and p50/p95 (ms) of latency samples in seconds; the
+            percentiles are None without samples
+    """
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'p50_ms': ordered[len(ordered) // 2] * 1000 if ordered else None,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000 if ordered else None
+    }
+
+
+def log(event, **fields):
+    """Structured log line correlated with the current turn's trace."""
+    trace = current_trace.get()
+    record = {'event': event}
+    if trace is not None:
+        record['trace_id'] = trace.trace_id
+        record.update(trace.attrs)
+    record.update(fields)
+    print(json.dumps(record, default=str))
+
+
+class TracingHooks(HookProvider):
+    """Strands hooks that add a span per model hop and per tool call."""
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(BeforeModelCallEvent, self.before_model)
+        registry.add_callback(AfterModelCallEvent, self.after_model)
+        registry.add_callback(BeforeToolCallEvent, self.before_tool)
+        registry.add_callback(AfterToolCallEvent, self.after_tool)
+
+    def before_model(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.begin(('model', id(event.agent)), 'model')
+
+    def after_model(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            stop_reason = event.stop_response.stop_reason if event.stop_response else None
+            attrs = {'stop_reason': stop_reason}
+            if event.exception is not None:
+                attrs['error'] = str(event.exception)
+            trace.end(('model', id(event.agent)), **attrs)
+
+    def before_tool(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.begin(('tool', event.tool_use['toolUseId']), 'tool', tool=event.tool_use['name'])
+
+    def after_tool(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.end(('tool', event.tool_use['toolUseId']), status=event.result.get('status'))
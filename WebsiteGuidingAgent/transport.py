@@ -0,0 +1,52 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.config import Config
+
+
+# Size of the botocore HTTP connection pool per client. The I/O executor uses
+# the same number of workers so a worker never waits for a free connection.
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+
+# Shared botocore settings for the module-level clients. Timeouts are kept
+# tight because every call sits inside a voice turn; standard-mode retries
+# back off on throttling without the long legacy retry budget.
+client_config = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=float(os.environ.get('AWS_CONNECT_TIMEOUT', '2')),
+    read_timeout=float(os.environ.get('AWS_READ_TIMEOUT', '5')),
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+
+# Bedrock Runtime streams a whole model hop over one response, so it keeps
+# the pool and keepalive settings but gets a read timeout sized for a model
+# call. One client built with it is shared by every session's agent.
+model_client_config = client_config.merge(Config(
+    read_timeout=float(os.environ.get('AGENT_MODEL_READ_TIMEOUT', '120'))
+))
+
+io_executor = ThreadPoolExecutor(
+    max_workers=MAX_POOL_CONNECTIONS,
+    thread_name_prefix='aws-io'
+)
+
+async def run_io(func, *args, **kwargs):
+    """
+    Run a blocking boto3 call on the bounded I/O executor so the event loop
+    driving the agent keeps serving other tool calls and sessions meanwhile.
+
+    Args:
+        func: Blocking callable (e.g. table.query, client.post_to_connection)
+        *args, **kwargs: Arguments passed through to func
+
+    Returns:
+        Whatever func returns; exceptions propagate to the awaiting caller
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(io_executor, call)
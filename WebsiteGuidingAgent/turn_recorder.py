@@ -0,0 +1,93 @@
+import contextvars
+import time
+
+from strands.hooks import (AfterModelCallEvent, AfterToolCallEvent, BeforeModelCallEvent,
+                           BeforeToolCallEvent, HookProvider)
+
+
+# Recording of the turn being served, when turn recording is on
+current_recording = contextvars.ContextVar('turn_recording', default=None)
+
+
+def result_error(text):
+    """The error of a tool's result string, or None; the UI tools report failures as "Error ..."."""
+    return text if isinstance(text, str) and text.startswith('Error') else None
+
+
+class TurnRecording:
+    """
+    What one turn did, for offline replay and scoring: the query and the
+    user's location, every tool call in order (arguments, error, duration,
+    the model hop that issued it, or the router / response cache), and the
+    number and duration of model hops.
+    """
+
+    def __init__(self, query, location):
+        self.query = query
+        self.location = location
+        self.tool_calls = []
+        self.model_hops = 0
+        self.model_ms = 0.0
+        self._started = {}
+
+    def add_tool_call(self, name, args, error, started, source='model'):
+        self.tool_calls.append({
+            'tool': name,
+            'args': dict(args or {}),
+            'error': error,
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            'hop': self.model_hops if source == 'model' else None,
+            'source': source
+        })
+
+    def discard(self):
+        """Forget a failed light-tier attempt; only the rerun on the full tier counts."""
+        self.tool_calls.clear()
+        self.model_hops = 0
+        self.model_ms = 0.0
+
+    def to_record(self, **attrs):
+        return {
+            'query': self.query,
+            'location': self.location,
+            'tool_calls': self.tool_calls,
+            'model_hops': self.model_hops,
+            'model_ms': round(self.model_ms, 1),
+            **attrs
+        }
+
+
+class RecordingHooks(HookProvider):
+    """Strands hooks that add the model hops and tool calls of a turn to its recording."""
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(BeforeModelCallEvent, self.before_model)
+        registry.add_callback(AfterModelCallEvent, self.after_model)
+        registry.add_callback(BeforeToolCallEvent, self.before_tool)
+        registry.add_callback(AfterToolCallEvent, self.after_tool)
+
+    def before_model(self, event):
+        recording = current_recording.get()
+        if recording is not None:
+            recording.model_hops += 1
+            recording._started['model'] = time.perf_counter()
+
+    def after_model(self, event):
+        recording = current_recording.get()
+        if recording is not None and 'model' in recording._started:
+            recording.model_ms += (time.perf_counter() - recording._started.pop('model')) * 1000
+
+    def before_tool(self, event):
+        recording = current_recording.get()
+        if recording is not None:
+            recording._started[event.tool_use['toolUseId']] = time.perf_counter()
+
+    def after_tool(self, event):
+        recording = current_recording.get()
+        if recording is None:
+            return
+        started = recording._started.pop(event.tool_use['toolUseId'], time.perf_counter())
+        result = event.result or {}
+        text = ''.join(block.get('text', '') for block in result.get('content', []))
+        error = text if result.get('status') == 'error' else result_error(text)
+        recording.add_tool_call(event.tool_use['name'], event.tool_use.get('input'), error, started)
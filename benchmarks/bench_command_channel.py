@@ -0,0 +1,77 @@
+"""
+UI command delivery with and without the per-session command channel.
+
+A stub model fills the contact form (scroll, three fills, submit), issuing
+several tool calls per hop. Sends go to a fake Management API endpoint with
+latency and jitter. The benchmark reports turn latency and WebSocket frames
+per turn. It checks that every session receives its commands in the order
+issued, with strictly increasing sequence numbers.
+
+    python benchmarks/bench_command_channel.py --sessions 20 --io-latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+PLAN = [
+    [('scroll_to_section', {'selector_id': 'contact-form'}),
+     ('fill_input', {'selector': '#agent-name', 'value': 'Jane'}),
+     ('fill_input', {'selector': '#agent-email', 'value': 'jane@example.com'}),
+     ('fill_input', {'selector': '#agent-message', 'value': 'Hello'})],
+    [('click_element', {'selector': '#agent-submit'})],
+]
+EXPECTED = [{'tool': name, 'args': args} for hop in PLAN for name, args in hop]
+
+
+def script(prompt):
+    return PLAN, 'Your message has been sent.'
+
+
+async def measure(agent_module, pipelining, sessions, model_latency, io_latency, jitter):
+    agent_module.command_pipelining = pipelining
+    table = FakeConnectionsTable()
+    api = FakeManagementApi(latency=io_latency, jitter=jitter)
+    install_fakes(agent_module, table, api, ScriptedModel(script, latency=model_latency))
+    connections = {f'client-{i}': table.connect(f'client-{i}') for i in range(sessions)}
+
+    async def turn(client_id):
+        start = time.perf_counter()
+        await agent_module.invoke({'client_id': client_id, 'prompt': 'fill the contact form'}, None)
+        return time.perf_counter() - start
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies = await asyncio.gather(*[turn(c) for c in connections])
+
+    for client_id, connection_id in connections.items():
+        assert api.commands(connection_id) == EXPECTED, f'{client_id} received commands out of order'
+        if pipelining:
+            seqs = [c['seq'] for f in api.frames[connection_id] for c in f['commands']]
+            assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs), f'{client_id} seq not increasing: {seqs}'
+
+    return statistics.median(latencies), api.calls / sessions
+
+
+async def run(sessions, model_latency, io_latency, jitter):
+    agent_module = load_agent_module()
+    direct = await measure(agent_module, False, sessions, model_latency, io_latency, jitter)
+    pipelined = await measure(agent_module, True, sessions, model_latency, io_latency, jitter)
+    print(f'{"mode":<10} {"p50 turn":>10} {"frames/turn":>12}')
+    for mode, (latency, frames) in (('direct', direct), ('pipelined', pipelined)):
+        print(f'{mode:<10} {latency * 1000:>8.0f}ms {frames:>12.1f}')
+    print('ordering: ok')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--model-latency', type=float, default=0.3)
+    parser.add_argument('--io-latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.03)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.model_latency, args.io_latency, args.jitter))
@@ -0,0 +1,76 @@
+"""
+Fire N interleaved sessions at the agent entrypoint and check that every UI
+command reaches the browser of the client that issued it.
+
+    python benchmarks/bench_concurrency.py --sessions 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+
+def script(prompt):
+    # Prompts look like "go to /p7"; every session navigates to its own path,
+    # scrolls and clicks, so any cross-talk shows up as a foreign path.
+    path = prompt.split()[-1]
+    return [
+        [('navigate_to_page', {'path': path})],
+        [('scroll_to_section', {'selector_id': f'section{path}'})],
+        [('click_element', {'selector': f'#btn{path.replace("/", "-")}'})],
+    ], f'Done with {path}'
+
+
+async def run(sessions, model_latency, io_latency):
+    agent_module = load_agent_module()
+    table = FakeConnectionsTable(latency=io_latency)
+    api = FakeManagementApi(latency=io_latency)
+    install_fakes(agent_module, table, api, ScriptedModel(script, latency=model_latency))
+
+    connections = {f'client-{i}': table.connect(f'client-{i}') for i in range(sessions)}
+    # One synthetic page per session so the tool-argument check accepts them
+    from site_map import SiteMapIndex
+    agent_module.default_site.site_map_index = SiteMapIndex({'pages': [
+        {'path': f'/p{i}', 'sections': [{'id': f'section/p{i}', 'selectors': [{'selector': f'#btn-p{i}'}]}]}
+        for i in range(sessions)
+    ]})
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = await asyncio.gather(*[
+            agent_module.invoke({'client_id': client_id, 'prompt': f'go to /p{i}'}, None)
+            for i, client_id in enumerate(connections)
+        ])
+    elapsed = time.perf_counter() - start
+
+    misrouted = 0
+    for i, (client_id, connection_id) in enumerate(connections.items()):
+        frames = api.commands(connection_id)
+        expected = [
+            {'tool': 'navigate_to_page', 'args': {'path': f'/p{i}'}},
+            {'tool': 'scroll_to_section', 'args': {'selector_id': f'section/p{i}'}},
+            {'tool': 'click_element', 'args': {'selector': f'#btn-p{i}'}},
+        ]
+        if frames != expected:
+            misrouted += 1
+            print(f'{client_id}: expected {expected}, got {frames}')
+        assert results[i]['result']['content'][0]['text'] == f'Done with /p{i}'
+
+    print(f'sessions={sessions} elapsed={elapsed:.3f}s '
+          f'serial_estimate={sessions * 3 * (model_latency + io_latency):.3f}s '
+          f'frames={api.calls} misrouted={misrouted}')
+    print(f'session pool: {agent_module.session_pool.metrics()}')
+    assert misrouted == 0, f'{misrouted} sessions received foreign commands'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--model-latency', type=float, default=0.05)
+    parser.add_argument('--io-latency', type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.model_latency, args.io_latency))
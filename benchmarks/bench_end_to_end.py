@@ -0,0 +1,226 @@
+"""
+End-to-end offline benchmark of the whole request path.
+
+Every simulated browser session goes through the real handlers:
+
+    webSocketConnect.lambda_handler     -> FakeConnectionsTable.put_item
+    WebGuidingAgentAPIFunction.lambda_handler (one per turn)
+        -> FakeAgentRuntime.invoke_agent_runtime -> WebsiteGuidingAgent.invoke
+        -> ScriptedModel / tools -> FakeConnectionsTable / FakeManagementApi
+    webSocketDisconnect.lambda_handler  -> FakeConnectionsTable.delete_item
+
+The stub model replays realistic tool-call sequences per query: navigation,
+form filling, plain questions, and commands the intent router answers. The
+benchmark reports p50/p95/p99 latency per handler, tool calls, model calls and
+DynamoDB calls per turn, memory per session, and where turn time goes
+according to the handlers' trace records. A turn whose model call raises must
+still emit its trace, with the error. Use --fail-p95-ms to turn it
+into a regression gate.
+
+    python benchmarks/bench_end_to_end.py --sessions 50 --turns 6 --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import (FakeAgentRuntime, FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module, load_lambda_module)
+
+# (query, location) per turn; each session walks this conversation in order
+CONVERSATION = [
+    ('What services do you offer?', '/'),
+    ('How much is the professional plan?', '/services'),
+    ('Go to the contact page', '/services'),
+    ('Fill the form with my name Jane and email jane@example.com', '/contact'),
+    ('What are your business hours?', '/contact'),
+    ('Pause', '/contact'),
+]
+
+# Model plans keyed on a phrase of the query: (tool hops, spoken reply)
+PLANS = {
+    'services do you offer': (
+        [[('navigate_to_page', {'path': '/services'})], [('scroll_to_section', {'selector_id': 'services'})]],
+        'We offer web development, mobile apps, cloud solutions and digital marketing. '
+        'I have opened the services page for you.'),
+    'professional plan': (
+        [[('scroll_to_section', {'selector_id': 'pricing'})]],
+        'The Professional plan is $7,500 per project and is our most popular option.'),
+    'fill the form': (
+        [[('scroll_to_section', {'selector_id': 'contact-form'})],
+         [('fill_input', {'selector': '#agent-name', 'value': 'Jane'}),
+          ('fill_input', {'selector': '#agent-email', 'value': 'jane@example.com'})]],
+        "I've filled in your name and email. What would you like the message to say?"),
+    'business hours': (
+        [[('scroll_to_section', {'selector_id': 'business-hours'})]],
+        "We're open Monday to Friday, 9 AM to 6 PM."),
+}
+QUERY_PATTERN = re.compile(r"User's query: (.*)\. Location:")
+OUTAGE = 'Is the model down?'
+
+
+def script(prompt):
+    match = QUERY_PATTERN.search(prompt)
+    query = (match.group(1) if match else prompt).lower()
+    if OUTAGE.lower() in query:
+        raise RuntimeError('model unavailable')
+    for phrase, plan in PLANS.items():
+        if phrase in query:
+            return plan
+    return [], 'Happy to help with that.'
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99)}
+
+
+def time_breakdown(log_text, turns):
+    """Mean time per turn in each span, from the JSON trace records the handlers logged."""
+    totals = {}
+    for line in log_text.splitlines():
+        if not line.startswith('{'):
+            continue
+        record = json.loads(line)
+        if record.get('trace') not in ('api_request', 'agent_turn'):
+            continue
+        for span in record['spans']:
+            key = f"{record['trace']}.{span['name']}"
+            totals[key] = totals.get(key, 0.0) + span['duration_ms']
+    return {key: round(ms / turns, 1) for key, ms in sorted(totals.items(), key=lambda kv: -kv[1])}
+
+
+def check_failed_turn(agent_module, stream):
+    """A turn whose model call raises emits its trace with the error and unbinds it."""
+    payload = {'client_id': 'outage', 'prompt': OUTAGE, 'query': OUTAGE, 'location': '/', 'stream': stream}
+
+    async def turn():
+        try:
+            result = await agent_module.invoke(payload, None)
+            if stream:
+                async for _ in result:
+                    pass
+        except Exception:
+            pass
+        else:
+            raise AssertionError('the failing model turn did not raise')
+        if not stream:
+            assert agent_module.current_trace.get() is None, 'trace still bound after a failed turn'
+
+    logs = io.StringIO()
+    with contextlib.redirect_stdout(logs):
+        asyncio.run(turn())
+    records = [json.loads(line) for line in logs.getvalue().splitlines() if line.startswith('{')]
+    traces = [r for r in records if r.get('trace') == 'agent_turn' and r.get('client_id') == 'outage']
+    assert len(traces) == 1, f'failed turn emitted {len(traces)} traces'
+    assert traces[0]['status'] == 'error' and 'model unavailable' in traces[0]['error'], traces[0]
+
+
+def resident_bytes():
+    """Resident set size of this process (Linux)."""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def run(sessions, turns, concurrency, model_latency, io_latency, stream):
+    agent_module = load_agent_module()
+    env = {'CONNECTION_TABLE': 'WebSocketConnections', 'AGENT_ARN': 'arn:local'}
+    connect = load_lambda_module('lambda_for_websocket_api', 'webSocketConnect', **env)
+    disconnect = load_lambda_module('lambda_for_websocket_api', 'webSocketDisconnect', **env)
+    # Scripted turns go back to back, far faster than anyone speaks: no per-client rate limit
+    api_function = load_lambda_module('lambda_for_agent_invocation_api', 'WebGuidingAgentAPIFunction',
+                                      CLIENT_BURST='1000000', **env)
+
+    table = FakeConnectionsTable(latency=io_latency)
+    api = FakeManagementApi(latency=io_latency)
+    model = ScriptedModel(script, latency=model_latency, chunk_chars=24 if stream else None)
+    install_fakes(agent_module, table, api, model)
+    connect.table = table
+    disconnect.table = table
+    api_function.client = FakeAgentRuntime(agent_module)
+    api_function.connections_table = table
+    api_function.apigateway_client = api
+
+    latencies = {'connect': [], 'turn': [], 'disconnect': []}
+    failures = []
+
+    def timed(name, handler, event):
+        start = time.perf_counter()
+        response = handler(event, None)
+        latencies[name].append(time.perf_counter() - start)
+        if response['statusCode'] != 200:
+            failures.append((name, response))
+        return response
+
+    def session(i):
+        client_id = f'client-{i}'
+        connection_id = f'conn-{uuid.uuid4().hex[:8]}'
+        request_context = {'requestContext': {'connectionId': connection_id}}
+        timed('connect', connect.lambda_handler,
+              dict(request_context, queryStringParameters={'client_id': client_id}))
+        for query, location in (CONVERSATION * turns)[:turns]:
+            body = {'query': query, 'client_id': client_id, 'location': location, 'stream': stream}
+            timed('turn', api_function.lambda_handler, {'body': json.dumps(body)})
+        return client_id, connection_id, request_context
+
+    rss_before = resident_bytes()
+    logs = io.StringIO()
+    with contextlib.redirect_stdout(logs):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            opened = list(pool.map(session, range(sessions)))
+        elapsed = time.perf_counter() - start
+        rss_after = resident_bytes()
+        pool_metrics = agent_module.session_pool.metrics()
+        turn_dynamodb_calls = sum(table.calls.values()) - len(opened)
+        for _, _, request_context in opened:
+            timed('disconnect', disconnect.lambda_handler, request_context)
+
+    total_turns = sessions * turns
+    tool_calls = sum(len(api.commands(connection_id)) for _, connection_id, _ in opened)
+    report = {
+        'sessions': sessions,
+        'turns': total_turns,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'latency_ms': {name: {k: round(v, 1) for k, v in percentiles(samples).items()}
+                       for name, samples in latencies.items() if samples},
+        'tool_calls_per_turn': round(tool_calls / total_turns, 2),
+        'model_calls_per_turn': round(model.calls / total_turns, 2),
+        'dynamodb_calls_per_turn': round(turn_dynamodb_calls / total_turns, 2),
+        'websocket_frames_per_turn': round(api.calls / total_turns, 2),
+        'history_bytes_per_session': pool_metrics['bytes_held'] // max(pool_metrics['resident_sessions'], 1),
+        'rss_bytes_per_session': max(rss_after - rss_before, 0) // sessions,
+        'time_breakdown_ms_per_turn': time_breakdown(logs.getvalue(), total_turns),
+        'failures': len(failures),
+        'connections_left': len(table.items)
+    }
+    print(json.dumps(report, indent=2))
+    assert not failures, f'handler failures: {failures[:3]}'
+    assert not table.items, 'disconnect left connection rows behind'
+    check_failed_turn(agent_module, stream)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--turns', type=int, default=len(CONVERSATION))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--model-latency', type=float, default=0.2)
+    parser.add_argument('--io-latency', type=float, default=0.01)
+    parser.add_argument('--stream', action='store_true', help='Stream replies through the speech relay')
+    parser.add_argument('--fail-p95-ms', type=float, help='Exit non-zero if the turn p95 exceeds this')
+    args = parser.parse_args()
+    result = run(args.sessions, args.turns, args.concurrency, args.model_latency, args.io_latency, args.stream)
+    if args.fail_p95_ms and result['latency_ms']['turn']['p95'] > args.fail_p95_ms:
+        print(f"turn p95 {result['latency_ms']['turn']['p95']}ms exceeds {args.fail_p95_ms}ms")
+        sys.exit(1)
@@ -0,0 +1,121 @@
+"""
+Multi-tab fan-out of UI commands.
+
+Each client has several open tabs plus a stale row left behind by a reconnect
+(listed first, where the old single-connection lookup would pick it). Every
+command must reach every live tab. The stale row must be deleted in the same
+pass, with no failed tool call, and later turns must not touch it again. A
+tab that reconnects while the others stay live, and a new tab announced by its
+ping, must get the next command although the client's connections are
+cached. The benchmark reports per-send latency against the serial cost of posting to each
+tab in turn.
+
+    python benchmarks/bench_fanout.py --clients 10 --tabs 3 --io-latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+STEPS = [[('navigate_to_page', {'path': '/contact'})], [('scroll_to_section', {'selector_id': 'faq'})]]
+EXPECTED = [{'tool': name, 'args': args} for hop in STEPS for name, args in hop]
+
+
+def script(prompt):
+    return STEPS, 'Here are the FAQs.'
+
+
+async def check_new_tabs(agent_module, table, api, live):
+    """Connections added after the client's lookup was cached still receive commands."""
+    reconnecting, opening = list(live)[:2]
+    # One tab reconnects: its old connection is gone, the new one is not cached
+    old = live[reconnecting][0]
+    await agent_module.lookup_connection_ids(reconnecting)
+    api.gone.add(old)
+    new = table.connect(reconnecting)
+    result = await agent_module.send_message_to_client(reconnecting, {'tool': 'pause_call'})
+    expected = {old: 'gone', new: 'sent', **{c: 'sent' for c in live[reconnecting][1:]}}
+    assert result['connections'] == expected, f'reconnected tab: {result["connections"]}'
+    live[reconnecting] = live[reconnecting][1:] + [new]
+
+    # A new tab opens; its WebSocket open sends a ping to the agent
+    await agent_module.lookup_connection_ids(opening)
+    new = table.connect(opening)
+    await agent_module.invoke({'action': 'ping', 'client_id': opening}, None)
+    result = await agent_module.send_message_to_client(opening, {'tool': 'pause_call'})
+    assert result['connections'].get(new) == 'sent', f'new tab: {result["connections"]}'
+    live[opening].append(new)
+
+
+async def run(clients, tabs, io_latency):
+    agent_module = load_agent_module()
+    table = FakeConnectionsTable(latency=io_latency)
+    api = FakeManagementApi(latency=io_latency)
+    install_fakes(agent_module, table, api, ScriptedModel(script))
+
+    live, stale = {}, {}
+    for i in range(clients):
+        client_id = f'client-{i}'
+        stale[client_id] = table.connect(client_id, f'stale-{i}')
+        api.gone.add(stale[client_id])
+        live[client_id] = [table.connect(client_id) for _ in range(tabs)]
+
+    async def timed_send(client_id):
+        start = time.perf_counter()
+        result = await agent_module.send_message_to_client(client_id, {'tool': 'pause_call'})
+        return result, time.perf_counter() - start
+
+    # Direct sends: one fan-out to all tabs of each client
+    with contextlib.redirect_stdout(io.StringIO()):
+        timed = await asyncio.gather(*[timed_send(c) for c in live])
+    results = [result for result, _ in timed]
+    send_latency = statistics.median(seconds for _, seconds in timed)
+    for result in results:
+        assert result['success'] and result['delivered'] == tabs, result
+        assert list(result['connections'].values()).count('gone') == 1, result
+
+    assert not any(c in table.items for c in stale.values()), 'stale rows were not deleted'
+    table_calls_before = dict(table.calls)
+    posts_before = api.calls
+
+    # Agent turns: every tab gets every command, nothing goes to the stale row
+    logs = io.StringIO()
+    with contextlib.redirect_stdout(logs):
+        turns = await asyncio.gather(*[
+            agent_module.invoke({'client_id': c, 'prompt': 'faq please'}, None) for c in live])
+    for client_id, connection_ids in live.items():
+        for connection_id in connection_ids:
+            assert api.commands(connection_id)[1:] == EXPECTED, f'{connection_id} missed commands'
+    assert all('Error' not in str(t) for t in turns)
+
+    turn_queries = table.calls['query'] - table_calls_before['query']
+    # The turn metrics report how many lookups the connection cache answered
+    metrics = [json.loads(line) for line in logs.getvalue().splitlines() if '"turn_metrics"' in line]
+    assert metrics and metrics[-1]['connection_cache']['hits'] > 0, 'connection cache hits were not logged'
+    with contextlib.redirect_stdout(io.StringIO()):
+        await check_new_tabs(agent_module, table, api, live)
+    print(f'clients={clients} tabs={tabs} stale rows deleted={clients}')
+    # Serial: lookup, one post per row (stale included), then the delete
+    serial = (tabs + 3) * io_latency
+    print(f'fan-out send p50: {send_latency * 1000:.0f}ms (serial estimate: {serial * 1000:.0f}ms)')
+    posts = api.calls - posts_before
+    print(f'turns: {posts / clients:.0f} posts per turn for {tabs} tabs '
+          f'({posts / clients / tabs:.0f} frame(s) each), DynamoDB queries during turns={turn_queries}')
+    cache = metrics[-1]['connection_cache']
+    print(f"connection cache (turn metrics): hits={cache['hits']} misses={cache['misses']} "
+          f"invalidations={cache['invalidations']} hit_ratio={cache['hit_ratio']:.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--tabs', type=int, default=3)
+    parser.add_argument('--io-latency', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.tabs, args.io_latency))
@@ -0,0 +1,127 @@
+"""
+Input tokens per turn over one long voice session, with the full history
+resent every turn, with the sliding window of AGENT_HISTORY_MESSAGES
+messages, and with history compaction (old exchanges folded into a state
+summary, the last AGENT_HISTORY_EXCHANGES kept verbatim, under
+AGENT_HISTORY_TOKEN_BUDGET).
+
+The session cycles through a fixed set of scripted turns, so turn n and turn
+n + 10 send the same query and system prompt and differ only in history.
+With compaction, input tokens per turn must stay flat after the first few
+turns, the history must stay within the token budget, and the kept history
+must start with the state summary on a user prompt (no orphaned tool
+results). Tokens are estimated at four characters per token and include
+every model hop of the turn.
+
+    python benchmarks/bench_history_compaction.py --turns 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+# (query, location, tool hops)
+TURNS = [
+    ('What are your business hours?', '/', []),
+    ('Take me to the pricing section', '/', [
+        [('navigate_to_page', {'path': '/services'})],
+        [('scroll_to_section', {'selector_id': 'pricing'})]]),
+    ('How much is the professional plan?', '/services', []),
+    ('Fill the contact form with my email jane@example.com', '/contact', [
+        [('scroll_to_section', {'selector_id': 'contact-form'})],
+        [('fill_input', {'selector': '#agent-email', 'value': 'jane@example.com'})]]),
+    ('Show me the team', '/contact', [
+        [('navigate_to_page', {'path': '/about'})],
+        [('scroll_to_section', {'selector_id': 'team'})]]),
+    ('Who is the CTO?', '/about', []),
+    ('Click schedule demo', '/about', [
+        [('navigate_to_page', {'path': '/'})],
+        [('scroll_to_section', {'selector_id': 'cta'})],
+        [('click_element', {'selector': '#cta-schedule-demo-btn'})]]),
+    ('Where is your London office?', '/', [
+        [('navigate_to_page', {'path': '/contact'})],
+        [('scroll_to_section', {'selector_id': 'offices'})]]),
+    ('Subscribe me to the newsletter', '/contact', [
+        [('navigate_to_page', {'path': '/blog'})],
+        [('click_element', {'selector': '#newsletter-subscribe-btn'})]]),
+    ('Do you have any job openings?', '/blog', [
+        [('navigate_to_page', {'path': '/careers'})]]),
+]
+
+PLANS = {query: hops for query, _, hops in TURNS}
+
+
+def script(prompt):
+    query = prompt.split("User's query: ", 1)[-1].rsplit('. Location:', 1)[0]
+    return PLANS.get(query, []), 'Sure, here you go.'
+
+
+def measure(agent_module, turns, compaction, window):
+    agent_module.history_compaction_enabled = compaction
+    agent_module.max_history_messages = window
+    # Every turn goes to the model
+    agent_module.router_enabled = False
+    agent_module.response_cache_enabled = False
+    model = ScriptedModel(script)
+    install_fakes(agent_module, FakeConnectionsTable(), FakeManagementApi(), model)
+    agent_module.connections_table.connect('bench')
+
+    per_turn = []
+    for i in range(turns):
+        query, location, _ = TURNS[i % len(TURNS)]
+        before = model.input_tokens
+        payload = {
+            'client_id': 'bench',
+            'prompt': f"User's query: {query}. Location: {location}",
+            'query': query,
+            'location': location
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(agent_module.invoke(payload, None))
+        per_turn.append(model.input_tokens - before)
+    return per_turn, agent_module.session_pool.get('bench').agent
+
+
+def run(turns):
+    agent_module = load_agent_module()
+    from history_compaction import SUMMARY_HEADER, estimate_tokens, is_prompt
+    window_size = agent_module.max_history_messages
+    full, _ = measure(agent_module, turns, False, 10 ** 6)
+    window, _ = measure(agent_module, turns, False, window_size)
+    compacted, agent = measure(agent_module, turns, True, window_size)
+
+    print(f'{"turn":>4} {"full history":>13} {"sliding window":>15} {"compaction":>11}')
+    for i in range(0, turns, 5):
+        print(f'{i + 1:>4} {full[i]:>13} {window[i]:>15} {compacted[i]:>11}')
+    print(f'{"mean":>4} {statistics.mean(full):>13.0f} {statistics.mean(window):>15.0f} '
+          f'{statistics.mean(compacted):>11.0f}')
+
+    # Same query and system prompt one cycle apart: only history can differ
+    cycle = len(TURNS)
+    early = statistics.mean(compacted[cycle:2 * cycle])
+    late = statistics.mean(compacted[-cycle:])
+    # History the next turn would send, after its compaction stage
+    agent.conversation_manager.compact(agent)
+    history_tokens = estimate_tokens(agent.messages)
+    summary = agent.messages[0]['content'][0].get('text', '')
+    print(f'compaction: turns {cycle + 1}-{2 * cycle} mean {early:.0f}, last {cycle} turns mean {late:.0f} '
+          f'({(late / early - 1) * 100:+.1f}%); history {history_tokens} tokens '
+          f'(budget {agent_module.history_token_budget}); {agent.conversation_manager.stats()}')
+    print(summary)
+
+    assert late <= early * 1.05, 'input tokens per turn grow under compaction'
+    assert statistics.mean(full[-cycle:]) > statistics.mean(full[cycle:2 * cycle]), 'full history should grow'
+    assert history_tokens <= agent_module.history_token_budget, 'history over the token budget'
+    assert is_prompt(agent.messages[0]), 'kept history starts mid-exchange'
+    assert summary.startswith(SUMMARY_HEADER), 'state summary missing'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--turns', type=int, default=50)
+    args = parser.parse_args()
+    run(args.turns)
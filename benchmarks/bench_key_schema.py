@@ -0,0 +1,108 @@
+"""
+Connect-then-immediately-command with the two connections table layouts.
+
+- gsi: rows keyed on connectionId, the agent queries the eventually
+  consistent clientId-index (modelled with --gsi-lag of propagation delay)
+- client table: rows keyed (clientId, connectionId), read with one
+  strongly consistent single-partition query
+
+Each client runs the real $connect handler and the agent sends a UI command
+straight away, retrying every --retry-interval seconds until it is
+delivered. The benchmark reports how many first attempts failed and the time
+from connect to the first delivered command. It also checks the TTL attribute,
+that expired rows are ignored and refreshed rows kept, and that $disconnect
+removes both directions.
+
+    python benchmarks/bench_key_schema.py --clients 50 --gsi-lag 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+from fakes import (FakeClientConnectionsTable, FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module, load_lambda_module)
+
+
+async def connect_then_command(agent_module, connect, client_id, retry_interval):
+    event = {'requestContext': {'connectionId': f'conn-{client_id}'},
+             'queryStringParameters': {'client_id': client_id}}
+    start = time.perf_counter()
+    await asyncio.to_thread(connect.lambda_handler, event, None)
+    attempts = 0
+    while True:
+        attempts += 1
+        result = await agent_module.send_message_to_client(client_id, {'tool': 'pause_call'})
+        if result['success']:
+            return attempts, time.perf_counter() - start
+        await asyncio.sleep(retry_interval)
+
+
+async def measure(layout, clients, io_latency, gsi_lag, retry_interval):
+    agent_module = load_agent_module()
+    env = {'CONNECTION_TABLE': 'webSocketConnections'}
+    connect = load_lambda_module('lambda_for_websocket_api', 'webSocketConnect', **env)
+    disconnect = load_lambda_module('lambda_for_websocket_api', 'webSocketDisconnect', **env)
+
+    table = FakeConnectionsTable(latency=io_latency, gsi_lag=gsi_lag)
+    client_table = FakeClientConnectionsTable(latency=io_latency) if layout == 'client table' else None
+    install_fakes(agent_module, table, FakeManagementApi(latency=io_latency), ScriptedModel(lambda p: ([], '')),
+                  client_table=client_table)
+    for module in (connect, disconnect):
+        module.table = table
+        module.client_table = client_table
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = await asyncio.gather(*[
+            connect_then_command(agent_module, connect, f'{layout[0]}-{i}', retry_interval)
+            for i in range(clients)])
+        if client_table is not None:
+            check_ttl_and_disconnect(agent_module, disconnect, table, client_table)
+            await check_expiry(agent_module, client_table)
+
+    failed_first = sum(1 for attempts, _ in results if attempts > 1)
+    delays = sorted(seconds for _, seconds in results)
+    return failed_first, statistics.median(delays), delays[min(len(delays) - 1, int(len(delays) * 0.95))]
+
+
+def check_ttl_and_disconnect(agent_module, disconnect, table, client_table):
+    now = time.time()
+    for item in list(table.items.values()) + list(client_table.items.values()):
+        assert now < item['expiresAt'] <= now + agent_module.connection_ttl_seconds + 1, item
+    connection_id, client_id = next((k, v['clientId']) for k, v in table.items.items())
+    disconnect.lambda_handler({'requestContext': {'connectionId': connection_id}}, None)
+    assert connection_id not in table.items
+    assert (client_id, connection_id) not in client_table.items, 'disconnect left the clientId row behind'
+
+
+async def check_expiry(agent_module, client_table):
+    now = int(time.time())
+    client_table.put_item(Item={'clientId': 'ttl', 'connectionId': 'expired', 'expiresAt': now - 1})
+    client_table.put_item(Item={'clientId': 'ttl', 'connectionId': 'ageing',
+                                'expiresAt': now + agent_module.connection_ttl_seconds // 4})
+    agent_module.connection_cache.invalidate('ttl')
+    assert await agent_module.lookup_connection_ids('ttl') == ('ageing',), 'expired row was returned'
+    await asyncio.gather(*agent_module.ttl_refresh_tasks)
+    assert client_table.items[('ttl', 'ageing')]['expiresAt'] > now + agent_module.connection_ttl_seconds // 2
+
+
+async def run(clients, io_latency, gsi_lag, retry_interval):
+    print(f'{"layout":<14} {"first command failed":>21} {"p50 connect->delivered":>23} {"p95":>8}')
+    for layout in ('gsi', 'client table'):
+        failed, p50, p95 = await measure(layout, clients, io_latency, gsi_lag, retry_interval)
+        print(f'{layout:<14} {failed:>14}/{clients:<6} {p50 * 1000:>21.0f}ms {p95 * 1000:>6.0f}ms')
+        if layout == 'client table':
+            assert failed == 0, 'consistent lookup missed a just-connected client'
+    print('ttl, expiry, refresh and disconnect checks: ok')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--io-latency', type=float, default=0.01)
+    parser.add_argument('--gsi-lag', type=float, default=0.5)
+    parser.add_argument('--retry-interval', type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.io_latency, args.gsi_lag, args.retry_interval))
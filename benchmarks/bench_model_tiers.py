@@ -0,0 +1,175 @@
+"""
+Tiered model routing with two stub models: a fast light tier and a slower
+full tier.
+
+Each utterance must be routed to the expected tier. Light-tier attempts
+that produce an invalid tool plan (a hallucinated section ID, a tool call
+written as text, a model error) must escalate to the full tier, with no
+command from the failed attempt reaching the browser (also when its first
+hop was valid and a later one fails), none of it left in the conversation,
+and none of its text streamed, including text the light model says before
+the tool call that fails. The benchmark reports
+routing decisions, escalations and per-tier latency, and compares mean turn
+latency against sending every turn to the full tier.
+
+    python benchmarks/bench_model_tiers.py --light-latency 0.15 --full-latency 0.6
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import re
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+# (utterance, location, expected tier, expected escalation reason or None)
+UTTERANCES = [
+    ('Thanks!', '/', 'light', None),
+    ('What are your business hours?', '/contact', 'light', None),
+    ('How much is the professional plan?', '/services', 'light', None),
+    ('Where can I see your pricing?', '/', 'light', 'invalid_section'),
+    ('Where do I find job openings?', '/', 'light', 'tool_call_as_text'),
+    ('Who is your CTO?', '/about', 'light', 'model_error'),
+    ('Where is your team?', '/', 'light', 'invalid_section'),
+    ('Fill the contact form with my name Jane', '/contact', 'full', None),
+    ('Explain your cloud solutions in detail', '/services', 'full', None),
+    ('What services do you offer and then show me your pricing plans', '/', 'full', None),
+]
+
+# Plans keyed on a phrase of the query: (tool hops, reply)
+FULL_PLANS = {
+    'business hours': ([[('scroll_to_section', {'selector_id': 'business-hours'})]],
+                       "We're open Monday to Friday, 9 AM to 6 PM."),
+    'professional plan': ([[('scroll_to_section', {'selector_id': 'pricing'})]],
+                          'The Professional plan is $7,500 per project.'),
+    'pricing': ([[('navigate_to_page', {'path': '/services'})], [('scroll_to_section', {'selector_id': 'pricing'})]],
+                'Here are our pricing plans.'),
+    'job openings': ([[('navigate_to_page', {'path': '/careers'})]], 'Here are our open positions.'),
+    'your team': ([[('navigate_to_page', {'path': '/about'})], [('scroll_to_section', {'selector_id': 'team'})]],
+                  'Here is our team.'),
+    'fill the contact form': ([[('scroll_to_section', {'selector_id': 'contact-form'})],
+                               [('fill_input', {'selector': '#agent-name', 'value': 'Jane'})]],
+                              "I've filled in your name."),
+}
+# The light tier gets these wrong; everything else it answers like the full tier
+LIGHT_MISTAKES = {
+    # Speakable text, then an invalid call in the same response: the text must not be relayed
+    'pricing': ([["Sure, here's our pricing. ", ('navigate_to_page', {'path': '/services'}),
+                  ('scroll_to_section', {'selector_id': '#pricing'})]],
+                'Here are our pricing plans.'),
+    'job openings': ([], "navigate_to_page('/careers') Here are our open positions."),
+    # A valid first hop, then an invalid one: the first hop's command must not be sent
+    'your team': ([['Let me take you to the about page. ', ('navigate_to_page', {'path': '/about'})],
+                   [('scroll_to_section', {'selector_id': 'our-team'})]],
+                  'Here is our team.'),
+}
+QUERY_PATTERN = re.compile(r"User's query: (.*)\. Location:")
+
+
+def query_of(prompt):
+    match = QUERY_PATTERN.search(prompt)
+    return (match.group(1) if match else prompt).lower()
+
+
+def lookup(plans, query):
+    for phrase, plan in plans.items():
+        if phrase in query:
+            return plan
+    return [], 'Happy to help with that.'
+
+
+def full_script(prompt):
+    return lookup(FULL_PLANS, query_of(prompt))
+
+
+def light_script(prompt):
+    query = query_of(prompt)
+    if 'cto' in query:
+        raise RuntimeError('ThrottlingException: light tier unavailable')
+    return lookup(LIGHT_MISTAKES, query) if any(p in query for p in LIGHT_MISTAKES) else full_script(prompt)
+
+
+def valid_frames(agent_module, frames):
+    return all(agent_module.check_tool_call(f['tool'], f.get('args', {})) is None for f in frames)
+
+
+async def run_turns(agent_module, table, api, stream, tag):
+    """Run every utterance on a fresh session; returns per-turn (latency, frames, streamed text, messages)."""
+    results = []
+    for i, (utterance, location, _, _) in enumerate(UTTERANCES):
+        client_id = f'{tag}-{i}'
+        connection_id = table.connect(client_id)
+        payload = {'client_id': client_id, 'prompt': f"User's query: {utterance}. Location: {location}",
+                   'query': utterance, 'location': location, 'stream': stream}
+        started = asyncio.get_running_loop().time()
+        response = await agent_module.invoke(payload, None)
+        text = ''
+        if stream:
+            async for event in response:
+                text += event.get('text', '')
+        latency = asyncio.get_running_loop().time() - started
+        messages = agent_module.session_pool.get(client_id).agent.messages
+        results.append((latency, api.commands(connection_id), text, messages))
+    return results
+
+
+async def run(light_latency, full_latency, stream):
+    agent_module = load_agent_module()
+    table = FakeConnectionsTable()
+    api = FakeManagementApi()
+    light = ScriptedModel(light_script, latency=light_latency, chunk_chars=16)
+    full = ScriptedModel(full_script, latency=full_latency, chunk_chars=16)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        install_fakes(agent_module, table, api, full)
+        agent_module.model_tiers_enabled = False
+        baseline = await run_turns(agent_module, table, api, stream, 'full-only')
+
+        install_fakes(agent_module, table, api, full, light_model=light)
+        agent_module.model_tiers_enabled = True
+        tiered = await run_turns(agent_module, table, api, stream, 'tiered')
+
+    stats = agent_module.model_tier_router.stats()
+    failures = []
+    for (utterance, _, tier, reason), (_, frames, text, messages), (_, expected_frames, expected_text, _) in zip(
+            UTTERANCES, tiered, baseline):
+        if not valid_frames(agent_module, frames):
+            failures.append(f'{utterance!r}: invalid command reached the browser: {frames}')
+        if reason and frames != expected_frames:
+            failures.append(f'{utterance!r}: escalated turn sent {frames}, full tier sends {expected_frames}')
+        if any(leak in str(messages) for leak in ('navigate_to_page(', '#pricing', 'our-team', "Sure, here's")):
+            failures.append(f'{utterance!r}: failed light attempt left in the conversation')
+        if stream and reason and text != expected_text:
+            failures.append(f'{utterance!r}: streamed {text!r}, expected {expected_text!r}')
+    expected_decisions = {t: sum(1 for u in UTTERANCES if u[2] == t) for t in ('light', 'full')}
+    expected_escalations = {}
+    for *_, reason in UTTERANCES:
+        if reason:
+            expected_escalations[reason] = expected_escalations.get(reason, 0) + 1
+    if stats['decisions'] != expected_decisions:
+        failures.append(f"decisions {stats['decisions']} != {expected_decisions}")
+    if stats['escalations'] != expected_escalations:
+        failures.append(f"escalations {stats['escalations']} != {expected_escalations}")
+
+    mean = lambda turns: sum(t[0] for t in turns) / len(turns) * 1000
+    print(f"turns={len(UTTERANCES)} stream={stream} decisions={stats['decisions']} reasons={stats['reasons']}")
+    print(f"escalations={stats['escalations']} escalation_rate={stats['escalation_rate']:.0%}")
+    for outcome, latency in stats['latency'].items():
+        if latency['count']:
+            print(f"  {outcome:<9} turns={latency['count']:<2} p50={latency['p50_ms']:.0f}ms "
+                  f"p95={latency['p95_ms']:.0f}ms")
+    print(f"model calls: light={light.calls} full={full.calls}")
+    print(f"mean turn latency: full tier only {mean(baseline):.0f}ms, tiered {mean(tiered):.0f}ms")
+    for failure in failures:
+        print(f'FAILED {failure}')
+    assert not failures, f'{len(failures)} checks failed'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--light-latency', type=float, default=0.15)
+    parser.add_argument('--full-latency', type=float, default=0.6)
+    parser.add_argument('--stream', action='store_true', help='Stream replies and check no light-tier text leaks')
+    args = parser.parse_args()
+    asyncio.run(run(args.light_latency, args.full_latency, args.stream))
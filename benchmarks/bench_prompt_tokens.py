@@ -0,0 +1,94 @@
+"""
+Input tokens per turn with the whole knowledge base inlined in the system
+prompt (AGENT_KNOWLEDGE_TOP_K=0, the previous behaviour) versus retrieval of
+the relevant sections only.
+
+Every query runs in a fresh session with a scripted tool plan, so each model
+hop of the turn (including tool-result hops) is counted. Tokens are estimated
+at four characters per token.
+
+    python benchmarks/bench_prompt_tokens.py
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+# (query, location, tool hops)
+QUERIES = [
+    ('What are your business hours?', '/', []),
+    ('How much is the professional plan?', '/services', []),
+    ('Take me to the pricing section', '/', [
+        [('navigate_to_page', {'path': '/services'})],
+        [('scroll_to_section', {'selector_id': 'pricing'})]]),
+    ('Fill the contact form with my email jane@example.com', '/contact', [
+        [('scroll_to_section', {'selector_id': 'contact-form'})],
+        [('fill_input', {'selector': '#agent-email', 'value': 'jane@example.com'})]]),
+    ('Who is the CTO?', '/about', []),
+    ('Show me the team', '/', [
+        [('navigate_to_page', {'path': '/about'})],
+        [('scroll_to_section', {'selector_id': 'team'})]]),
+    ('Click schedule demo', '/', [
+        [('scroll_to_section', {'selector_id': 'cta'})],
+        [('click_element', {'selector': '#cta-schedule-demo-btn'})]]),
+    ('Where is your London office?', '/contact', [
+        [('scroll_to_section', {'selector_id': 'offices'})]]),
+    ('Subscribe me to the newsletter', '/blog', [
+        [('scroll_to_section', {'selector_id': 'newsletter'})],
+        [('click_element', {'selector': '#newsletter-subscribe-btn'})]]),
+    ('Thanks, that is all', '/', []),
+]
+
+PLANS = {query: hops for query, _, hops in QUERIES}
+
+
+def script(prompt):
+    query = prompt.split("User's query: ", 1)[-1].rsplit('. Location:', 1)[0]
+    return PLANS.get(query, []), 'Sure, here you go.'
+
+
+def measure(agent_module, top_k):
+    agent_module.knowledge_top_k = top_k
+    # Measure model prompts only; keep simple navigation away from the router
+    agent_module.router_enabled = False
+    model = ScriptedModel(script)
+    install_fakes(agent_module, FakeConnectionsTable(), FakeManagementApi(), model)
+    agent_module.connections_table.connect('bench')
+
+    per_turn = []
+    for i, (query, location, _) in enumerate(QUERIES):
+        before = model.input_tokens
+        payload = {
+            'client_id': 'bench',
+            'prompt': f"User's query: {query}. Location: {location}",
+            'query': query,
+            'location': location
+        }
+        agent_module.session_pool.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(agent_module.invoke(payload, None))
+        per_turn.append(model.input_tokens - before)
+    return per_turn
+
+
+def run():
+    agent_module = load_agent_module()
+    full = measure(agent_module, 0)
+    retrieved = measure(agent_module, 4)
+
+    print(f'{"query":<55} {"inline":>8} {"retrieval":>10}')
+    for (query, _, _), before, after in zip(QUERIES, full, retrieved):
+        print(f'{query:<55} {before:>8} {after:>10}')
+    mean_before, mean_after = statistics.mean(full), statistics.mean(retrieved)
+    print(f'{"mean input tokens per turn":<55} {mean_before:>8.0f} {mean_after:>10.0f} '
+          f'({(1 - mean_after / mean_before) * 100:.0f}% fewer)')
+    assert mean_after < mean_before
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description=__doc__).parse_args()
+    run()
@@ -0,0 +1,201 @@
+"""
+Request coalescing and admission control in the invocation Lambda, with and
+without the request gate.
+
+Scenarios, each driven through WebGuidingAgentAPIFunction.lambda_handler and
+the agent running in-process (FakeAgentRuntime), with the gate state in a
+FakeRequestTable shared by all requests (as the DynamoDB table is shared by
+all Lambda instances):
+
+- double fire: every client sends the same utterance twice, --gap seconds
+  apart (the speech recognizer firing twice). With the gate only one copy
+  reaches the agent; the other returns at once with "coalesced": true.
+- supersede: every client asks one question and, while it is being
+  answered, a different one. The older reply is returned with
+  "superseded": true (and, when streamed, stops being spoken); only the
+  newer one is spoken.
+- burst: one client sends --burst-size distinct queries back to back. At
+  most CLIENT_BURST (plus refill) reach the agent; the rest get 429 with
+  Retry-After.
+
+It also checks that two gates sharing the table (two Lambda instances)
+coalesce each other's duplicates.
+
+    python benchmarks/bench_request_gate.py --clients 10 --model-latency 0.4
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import (FakeAgentRuntime, FakeConnectionsTable, FakeManagementApi, FakeRequestTable,
+                   ScriptedModel, install_fakes, load_agent_module, load_lambda_module)
+
+REPLIES = {
+    'pricing': 'Our Starter plan is $2,500 per project. Professional is $7,500. Enterprise is a custom quote.',
+    'hours': "We're open Monday to Friday. Hours are 9 AM to 6 PM. We're closed on weekends.",
+}
+
+
+def script(prompt):
+    for word, reply in REPLIES.items():
+        if word in prompt:
+            return [], reply
+    return [], 'Happy to help with that.'
+
+
+def speech(api, connection_id):
+    """Sentences relayed to a connection, in order."""
+    return [f['text'] for _, c, f in api.log if c == connection_id and f.get('type') == 'speech' and 'text' in f]
+
+
+class Harness:
+    def __init__(self, api_function, agent_module, runtime, table, api, stream):
+        self.api_function = api_function
+        self.agent_module = agent_module
+        self.runtime = runtime
+        self.table = table
+        self.api = api
+        self.stream = stream
+
+    def send(self, client_id, query, delay=0.0):
+        """Returns (finished_at, status, response, body) of one request sent after delay seconds."""
+        time.sleep(delay)
+        body = {'client_id': client_id, 'query': query, 'location': '/', 'stream': self.stream}
+        response = self.api_function.lambda_handler({'body': json.dumps(body)}, None)
+        return time.perf_counter(), response['statusCode'], response, json.loads(response['body'])
+
+
+def make_harness(model_latency, stream, gate_enabled, burst, rate):
+    agent_module = load_agent_module()
+    api_function = load_lambda_module(
+        'lambda_for_agent_invocation_api', 'WebGuidingAgentAPIFunction', AGENT_ARN='arn:local')
+    from request_gate import DynamoDBRequestStore, RequestGate
+    table = FakeConnectionsTable()
+    api = FakeManagementApi()
+    model = ScriptedModel(script, latency=model_latency, chunk_chars=12, chunk_delay=0.02)
+    install_fakes(agent_module, table, api, model)
+    # Every turn goes to the model
+    agent_module.router_enabled = False
+    agent_module.response_cache_enabled = False
+    runtime = FakeAgentRuntime(agent_module)
+    api_function.client = runtime
+    api_function.connections_table = table
+    api_function.apigateway_client = api
+    api_function.request_gate_enabled = gate_enabled
+    api_function.request_gate = RequestGate(
+        DynamoDBRequestStore(FakeRequestTable(latency=0.003)), coalesce_seconds=3.0, rate=rate, burst=burst)
+    return Harness(api_function, agent_module, runtime, table, api, stream)
+
+
+def double_fire(h, clients, gap):
+    connections = {f'df-{i}': h.table.connect(f'df-{i}') for i in range(clients)}
+    calls = h.runtime.calls
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients * 2) as pool:
+        futures = {c: [pool.submit(h.send, c, 'What is your pricing?'),
+                       pool.submit(h.send, c, 'what is your pricing', gap)] for c in connections}
+        results = {c: [f.result() for f in fs] for c, fs in futures.items()}
+    answered = {c: sum(1 for _, _, _, body in rs if body['content']) for c, rs in results.items()}
+    done = [max(r[0] for r in rs) - started for rs in results.values()]
+    spoken = {c: len(speech(h.api, conn)) for c, conn in connections.items()}
+    return h.runtime.calls - calls, answered, statistics.median(done), spoken
+
+
+def supersede(h, clients, gap):
+    connections = {f'ss-{i}': h.table.connect(f'ss-{i}') for i in range(clients)}
+    with ThreadPoolExecutor(max_workers=clients * 2) as pool:
+        futures = {c: [pool.submit(h.send, c, 'What is your pricing?'),
+                       pool.submit(h.send, c, 'What are your hours?', gap)] for c in connections}
+        results = {c: [f.result()[3] for f in fs] for c, fs in futures.items()}
+    last_spoken = {}
+    for c, conn in connections.items():
+        texts = speech(h.api, conn)
+        last_spoken[c] = texts[-1] if texts else ''
+    return results, last_spoken
+
+
+def burst(h, size):
+    h.table.connect('burst')
+    started = time.perf_counter()
+    responses = [h.send('burst', f'Question number {i} about your company') for i in range(size)]
+    elapsed = time.perf_counter() - started
+    statuses = [status for _, status, _, _ in responses]
+    retry_after = [r['headers'].get('Retry-After') for _, status, r, _ in responses if status == 429]
+    return statuses, retry_after, elapsed
+
+
+def shared_store_check():
+    from request_gate import DynamoDBRequestStore, RequestGate
+    table = FakeRequestTable()
+    instance_a = RequestGate(DynamoDBRequestStore(table))
+    instance_b = RequestGate(DynamoDBRequestStore(table))
+    first = instance_a.admit('web-1', 'Where is your office?')
+    second = instance_b.admit('web-1', 'where is your office')
+    newer = instance_b.admit('web-1', 'What are your hours?')
+    return (first.decision, second.decision, newer.decision, newer.superseded,
+            instance_a.is_current(first), instance_a.finish(first), instance_b.finish(newer))
+
+
+def run(clients, model_latency, gap, burst_size, stream):
+    failures = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        baseline = make_harness(model_latency, stream, False, 5, 0.5)
+        base_calls, base_answered, base_done, base_spoken = double_fire(baseline, clients, gap)
+        base_statuses, _, _ = burst(baseline, burst_size)
+
+        gated = make_harness(model_latency, stream, True, 5, 0.5)
+        calls, answered, done, spoken = double_fire(gated, clients, gap)
+        results, last_spoken = supersede(gated, clients, model_latency / 2)
+        statuses, retry_after, elapsed = burst(gated, burst_size)
+        stats = gated.api_function.request_gate.stats()
+    shared = shared_store_check()
+
+    if calls != clients:
+        failures.append(f'double fire: {calls} agent calls for {clients} clients')
+    if any(n != 1 for n in answered.values()):
+        failures.append(f'double fire: answers per client {answered}')
+    sentences = REPLIES['pricing'].count('. ') + 1
+    if stream and any(n != sentences for n in spoken.values()):
+        failures.append(f'double fire: spoken sentences per client {spoken}')
+    for c, (older, newer) in results.items():
+        if not older.get('superseded') or older['content']:
+            failures.append(f'supersede: {c} older reply was delivered: {older}')
+        if newer.get('superseded') or not newer['content']:
+            failures.append(f'supersede: {c} newer reply missing: {newer}')
+        if stream and last_spoken[c] not in REPLIES['hours']:
+            failures.append(f'supersede: {c} last spoken sentence {last_spoken[c]!r}')
+    admitted = statuses.count(200)
+    allowed = 5 + int(elapsed * 0.5) + 1
+    if not 5 <= admitted <= allowed or statuses.count(429) != burst_size - admitted:
+        failures.append(f'burst: statuses {statuses}')
+    if any(not value or int(value) < 1 for value in retry_after):
+        failures.append(f'burst: Retry-After {retry_after}')
+    if shared != ('run', 'duplicate', 'run', True, False, False, True):
+        failures.append(f'shared store: {shared}')
+
+    print(f'clients={clients} model_latency={model_latency}s gap={gap}s stream={stream}')
+    print(f'double fire  agent calls: no gate {base_calls}, gate {calls}; '
+          f'answers per client: no gate {max(base_answered.values())}, gate {max(answered.values())}')
+    print(f'             p50 time to last response: no gate {base_done * 1000:.0f}ms, gate {done * 1000:.0f}ms')
+    print(f'supersede    older replies dropped: {sum(1 for o, _ in results.values() if o.get("superseded"))}/{clients}')
+    print(f'burst        {burst_size} queries: no gate {base_statuses.count(200)} run, '
+          f'gate {admitted} run / {statuses.count(429)} throttled in {elapsed:.1f}s')
+    print(f'gate stats: {stats}')
+    for failure in failures:
+        print(f'FAILED {failure}')
+    assert not failures, f'{len(failures)} checks failed'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--model-latency', type=float, default=0.4)
+    parser.add_argument('--gap', type=float, default=0.05, help='Seconds between the two copies of an utterance')
+    parser.add_argument('--burst-size', type=int, default=12)
+    parser.add_argument('--stream', action='store_true', help='Stream replies through the speech relay')
+    args = parser.parse_args()
+    run(args.clients, args.model_latency, args.gap, args.burst_size, args.stream)
@@ -0,0 +1,175 @@
+"""
+Response cache in front of the agent, with a stub model that takes
+--model-latency seconds per hop.
+
+A mix of repeated factual questions, follow-ups, personal statements and
+form filling is replayed across many sessions. Repeated factual questions
+must be answered from the cache without a model call, with the same reply
+and the same UI commands as the model turn that was cached; the others must
+always reach the model. Answers are cached per location: a question asked
+on its page (answered without navigation) and off it must not share an
+entry. The benchmark also checks that a change of the site knowledge
+invalidates entries, that entries expire after their TTL and that the cache
+stays within its size bound, and reports hit ratio and latency saved.
+
+    python benchmarks/bench_response_cache.py --sessions 20 --model-latency 0.3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import re
+import time
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+# (utterance, location, cacheable)
+UTTERANCES = [
+    ('What are your business hours?', '/contact', True),
+    ('How much is the professional plan?', '/services', True),
+    ('How much is the professional plan?', '/', True),
+    ('Where can I see your pricing?', '/', True),
+    ('Where can I see your pricing?', '/services', True),
+    ('Do you have any job openings?', '/', True),
+    ('Tell me more about that', '/careers', False),
+    ('My name is Jane', '/contact', False),
+    ('Fill the contact form with my name Jane', '/contact', False),
+]
+
+# Plans keyed on a phrase of the query: (tool hops, reply)
+PLANS = {
+    'business hours': ([[('scroll_to_section', {'selector_id': 'business-hours'})]],
+                       "We're open Monday to Friday, 9 AM to 6 PM."),
+    'professional plan': ([[('navigate_to_page', {'path': '/services'})],
+                           [('scroll_to_section', {'selector_id': 'pricing'})]],
+                          'The Professional plan is $7,500 per project.'),
+    'pricing': ([[('navigate_to_page', {'path': '/services'})], [('scroll_to_section', {'selector_id': 'pricing'})]],
+                'Here are our pricing plans.'),
+    'job openings': ([[('navigate_to_page', {'path': '/careers'})]], 'Here are our open positions.'),
+    'fill the contact form': ([[('scroll_to_section', {'selector_id': 'contact-form'})],
+                               [('fill_input', {'selector': '#agent-name', 'value': 'Jane'})]],
+                              "I've filled in your name."),
+}
+# Page of a plan's answer: asked there, the model explains without navigating
+ON_PAGE = {'professional plan': '/services'}
+QUERY_PATTERN = re.compile(r"User's query: (.*)\. Location: (.*)")
+
+
+def script(prompt):
+    match = QUERY_PATTERN.search(prompt)
+    query, location = (match.group(1), match.group(2)) if match else (prompt, None)
+    for phrase, (hops, reply) in PLANS.items():
+        if phrase in query.lower():
+            return ([], reply) if ON_PAGE.get(phrase) == location else (hops, reply)
+    return [], 'Happy to help with that.'
+
+
+async def ask(agent_module, table, api, client_id, utterance, location):
+    """Returns (latency, reply, frames) of one turn on a fresh connection."""
+    connection_id = table.connect(client_id)
+    payload = {'client_id': client_id, 'prompt': f"User's query: {utterance}. Location: {location}",
+               'query': utterance, 'location': location}
+    started = time.perf_counter()
+    response = await agent_module.invoke(payload, None)
+    latency = time.perf_counter() - started
+    reply = ''.join(block.get('text', '') for block in response['result']['content'])
+    return latency, reply, api.commands(connection_id)
+
+
+async def replay(agent_module, table, api, model, sessions, failures):
+    """Every session asks every utterance; the first answer per key is the reference."""
+    reference = {}
+    latencies = {'model': [], 'cache': []}
+    for s in range(sessions):
+        for i, (utterance, location, cacheable) in enumerate(UTTERANCES):
+            calls = model.calls
+            latency, reply, frames = await ask(agent_module, table, api, f'c{s}-{i}', utterance, location)
+            hit = model.calls == calls
+            latencies['cache' if hit else 'model'].append(latency)
+            key = (utterance, location)
+            if not cacheable and hit:
+                failures.append(f'{utterance!r}: answered from the cache')
+            if cacheable and s > 0 and not hit:
+                failures.append(f'{utterance!r} at {location}: repeat reached the model')
+            if key in reference and reference[key] != (reply, frames):
+                failures.append(f'{utterance!r} at {location}: sent {(reply, frames)}, expected {reference[key]}')
+            reference.setdefault(key, (reply, frames))
+    return latencies
+
+
+async def check_location(agent_module, table, api, model, failures):
+    """The answer given on a question's page (no navigation) is not replayed off it."""
+    agent_module.response_cache.clear()
+    utterance = 'How much is the professional plan?'
+    await ask(agent_module, table, api, 'on-page', utterance, ON_PAGE['professional plan'])
+    calls = model.calls
+    _, _, frames = await ask(agent_module, table, api, 'off-page-1', utterance, '/')
+    if model.calls == calls:
+        failures.append('answer cached on its page was replayed off it')
+    calls = model.calls
+    _, _, cached_frames = await ask(agent_module, table, api, 'off-page-2', utterance, '/')
+    if model.calls != calls or cached_frames != frames or not frames:
+        failures.append(f'off-page repeat: sent {cached_frames}, expected a cached replay of {frames}')
+
+
+async def check_invalidation(agent_module, table, api, model, failures):
+    agent_module.default_site.knowledge_hash = 'changed'
+    utterance, location, _ = UTTERANCES[0]
+    calls = model.calls
+    await ask(agent_module, table, api, 'invalidate-1', utterance, location)
+    refreshed = model.calls
+    await ask(agent_module, table, api, 'invalidate-2', utterance, location)
+    if refreshed == calls or model.calls != refreshed:
+        failures.append('knowledge change: stale entry served or fresh answer not cached')
+
+
+async def check_expiry_and_bound(agent_module, table, api, model, failures):
+    cache = agent_module.response_cache
+    cache.__init__(max_entries=2, ttl_seconds=0.05)
+    for i, (utterance, location, cacheable) in enumerate(UTTERANCES):
+        if cacheable:
+            await ask(agent_module, table, api, f'bound-{i}', utterance, location)
+    if cache.stats()['size'] > 2 or not cache.stats()['evictions']:
+        failures.append(f"size bound: {cache.stats()}")
+    utterance, location, _ = UTTERANCES[4]
+    await asyncio.sleep(0.06)
+    calls = model.calls
+    await ask(agent_module, table, api, 'expired', utterance, location)
+    if model.calls == calls or not cache.stats()['expirations']:
+        failures.append(f'TTL: expired entry served ({cache.stats()})')
+
+
+async def run(sessions, model_latency):
+    agent_module = load_agent_module()
+    table = FakeConnectionsTable()
+    api = FakeManagementApi()
+    model = ScriptedModel(script, latency=model_latency)
+    failures = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        install_fakes(agent_module, table, api, model)
+        latencies = await replay(agent_module, table, api, model, sessions, failures)
+        stats = agent_module.response_cache.stats()
+        await check_location(agent_module, table, api, model, failures)
+        await check_invalidation(agent_module, table, api, model, failures)
+        await check_expiry_and_bound(agent_module, table, api, model, failures)
+
+    mean = lambda samples: sum(samples) / len(samples) * 1000 if samples else 0.0
+    turns = sessions * len(UTTERANCES)
+    print(f"turns={turns} hits={stats['hits']} misses={stats['misses']} hit_ratio={stats['hit_ratio']:.0%} "
+          f"stores={stats['stores']} size={stats['size']}")
+    print(f"mean turn latency: model {mean(latencies['model']):.0f}ms, cache hit {mean(latencies['cache']):.1f}ms")
+    print(f"latency saved: {stats['latency_saved_ms']:.0f}ms total, {stats['latency_saved_ms_per_hit']:.0f}ms per hit")
+    print(f"model calls: {model.calls}")
+    for failure in failures:
+        print(f'FAILED {failure}')
+    assert not failures, f'{len(failures)} checks failed'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--model-latency', type=float, default=0.3)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.model_latency))
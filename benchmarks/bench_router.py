@@ -0,0 +1,85 @@
+"""
+Hit rate and latency of the deterministic intent router on a mixed set of
+voice utterances. Routed turns must send exactly the expected UI commands;
+everything else must fall through to the (stub) model.
+
+    python benchmarks/bench_router.py --model-latency 0.8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+# (utterance, location, expected frames if routed, or None for the model)
+UTTERANCES = [
+    ('Go to the contact page', '/', [{'tool': 'navigate_to_page', 'args': {'path': '/contact'}}]),
+    ('Scroll to pricing', '/services', [{'tool': 'scroll_to_section', 'args': {'selector_id': 'pricing'}}]),
+    ('Show me the team', '/', [
+        {'tool': 'navigate_to_page', 'args': {'path': '/about'}},
+        {'tool': 'scroll_to_section', 'args': {'selector_id': 'team'}}]),
+    ('Pause', '/blog', [{'tool': 'pause_call'}]),
+    ('Hold on please', '/', [{'tool': 'pause_call'}]),
+    ('End the call', '/', [{'tool': 'end_call'}]),
+    ('Take me to the blog', '/blog', []),
+    ('Can you open the FAQ', '/', [
+        {'tool': 'navigate_to_page', 'args': {'path': '/contact'}},
+        {'tool': 'scroll_to_section', 'args': {'selector_id': 'faq'}}]),
+    ('Go to the hero section', '/', [{'tool': 'scroll_to_section', 'args': {'selector_id': 'hero'}}]),
+    ('Go to the hero section', '/careers', None),   # hero exists on every page
+    ('What are your business hours?', '/', None),
+    ('How much does the professional plan cost?', '/services', None),
+    ('Fill the contact form with my name John', '/contact', None),
+    ('Tell me about your mobile app development', '/', None),
+    ('Who founded the company?', '/about', None),
+    ('Submit the form', '/contact', None),
+]
+
+
+def script(prompt):
+    return [], 'Here is what I found.'
+
+
+async def run(model_latency, io_latency):
+    agent_module = load_agent_module()
+    table = FakeConnectionsTable(latency=io_latency)
+    api = FakeManagementApi(latency=io_latency)
+    model = ScriptedModel(script, latency=model_latency)
+    install_fakes(agent_module, table, api, model)
+    router = agent_module.default_site.intent_router
+    router.__init__(agent_module.default_site.knowledge)
+
+    failures = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, (utterance, location, expected) in enumerate(UTTERANCES):
+            client_id = f'router-{i}'
+            connection_id = table.connect(client_id)
+            calls_before = model.calls
+            await agent_module.invoke({
+                'client_id': client_id,
+                'prompt': f"User's query: {utterance}. Location: {location}",
+                'query': utterance,
+                'location': location
+            }, None)
+            routed = model.calls == calls_before
+            frames = api.commands(connection_id)
+            if expected is None and routed or expected is not None and (not routed or frames != expected):
+                failures += 1
+                print(f'UNEXPECTED: {utterance!r} routed={routed} frames={frames}')
+
+    stats = router.stats()
+    print(f"utterances={len(UTTERANCES)} hit_rate={stats['hit_rate']:.0%} hits={stats['hits']} "
+          f"model_calls={model.calls}")
+    for path, latency in stats['latency'].items():
+        print(f"  {path:<6} turns={latency['count']:<3} p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms")
+    assert failures == 0, f'{failures} utterances routed unexpectedly'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-latency', type=float, default=0.5)
+    parser.add_argument('--io-latency', type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(run(args.model_latency, args.io_latency))
@@ -0,0 +1,299 @@
+"""
+Multi-site agent: per-site first-hit compile cost against steady-state
+lookup cost, with --sites generated sites and at most --max-sites resident.
+
+Each generated site is site_knowledge.json under its own name, with its
+paths, section IDs and selectors prefixed (/s7/contact, s7-pricing,
+#s7-agent-email), written to a temporary AGENT_SITES_DIR.
+
+On the registry alone (agent_module.load_site, no model): time to load and
+compile each site on first use, time to look up a resident site, resident
+count and memory as the number of sites grows past the bound, one load for
+concurrent first uses of one key, and no repeated loads for unknown or
+malformed keys, or for site files that do not parse or lack their pages
+(which are logged).
+
+Through invoke, with a stub model taking --model-latency seconds per hop: a
+routed navigation per site, first request (site compiled off the event loop)
+against a second one. Also checked: every routed command uses the site's own
+paths, a tool call naming another site's page is rejected before dispatch,
+cached answers are not shared between sites, and an unknown site, or a
+"site" that is not a string, gets an error without a model call. The
+invocation Lambda answers 400 to a "site" that is not a valid key.
+
+    python benchmarks/bench_site_registry.py --sites 300 --max-sites 64
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from fakes import (AGENT_DIR, FakeConnectionsTable, FakeManagementApi, ScriptedModel, install_fakes,
+                   load_agent_module, load_lambda_module)
+
+# Request values for "site" that name no site; the agent must not fail on them
+MALFORMED_SITES = [['s1'], 7, {'key': 's1'}]
+
+QUERY_PATTERN = re.compile(r"User's query: (.*)\. Location:")
+
+
+def site_key(i):
+    return f's{i}'
+
+
+def generate_site(base, i):
+    """site_knowledge.json with the site's name and its own paths, section IDs and selectors."""
+    prefix = site_key(i)
+    knowledge = json.loads(json.dumps(base))
+    knowledge['site'] = f'Example Site {i}'
+    for page in knowledge['pages']:
+        page['path'] = f"/{prefix}{page['path']}".rstrip('/')
+        for section in page['sections']:
+            section['id'] = f"{prefix}-{section['id']}"
+            for selector in section['selectors']:
+                value = selector['selector']
+                selector['selector'] = f'{value[0]}{prefix}-{value[1:]}'
+    return knowledge
+
+
+def write_sites(directory, count):
+    with open(os.path.join(AGENT_DIR, 'site_knowledge.json')) as f:
+        base = json.load(f)
+    for i in range(count):
+        with open(os.path.join(directory, f'{site_key(i)}.json'), 'w') as f:
+            json.dump(generate_site(base, i), f)
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def traced_memory(agent_module, sites, max_sites):
+    """
+    Memory held by a fresh registry after its first max_sites sites and after
+    all of them. Traced separately: tracemalloc slows compilation severalfold.
+    """
+    registry = agent_module.SiteRegistry(agent_module.load_site, agent_module.system_prompt_template,
+                                         max_sites=max_sites)
+    memory_at = {}
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(sites):
+        registry.get(site_key(i))
+        if i + 1 in (max_sites, sites):
+            # re keeps compiled patterns (the intent routers' among them) in
+            # its own bounded cache, which is not the registry's to limit
+            re.purge()
+            gc.collect()
+            memory_at[i + 1] = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return memory_at
+
+
+def run_registry(agent_module, sites, max_sites, lookups, failures):
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return agent_module.load_site(key)
+
+    registry = agent_module.SiteRegistry(load, agent_module.system_prompt_template, max_sites=max_sites)
+    first_hits = []
+    for i in range(sites):
+        started = time.perf_counter()
+        site = registry.get(site_key(i))
+        first_hits.append(time.perf_counter() - started)
+        if site is None or site.name != f'Example Site {i}':
+            failures.append(f'site {i} did not load')
+    stats = registry.stats()
+    memory_at = traced_memory(agent_module, sites, max_sites)
+
+    resident = [site_key(i) for i in range(sites - max_sites, sites)]
+    steady = []
+    for _ in range(lookups // len(resident)):
+        for key in resident:
+            started = time.perf_counter()
+            registry.lookup(key)
+            steady.append(time.perf_counter() - started)
+    reloads = len(loads)
+    for key in resident:
+        registry.get(key)
+    if len(loads) != reloads:
+        failures.append(f'{len(loads) - reloads} resident sites were loaded again')
+
+    print(f'registry: sites={sites} max_sites={max_sites}')
+    print(f'  first hit (load + compile)  p50 {percentile(first_hits, 0.5) * 1000:7.2f}ms  '
+          f'p95 {percentile(first_hits, 0.95) * 1000:7.2f}ms  '
+          f'(compile only p50 {stats["compile_p50_ms"]:.2f}ms)')
+    print(f'  resident lookup             p50 {percentile(steady, 0.5) * 1e6:7.2f}us  '
+          f'p95 {percentile(steady, 0.95) * 1e6:7.2f}us  ({len(steady)} lookups)')
+    print(f'  resident={stats["resident_sites"]} evictions={stats["evictions"]} '
+          f'bytes_held={stats["bytes_held"]}')
+    print(f'  traced memory: {memory_at[max_sites] / 1e6:.1f}MB after {max_sites} sites, '
+          f'{memory_at[sites] / 1e6:.1f}MB after {sites}')
+    if stats['resident_sites'] != max_sites or stats['evictions'] != sites - max_sites:
+        failures.append(f'bound not kept: {stats}')
+    if memory_at[sites] > memory_at[max_sites] * 1.25:
+        failures.append('memory grew past the site bound')
+    if percentile(steady, 0.5) * 20 > percentile(first_hits, 0.5):
+        failures.append('resident lookup is not much cheaper than a first hit')
+
+    # Concurrent first uses of one evicted site, and keys that name no site
+    loads.clear()
+    threads = [threading.Thread(target=registry.get, args=(site_key(0),)) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for key in ['missing', 'missing', '../site_knowledge', 'S0', '']:
+        if registry.get(key) is not None:
+            failures.append(f'{key!r} resolved to a site')
+    print(f'  16 concurrent first uses of one site: {loads.count(site_key(0))} load(s); '
+          f'unknown key loaded {loads.count("missing")} time(s) for 2 requests; '
+          f'malformed keys loaded {len(loads) - loads.count(site_key(0)) - loads.count("missing")} time(s)')
+    if loads != [site_key(0), 'missing']:
+        failures.append(f'unexpected loads {loads}')
+
+    # Site files that are not valid knowledge: one without pages, one not JSON
+    with open(os.path.join(agent_module.sites_dir, 'no-pages.json'), 'w') as f:
+        json.dump({'site': 'No Pages'}, f)
+    with open(os.path.join(agent_module.sites_dir, 'garbled.json'), 'w') as f:
+        f.write('{"site": ')
+    loads.clear()
+    logs = io.StringIO()
+    with contextlib.redirect_stdout(logs):
+        resolved = [registry.get(key) for key in ['no-pages', 'garbled'] * 2]
+    logged = logs.getvalue().count('"site_malformed"')
+    print(f'  malformed site files: loaded {len(loads)} time(s) for 4 requests, logged {logged}')
+    if any(site is not None for site in resolved):
+        failures.append('a malformed site file resolved to a site')
+    if loads != ['no-pages', 'garbled'] or logged != 2:
+        failures.append(f'malformed site files: loads {loads}, {logged} logged')
+
+
+async def ask(agent_module, table, client_id, site, query, location):
+    """Returns (invoke result, seconds, connection ID)."""
+    connection_id = table.connect(client_id)
+    payload = {'client_id': client_id, 'site': site, 'query': query, 'location': location,
+               'prompt': f"User's query: {query}. Location: {location}"}
+    started = time.perf_counter()
+    result = await agent_module.invoke(payload, None)
+    return result, time.perf_counter() - started, connection_id
+
+
+async def run_invoke(agent_module, sites, model_latency, failures):
+    table = FakeConnectionsTable()
+    api = FakeManagementApi()
+    # Navigates to site 1's contact page whatever site the user is on
+    plans = {
+        'other site': ([[('navigate_to_page', {'path': '/s1/contact'})]], 'Here it is.'),
+        'business hours': ([], "We're open Monday to Friday, 9 AM to 6 PM."),
+    }
+
+    def script(prompt):
+        match = QUERY_PATTERN.search(prompt)
+        query = (match.group(1) if match else prompt).lower()
+        return next((plan for phrase, plan in plans.items() if phrase in query), ([], 'Happy to help.'))
+
+    model = ScriptedModel(script, latency=model_latency)
+    install_fakes(agent_module, table, api, model)
+    first, warm = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(sites):
+            key = site_key(i)
+            for client_id, samples in ((f'{key}-first', first), (f'{key}-warm', warm)):
+                _, seconds, connection_id = await ask(agent_module, table, client_id, key,
+                                                      'Go to the contact page', f'/{key}')
+                samples.append(seconds)
+                frames = api.commands(connection_id)
+                expected = [{'tool': 'navigate_to_page', 'args': {'path': f'/{key}/contact'}}]
+                if frames != expected:
+                    failures.append(f'{key}: sent {frames}')
+        calls = model.calls
+
+        # Site 1's page is not a valid path on site 2
+        _, _, connection_id = await ask(agent_module, table, 'cross-site', site_key(2),
+                                        'Open the other site contact page', '/s2')
+        crossed = api.commands(connection_id)
+        # The same question on two sites reaches the model once per site
+        calls_before = model.calls
+        for client_id, key in [('hours-a', site_key(3)), ('hours-b', site_key(4)), ('hours-c', site_key(3))]:
+            await ask(agent_module, table, client_id, key, 'What are your business hours?', f'/{key}')
+        hours_calls = model.calls - calls_before
+        unknown, _, _ = await ask(agent_module, table, 'unknown', 'no-such-site', 'Go to the contact page', '/')
+        malformed = [(await ask(agent_module, table, 'malformed', value, 'Go to the contact page', '/'))[0]
+                     for value in MALFORMED_SITES]
+    stats = agent_module.site_registry.stats()
+
+    print(f'invoke: {sites} sites, routed navigation, model_latency={model_latency}s')
+    print(f'  first request per site      p50 {percentile(first, 0.5) * 1000:7.2f}ms  '
+          f'p95 {percentile(first, 0.95) * 1000:7.2f}ms')
+    print(f'  second request per site     p50 {percentile(warm, 0.5) * 1000:7.2f}ms  '
+          f'p95 {percentile(warm, 0.95) * 1000:7.2f}ms')
+    print(f'  resident={stats["resident_sites"]} loads={stats["loads"]} evictions={stats["evictions"]} '
+          f'model calls for routed turns={calls}')
+    print(f'  other site\'s path sent to the browser: {crossed}; model calls for one question on '
+          f'two sites (asked 3 times): {hours_calls}; unknown site: {unknown}')
+    if calls:
+        failures.append(f'{calls} routed turns reached the model')
+    if crossed:
+        failures.append(f"another site's path was dispatched: {crossed}")
+    if hours_calls != 2:
+        failures.append(f'expected 2 model calls across sites, got {hours_calls}')
+    if 'error' not in unknown:
+        failures.append(f'unknown site answered: {unknown}')
+    for value, result in zip(MALFORMED_SITES, malformed):
+        if 'error' not in result:
+            failures.append(f'site {value!r} answered: {result}')
+    if stats['resident_sites'] > agent_module.site_registry.max_sites:
+        failures.append(f'{stats["resident_sites"]} sites resident')
+    if statistics.median(warm) > statistics.median(first):
+        failures.append('a resident site was slower than a first hit')
+
+
+def check_lambda_sites(failures):
+    """The invocation Lambda rejects a "site" that is not a valid key before invoking the agent."""
+    api_function = load_lambda_module('lambda_for_agent_invocation_api', 'WebGuidingAgentAPIFunction',
+                                      AGENT_ARN='arn:local')
+    for value in MALFORMED_SITES + ['../site_knowledge', 'S0', '']:
+        body = {'query': 'Go to the contact page', 'client_id': 'web-1', 'location': '/', 'site': value}
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = api_function.lambda_handler({'body': json.dumps(body)}, None)
+        if response['statusCode'] != 400:
+            failures.append(f'invocation Lambda answered {response["statusCode"]} for site {value!r}')
+
+
+def run(sites, max_sites, lookups, model_latency):
+    with tempfile.TemporaryDirectory() as directory:
+        write_sites(directory, sites)
+        os.environ['AGENT_SITES_DIR'] = directory
+        os.environ['AGENT_MAX_SITES'] = str(max_sites)
+        agent_module = load_agent_module()
+        failures = []
+        run_registry(agent_module, sites, max_sites, lookups, failures)
+        asyncio.run(run_invoke(agent_module, sites, model_latency, failures))
+        check_lambda_sites(failures)
+    for failure in failures:
+        print(f'FAILED {failure}')
+    assert not failures, f'{len(failures)} checks failed'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sites', type=int, default=300)
+    parser.add_argument('--max-sites', type=int, default=64)
+    parser.add_argument('--lookups', type=int, default=50000)
+    parser.add_argument('--model-latency', type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.sites, args.max_sites, args.lookups, args.model_latency)
@@ -0,0 +1,161 @@
+"""
+Cold-start benchmark for every entry point.
+
+Each entry point is started in a fresh Python process (like a new Lambda
+execution environment or AgentCore container) that reports:
+
+- import_ms: importing the handler module, including client construction
+- first_ms / second_ms: the first and second invocation against local fakes
+
+For the agent the first invocation is the {"action": "ping"} warm-up, run
+with the real Bedrock model ID (the model is never called, but its client is
+built). It also reports a warm-up on a second session (shared model client),
+and the first turn of a session with and without a preceding ping, with the
+stub model.
+
+    python benchmarks/bench_startup.py --repeat 5 --fail-import-ms 2000
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+# fakes (and with it boto3 and strands) is only imported after the timed
+# import, so each measurement starts from a bare interpreter.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AWS_ENV = {'AWS_DEFAULT_REGION': 'us-east-1', 'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing'}
+LAMBDA_ENV = {'CONNECTION_TABLE': 'WebSocketConnections', 'AGENT_ARN': 'arn:local'}
+
+
+class StaticRuntime:
+    """bedrock-agentcore client stand-in with a canned reply (no agent import)."""
+
+    def invoke_agent_runtime(self, agentRuntimeArn, runtimeSessionId, payload, **kwargs):
+        request = json.loads(payload)
+        result = ({'status': 'warm'} if request.get('action') == 'ping'
+                  else {'result': {'role': 'assistant', 'content': [{'text': 'Happy to help.'}]}})
+        return {'contentType': 'application/json', 'response': io.BytesIO(json.dumps(result).encode('utf-8'))}
+
+
+def timed(call):
+    start = time.perf_counter()
+    result = call()
+    return round((time.perf_counter() - start) * 1000, 2), result
+
+
+def import_entry_point(folder, name):
+    for key, value in {**AWS_ENV, **LAMBDA_ENV}.items():
+        os.environ.setdefault(key, value)
+    sys.path.insert(0, os.path.join(REPO_ROOT, folder))
+    return timed(lambda: importlib.import_module(name))
+
+
+def child_connect():
+    import_ms, module = import_entry_point('serverless-backend/lambda_for_websocket_api', 'webSocketConnect')
+    from fakes import FakeConnectionsTable
+    module.table = FakeConnectionsTable()
+    event = lambda: {'requestContext': {'connectionId': uuid.uuid4().hex},
+                     'queryStringParameters': {'client_id': 'client-1'}}
+    first_ms, _ = timed(lambda: module.lambda_handler(event(), None))
+    second_ms, _ = timed(lambda: module.lambda_handler(event(), None))
+    return {'import_ms': import_ms, 'first_ms': first_ms, 'second_ms': second_ms}
+
+
+def child_disconnect():
+    import_ms, module = import_entry_point('serverless-backend/lambda_for_websocket_api', 'webSocketDisconnect')
+    from fakes import FakeConnectionsTable
+    module.table = table = FakeConnectionsTable()
+    for connection_id in ('a', 'b'):
+        table.put_item(Item={'connectionId': connection_id, 'clientId': 'client-1'})
+    event = lambda connection_id: {'requestContext': {'connectionId': connection_id}}
+    first_ms, _ = timed(lambda: module.lambda_handler(event('a'), None))
+    second_ms, _ = timed(lambda: module.lambda_handler(event('b'), None))
+    return {'import_ms': import_ms, 'first_ms': first_ms, 'second_ms': second_ms}
+
+
+def child_api():
+    import_ms, module = import_entry_point('serverless-backend/lambda_for_agent_invocation_api',
+                                          'WebGuidingAgentAPIFunction')
+    module.client = StaticRuntime()
+    event = lambda body: {'body': json.dumps(dict(body, client_id='client-1'))}
+    first_ms, _ = timed(lambda: module.lambda_handler(event({'warmup': True}), None))
+    second_ms, _ = timed(lambda: module.lambda_handler(event({'query': 'Hello', 'location': '/'}), None))
+    return {'import_ms': import_ms, 'first_ms': first_ms, 'second_ms': second_ms}
+
+
+def child_agent():
+    import_ms, module = import_entry_point('WebsiteGuidingAgent', 'WebsiteGuidingAgent')
+    from fakes import FakeConnectionsTable, FakeManagementApi, ScriptedModel, install_fakes
+    table = FakeConnectionsTable()
+    table.put_item(Item={'connectionId': 'conn-1', 'clientId': 'client-1'})
+    module.connections_table = table
+    module.apigateway_client = FakeManagementApi()
+
+    loop = asyncio.new_event_loop()
+    invoke = lambda payload, session_id: loop.run_until_complete(
+        module.invoke(dict(payload, client_id='client-1'), SimpleNamespace(session_id=session_id)))
+    ping = {'action': 'ping'}
+    # Real model ID: builds the Bedrock client but never calls it
+    first_ms, report = timed(lambda: invoke(ping, 'session-a'))
+    second_ms, _ = timed(lambda: invoke(ping, 'session-b'))
+    assert report['status'] == 'warm' and report['session_created'], report
+
+    install_fakes(module, table, FakeManagementApi(), ScriptedModel(lambda prompt: ([], 'Happy to help.')))
+    turn = {'prompt': 'What do you do?', 'query': 'What do you do?', 'location': '/'}
+    cold_turn_ms, _ = timed(lambda: invoke(turn, 'session-cold'))
+    invoke(ping, 'session-warm')
+    warm_turn_ms, _ = timed(lambda: invoke(turn, 'session-warm'))
+    loop.close()
+    return {'import_ms': import_ms, 'first_ms': first_ms, 'second_ms': second_ms,
+            'first_turn_cold_session_ms': cold_turn_ms, 'first_turn_after_ping_ms': warm_turn_ms}
+
+
+ENTRY_POINTS = {
+    'webSocketConnect': child_connect,
+    'webSocketDisconnect': child_disconnect,
+    'WebGuidingAgentAPIFunction': child_api,
+    'WebsiteGuidingAgent': child_agent,
+}
+
+
+def measure(name, repeat):
+    """Median of each metric over repeat fresh processes."""
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, __file__, '--child', name],
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--fail-import-ms', type=float, help='Exit non-zero if any median import exceeds this')
+    parser.add_argument('--child', choices=ENTRY_POINTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = ENTRY_POINTS[args.child]()
+        print(json.dumps(result))
+        sys.exit(0)
+
+    report = {name: measure(name, args.repeat) for name in ENTRY_POINTS}
+    print(json.dumps(report, indent=2))
+    agent = report['WebsiteGuidingAgent']
+    assert agent['second_ms'] < agent['first_ms'], 'second session did not reuse the model client'
+    slow = {name: r['import_ms'] for name, r in report.items()
+            if args.fail_import_ms and r['import_ms'] > args.fail_import_ms}
+    if slow:
+        print(f'imports over {args.fail_import_ms}ms: {slow}')
+        sys.exit(1)
@@ -0,0 +1,98 @@
+"""
+Time-to-first-spoken-sentence with and without streaming.
+
+A stub model streams a reply (including a <thinking> span) in small chunks.
+The buffered path waits for the whole invoke result. The streaming path runs
+the agent's async-generator entrypoint and relays it through the invocation
+Lambda's relay_stream, which posts one speech frame per sentence to a fake
+Management API; the first frame's arrival time is the time to first sentence.
+The prompt asks for an explanation, so it goes to the full model tier, whose
+text streams as it arrives: the first sentence must arrive well before the
+stream ends. (Light-tier text is held until its attempt has passed; see
+bench_model_tiers.py --stream.)
+
+    python benchmarks/bench_streaming.py
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import threading
+import time
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, QueueBody, ScriptedModel,
+                   install_fakes, load_agent_module, load_lambda_module)
+
+REPLY = ('<thinking>The user wants pricing; they are on the services page so no '
+         'navigation is needed.</thinking>Our Starter plan is $2,500 per project. '
+         'Professional is $7,500 and is the most popular. Enterprise is a custom '
+         'quote with a dedicated project manager. Want me to scroll to pricing?')
+
+
+PROMPT = 'Explain your pricing plans'
+
+
+def script(prompt):
+    return [], REPLY
+
+
+async def produce(agent_module, body, payload):
+    stream = await agent_module.invoke(payload, None)
+    async for event in stream:
+        body.lines.put(f'data: {json.dumps(event, default=str)}'.encode('utf-8'))
+    body.lines.put(None)
+
+
+def run(chunk_chars, chunk_delay, model_latency):
+    agent_module = load_agent_module()
+    api_function = load_lambda_module(
+        'lambda_for_agent_invocation_api', 'WebGuidingAgentAPIFunction', AGENT_ARN='arn:local')
+    table = FakeConnectionsTable()
+    api = FakeManagementApi()
+    model = ScriptedModel(script, latency=model_latency, chunk_chars=chunk_chars, chunk_delay=chunk_delay)
+    install_fakes(agent_module, table, api, model)
+    api_function.connections_table = table
+    api_function.apigateway_client = api
+    connection_id = table.connect('web-1')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Buffered: nothing can be spoken until invoke returns
+        start = time.perf_counter()
+        asyncio.run(agent_module.invoke({'client_id': 'web-1', 'prompt': PROMPT}, None))
+        buffered = time.perf_counter() - start
+
+        # Streaming: agent generator -> SSE lines -> relay_stream -> speech frames
+        body = QueueBody()
+        payload = {'client_id': 'web-1', 'prompt': PROMPT, 'stream': True}
+        producer = threading.Thread(target=lambda: asyncio.run(produce(agent_module, body, payload)))
+        trace = api_function.TurnTrace('bench-streaming')
+        start = trace.start
+        producer.start()
+        content, delivered = api_function.relay_stream(body, 'web-1', trace)
+        total = time.perf_counter() - start
+        producer.join()
+
+    speech = [(t, f) for t, c, f in api.log if c == connection_id and f.get('type') == 'speech']
+    first_sentence = speech[0][0] - start
+    texts = [f['text'] for _, f in speech if 'text' in f]
+
+    assert delivered and speech[-1][1].get('final'), 'speech stream was not finalised'
+    assert all('thinking' not in t for t in texts), 'reasoning leaked into speech'
+    assert content == ' '.join(texts)
+    assert first_sentence < total * 0.75, \
+        f'first sentence at {first_sentence * 1000:.0f}ms of {total * 1000:.0f}ms: reply was held back'
+
+    print(f'buffered: first_sentence={buffered * 1000:.0f}ms')
+    print(f'streaming: first_sentence={first_sentence * 1000:.0f}ms total={total * 1000:.0f}ms '
+          f'sentences={len(texts)}')
+    print(f'improvement: {buffered / first_sentence:.1f}x faster to first sentence')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunk-chars', type=int, default=6)
+    parser.add_argument('--chunk-delay', type=float, default=0.01)
+    parser.add_argument('--model-latency', type=float, default=0.2)
+    args = parser.parse_args()
+    run(args.chunk_chars, args.chunk_delay, args.model_latency)
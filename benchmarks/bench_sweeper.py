@@ -0,0 +1,95 @@
+"""
+Stale-connection sweeper throughput and correctness.
+
+Fills the connections tables with live rows, gone rows (closed without
+$disconnect), live rows past their expiresAt (open longer than the TTL, not
+refreshed) and rows whose probe fails with a server error. Then runs the sweeper Lambda with parallel segments,
+GetConnection probes and BatchWriteItem deletes. A fraction of the write
+requests come back unprocessed, to exercise the retry path. Every dead row
+must be deleted from both tables and every live row kept: a gone row, or
+an expired row whose probe failed, is dead; anything else is kept. The write rate
+must stay within the configured budget.
+
+    python benchmarks/bench_sweeper.py --rows 20000 --dead 0.3 --segments 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+
+from fakes import (FakeClientConnectionsTable, FakeConnectionsTable, FakeDynamoDB, FakeManagementApi,
+                   load_lambda_module)
+
+
+def populate(rows, dead_fraction, table, client_table, api):
+    now = int(time.time())
+    live, dead = set(), set()
+    for i in range(rows):
+        connection_id = f'conn-{i:07d}'
+        # A quarter of the rows are past expiresAt, whether the connection is live or not
+        expired = random.random() < 0.25
+        item = {'connectionId': connection_id, 'clientId': f'client-{i // 3}',
+                'expiresAt': now - 60 if expired else now + 3600}
+        if random.random() < 0.05:
+            # Inconclusive probe: only the expiry decides
+            api.unreachable.add(connection_id)
+            (dead if expired else live).add(connection_id)
+        elif random.random() < dead_fraction:
+            api.gone.add(connection_id)
+            dead.add(connection_id)
+        else:
+            live.add(connection_id)
+        table.items[connection_id] = item
+        table._written_at[connection_id] = 0.0
+        client_table.items[(item['clientId'], connection_id)] = dict(item)
+    return live, dead
+
+
+def run(rows, dead_fraction, segments, io_latency, unprocessed_rate, write_budget):
+    sweeper = load_lambda_module('lambda_for_websocket_api', 'webSocketSweeper',
+                                 CONNECTION_TABLE='webSocketConnections', WEBSOCKET_URL='https://localhost/local')
+    table = FakeConnectionsTable(latency=io_latency)
+    client_table = FakeClientConnectionsTable(latency=io_latency)
+    api = FakeManagementApi(latency=io_latency)
+    sweeper.table = table
+    sweeper.client_table = client_table
+    sweeper.apigateway_client = api
+    sweeper.dynamodb = FakeDynamoDB(table, client_table, latency=io_latency, unprocessed_rate=unprocessed_rate)
+    sweeper.WRITE_UNITS_PER_SECOND = write_budget
+    sweeper.READ_UNITS_PER_SECOND = 10_000
+
+    live, dead = populate(rows, dead_fraction, table, client_table, api)
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = sweeper.lambda_handler({'segments': segments}, None)
+    report = json.loads(response['body'])
+
+    assert response['statusCode'] == 200 and report['complete'], report
+    assert set(table.items) == live, 'dead rows left behind or live rows deleted'
+    assert {c for _, c in client_table.items} == live, 'clientId rows out of sync'
+    assert report['scanned'] == rows and report['deleted'] == len(dead) and not report['delete_failures']
+    write_rate = sweeper.dynamodb.requests / report['elapsed_s']
+    # Token bucket: one burst of up to a second's budget on top of the rate
+    assert write_rate <= write_budget * (1 + 1 / report['elapsed_s']) * 1.05, f'write rate {write_rate:.0f}/s'
+
+    expired_live = sum(1 for c in live if table.items[c]['expiresAt'] < time.time())
+    print(f"rows={rows} dead={len(dead)} segments={segments} unprocessed_rate={unprocessed_rate:.0%}")
+    print(f"live rows past expiresAt kept={expired_live}")
+    print(f"scanned={report['scanned']} ({report['scanned_per_second']:.0f}/s) "
+          f"deleted={report['deleted']} ({report['deleted_per_second']:.0f}/s) in {report['elapsed_s']:.2f}s")
+    print(f"batch writes={sweeper.dynamodb.calls['batch_write_item']} "
+          f"unprocessed retries={report['unprocessed_retries']} "
+          f"write requests/s={write_rate:.0f} (budget {write_budget:.0f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--dead', type=float, default=0.3)
+    parser.add_argument('--segments', type=int, default=8)
+    parser.add_argument('--io-latency', type=float, default=0.002)
+    parser.add_argument('--unprocessed-rate', type=float, default=0.1)
+    parser.add_argument('--write-budget', type=float, default=20000)
+    args = parser.parse_args()
+    run(args.rows, args.dead, args.segments, args.io_latency, args.unprocessed_rate, args.write_budget)
@@ -0,0 +1,295 @@
+"""
+Browser acks for UI commands: added latency per command against user turns
+saved, over a fake WebSocket.
+
+FakeBrowser plays the frontend on a page model built from
+site_knowledge.json, polling --acked-element-wait seconds for a missing fill
+or click target before failing it (the frontend's ACKED_ELEMENT_WAIT_MS), and
+sends its acks through the webSocketAck Lambda to the
+agent, which runs in-process on one shared event loop (FakeAgentRuntime), as
+in the AgentCore runtime. The scripted model acts on the page it assumes the
+user is on. When a tool result reports a failure, it navigates, scrolls and
+retries within the same turn, as a real model does.
+
+Each of --sessions concurrent sessions works through TASKS, some of which
+start on the wrong page. Without acks a command the browser could not run is
+reported to the model as done. The user then has to ask again, which costs a
+turn. With acks the failure is in the tool result and the model fixes it in
+the same turn. Reported per mode: user turns and model calls per task, time
+until the task is done in the browser (plus --retry-seconds for the user to
+notice and ask again, per extra turn), and the ack wait added per command.
+
+Also checked: every task ends done in the browser; no ack times out, so a
+missing element is reported inside the agent's ack wait; waiting for acks does not
+hold up other sessions; and a browser that never acks (a frontend without
+ack support) costs one timeout, after which its commands are not waited on.
+A malformed ack (a seq or channel of the wrong type) is rejected as
+unknown_channel instead of failing the invocation.
+
+    python benchmarks/bench_tool_acks.py --sessions 8 --model-latency 0.3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import (AGENT_DIR, FakeAgentRuntime, FakeBrowser, FakeConnectionsTable, FakeManagementApi,
+                   ScriptedModel, install_fakes, load_agent_module, load_lambda_module)
+
+# (query, location the user is on, the command the model issues first)
+TASKS = [
+    ('Put my email jane@example.com in the contact form', '/',
+     ('fill_input', {'selector': '#agent-email', 'value': 'jane@example.com'})),
+    ('Show me the pricing plans', '/services', ('scroll_to_section', {'selector_id': 'pricing'})),
+    ('Click schedule demo', '/services', ('click_element', {'selector': '#cta-schedule-demo-btn'})),
+    ('Take me to the blog', '/', ('navigate_to_page', {'path': '/blog'})),
+    ('Subscribe me to the newsletter', '/contact', ('click_element', {'selector': '#newsletter-subscribe-btn'})),
+    ('Show me the team', '/about', ('scroll_to_section', {'selector_id': 'team'})),
+]
+COMMANDS = {query: command for query, _, command in TASKS}
+FOLLOW_UP = "That didn't work. "
+QUERY_PATTERN = re.compile(r"User's query: (.*)\. Location:", re.DOTALL)
+
+
+def site_model():
+    """
+    Returns:
+        tuple: (pages, targets), pages maps a path to the section IDs and
+            selectors on it, targets maps a section ID or selector to
+            (path, section ID) of its first occurrence
+    """
+    with open(os.path.join(AGENT_DIR, 'site_knowledge.json')) as f:
+        knowledge = json.load(f)
+    pages, targets = {}, {}
+    for page in knowledge['pages']:
+        present = pages.setdefault(page['path'], set())
+        for section in page['sections']:
+            present.add(section['id'])
+            targets.setdefault(section['id'], (page['path'], section['id']))
+            for selector in section['selectors']:
+                present.add(selector['selector'])
+                targets.setdefault(selector['selector'], (page['path'], section['id']))
+    return pages, targets
+
+
+PAGES, TARGETS = site_model()
+
+
+def fix(command):
+    """Hops that go to the command's page and section, then run it again."""
+    name, args = command
+    if name == 'navigate_to_page':
+        return [[command]]
+    path, section = TARGETS[args.get('selector') or args.get('selector_id')]
+    hops = [[('navigate_to_page', {'path': path})]]
+    if name != 'scroll_to_section':
+        hops.append([('scroll_to_section', {'selector_id': section})])
+    return hops + [[command]]
+
+
+def script(prompt):
+    match = QUERY_PATTERN.search(prompt)
+    query = match.group(1) if match else prompt
+    if query.startswith(FOLLOW_UP):
+        return fix(COMMANDS[query[len(FOLLOW_UP):]]), "Sorry about that, it's done now."
+    return [[COMMANDS[query]]], 'Done.'
+
+
+def recover(prompt, hop, errors):
+    return fix(hop[0])
+
+
+def goal(command):
+    """The browser action that completes a task."""
+    name, args = command
+    if name == 'navigate_to_page':
+        return (name, args['path'])
+    if name == 'scroll_to_section':
+        return (name, args['selector_id'])
+    return (name, args['selector'], args.get('value'))
+
+
+class Harness:
+    def __init__(self, acks, model_latency, ack_latency, acked_element_wait, browser_acks=True):
+        self.agent_module = load_agent_module()
+        self.table = FakeConnectionsTable()
+        api = FakeManagementApi(latency=0.01)
+        self.model = ScriptedModel(script, latency=model_latency, recover=recover)
+        install_fakes(self.agent_module, self.table, api, self.model)
+        # Every turn goes to the model
+        self.agent_module.router_enabled = False
+        self.agent_module.response_cache_enabled = False
+        self.agent_module.tool_acks_enabled = acks
+        self.runtime = FakeAgentRuntime(self.agent_module)
+        ack_function = load_lambda_module(
+            'lambda_for_websocket_api', 'webSocketAck', CONNECTION_TABLE='webSocketConnections', AGENT_ARN='arn:local')
+        ack_function.table = self.table
+        ack_function.agent_client = self.runtime
+
+        def send_ack(connection_id, message):
+            event = {'requestContext': {'connectionId': connection_id, 'routeKey': 'ack'}, 'body': json.dumps(message)}
+            ack_function.lambda_handler(event, None)
+
+        self.browser = FakeBrowser(api, PAGES, send_ack=send_ack if browser_acks else None,
+                                   ack_latency=ack_latency, acked_element_wait=acked_element_wait)
+
+    def turn(self, client_id, text, location):
+        payload = {'client_id': client_id, 'prompt': f"User's query: {text}. Location: {location}",
+                   'query': text, 'location': location}
+        self.runtime.invoke_agent_runtime(agentRuntimeArn='arn:local', runtimeSessionId=f'{client_id}_session_id',
+                                          payload=json.dumps(payload))
+
+    def task(self, client_id, connection_id, query, location, command, max_turns=3):
+        """Returns (user turns, seconds until done in the browser, done) of one task."""
+        self.browser.open(connection_id, location)
+        target = goal(command)
+        started = time.perf_counter()
+        text, turns = query, 0
+        while turns < max_turns:
+            turns += 1
+            self.turn(client_id, text, self.browser.locations[connection_id])
+            self.browser.settle(connection_id)
+            if target in self.browser.done[connection_id]:
+                return turns, time.perf_counter() - started, True
+            text = FOLLOW_UP + query
+        return turns, time.perf_counter() - started, False
+
+    def session(self, index, tasks):
+        client_id = f'web-{index}'
+        connection_id = self.table.connect(client_id)
+        started = time.perf_counter()
+        results = [self.task(client_id, connection_id, *task) for task in tasks]
+        return results, time.perf_counter() - started
+
+
+def records(logs):
+    for line in logs.splitlines():
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def run_mode(acks, sessions, model_latency, ack_latency, acked_element_wait):
+    logs = io.StringIO()
+    with contextlib.redirect_stdout(logs):
+        h = Harness(acks, model_latency, ack_latency, acked_element_wait)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            outcomes = list(pool.map(lambda i: h.session(i, TASKS), range(sessions)))
+        wall = time.perf_counter() - started
+    results = [r for session_results, _ in outcomes for r in session_results]
+    ack_waits = [span['duration_ms'] for record in records(logs.getvalue()) if record.get('trace') == 'agent_turn'
+                 for span in record['spans'] if span['name'] == 'tool_ack']
+    events = [record.get('event') for record in records(logs.getvalue())]
+    return {
+        'turns_per_task': statistics.mean(turns for turns, _, _ in results),
+        'model_calls_per_task': h.model.calls / len(results),
+        'task_seconds': statistics.mean(seconds for _, seconds, _ in results),
+        'done': sum(1 for _, _, done in results if done),
+        'tasks': len(results),
+        'browser_failures': h.browser.failures,
+        'ack_waits_ms': ack_waits,
+        'ack_timeouts': events.count('tool_ack_timeout'),
+        'wall_seconds': wall,
+        'session_seconds': [seconds for _, seconds in outcomes]
+    }
+
+
+def run_without_browser_acks(model_latency):
+    """One session, acks on, a browser that never acks: only its first command waits."""
+    logs = io.StringIO()
+    with contextlib.redirect_stdout(logs):
+        h = Harness(True, model_latency, 0.0, 0.0, browser_acks=False)
+        h.session(0, [task for task in TASKS if task[0] in ('Show me the pricing plans', 'Take me to the blog',
+                                                            'Show me the team')])
+    waits = [span['duration_ms'] for record in records(logs.getvalue()) if record.get('trace') == 'agent_turn'
+             for span in record['spans'] if span['name'] == 'tool_ack']
+    return waits, h.agent_module.tool_ack_timeout
+
+
+def check_malformed_acks():
+    """Status of invoke for acks whose seq or channel has the wrong type; all must be unknown_channel."""
+    agent_module = load_agent_module()
+    channel = agent_module.CommandChannel('web-malformed', None)
+    statuses = []
+    for fields in [{'seq': 'x'}, {'seq': {}}, {'seq': '1'}, {'seq': True}, {'seq': 1.5},
+                   {'channel': ['x'], 'seq': 1}, {'channel': {}, 'seq': 1}]:
+        payload = {'action': 'ack', 'client_id': 'web-malformed', 'channel': channel.channel_id, 'ok': True,
+                   **fields}
+        try:
+            statuses.append(asyncio.run(agent_module.invoke(payload, None))['status'])
+        except Exception as e:
+            statuses.append(f'{type(e).__name__} for {fields}')
+    return statuses
+
+
+def run(sessions, model_latency, ack_latency, retry_seconds, acked_element_wait):
+    off = run_mode(False, sessions, model_latency, ack_latency, acked_element_wait)
+    on = run_mode(True, sessions, model_latency, ack_latency, acked_element_wait)
+    waits, timeout = run_without_browser_acks(model_latency)
+    malformed = check_malformed_acks()
+    for mode in (off, on):
+        mode['user_seconds'] = mode['task_seconds'] + (mode['turns_per_task'] - 1) * retry_seconds
+
+    p = lambda samples, q: statistics.quantiles(samples, n=100)[q - 1] if len(samples) > 1 else 0.0
+    print(f'sessions={sessions} tasks/session={len(TASKS)} model_latency={model_latency}s '
+          f'ack_latency={ack_latency}s acked_element_wait={acked_element_wait}s')
+    print(f'{"":24}{"no acks":>10}{"acks":>10}')
+    for label, key, fmt in [('user turns per task', 'turns_per_task', '.2f'),
+                            ('model calls per task', 'model_calls_per_task', '.2f'),
+                            ('seconds to task done', 'task_seconds', '.2f'),
+                            ('  with user retries', 'user_seconds', '.2f'),
+                            ('tasks done', 'done', 'd')]:
+        print(f'{label:24}{off[key]:>10{fmt}}{on[key]:>10{fmt}}')
+    saved = (off['turns_per_task'] - on['turns_per_task']) * on['tasks']
+    print(f'acked commands: {len(on["ack_waits_ms"])}, added latency per command '
+          f'p50 {p(on["ack_waits_ms"], 50):.0f}ms p95 {p(on["ack_waits_ms"], 95):.0f}ms, '
+          f'timeouts {on["ack_timeouts"]}')
+    print(f'user turns saved: {saved:.0f} of {off["turns_per_task"] * off["tasks"]:.0f}')
+    print(f'concurrency: {sessions} sessions in {on["wall_seconds"]:.2f}s wall, '
+          f'slowest session {max(on["session_seconds"]):.2f}s')
+    print(f'browser without acks: {len(waits)} waited command(s), '
+          f'{sum(waits):.0f}ms total (timeout {timeout * 1000:.0f}ms)')
+
+    failures = []
+    if off['done'] != off['tasks'] or on['done'] != on['tasks']:
+        failures.append(f"tasks not done: no acks {off['done']}/{off['tasks']}, acks {on['done']}/{on['tasks']}")
+    if on['turns_per_task'] != 1:
+        failures.append(f"with acks a task took {on['turns_per_task']:.2f} turns")
+    if off['turns_per_task'] <= on['turns_per_task']:
+        failures.append('acks saved no turns')
+    if on['model_calls_per_task'] >= off['model_calls_per_task']:
+        failures.append('acks saved no model calls')
+    if on['ack_timeouts']:
+        failures.append(f"{on['ack_timeouts']} acks timed out with an acking browser "
+                        f"(element wait {acked_element_wait}s, ack timeout {timeout}s)")
+    if max(on['session_seconds']) * 1.5 < on['wall_seconds'] or on['wall_seconds'] > sum(on['session_seconds']) / 2:
+        failures.append('sessions waiting for acks held each other up')
+    if len(waits) != 1 or waits[0] < timeout * 1000 * 0.9:
+        failures.append(f'browser without acks: waits {waits}')
+    if any(status != 'unknown_channel' for status in malformed):
+        failures.append(f'malformed acks: {malformed}')
+    for failure in failures:
+        print(f'FAILED {failure}')
+    assert not failures, f'{len(failures)} checks failed'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--model-latency', type=float, default=0.3)
+    parser.add_argument('--ack-latency', type=float, default=0.08,
+                        help='Seconds from the browser running a command to its ack reaching the agent')
+    parser.add_argument('--retry-seconds', type=float, default=3.0,
+                        help='Seconds for a user to notice a failed action and ask again')
+    parser.add_argument('--acked-element-wait', type=float, default=0.8,
+                        help="Seconds the browser polls for a missing element of a sequenced command")
+    args = parser.parse_args()
+    run(args.sessions, args.model_latency, args.ack_latency, args.retry_seconds, args.acked_element_wait)
@@ -0,0 +1,318 @@
+"""
+Tool-call efficiency of recorded turns: record, score and replay.
+
+Record: sessions run through invoke with turn recording on
+(AGENT_RECORD_TURNS). The "turn_recording" log lines are collected: query,
+location, every tool call with its arguments, error, duration and model hop,
+and the number of model hops. With --recordings, recordings exported from
+the agent's logs are used instead (one per line; text before the JSON object,
+such as a CloudWatch timestamp, is skipped).
+
+Score: ToolEfficiencyScorer (WebsiteGuidingAgent/tool_efficiency.py) counts
+redundant navigations and scrolls, fills and clicks without a scroll to
+their section, invalid arguments, actions on the wrong page and tool calls
+per task (one user turn).
+
+Replay: every session's turns go through invoke again on a fresh agent, one
+session at a time, so prompt, router, cache and validation changes show up
+in the numbers. The model either replays the recorded tool calls hop by hop
+(--model recorded) or plans the same actions by the guide's rules: navigate
+only when not on the page, scroll to the section, then act (--model rules).
+The --max-* options fail the run when the replayed numbers exceed them, so a
+change can be gated on turn efficiency.
+
+Without --recordings, the built-in SESSIONS are recorded from a model that
+breaks the rules in known ways. Their scores must match the known counts, a
+recorded-model replay must score the same, and a rules-model replay must
+have nothing wasted or missing.
+
+    python benchmarks/bench_tool_efficiency.py
+    python benchmarks/bench_tool_efficiency.py --recordings turns.jsonl --max-wasted-per-task 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import re
+import time
+
+from fakes import FakeConnectionsTable, FakeManagementApi, ScriptedModel, install_fakes, load_agent_module
+
+# Per session: (query, location, model hops, reply); hops are lists of (tool, args)
+SESSIONS = [
+    [
+        # Navigates to the page the user is on, fills without scrolling
+        ('Put my email jane@example.com in the contact form', '/contact',
+         [[('navigate_to_page', {'path': '/contact'})],
+          [('fill_input', {'selector': '#agent-email', 'value': 'jane@example.com'})]],
+         "I've added your email."),
+        ('Now send the message', '/contact',
+         [[('scroll_to_section', {'selector_id': 'contact-form'})],
+          [('click_element', {'selector': '#agent-submit'})]],
+         'Your message is on its way.'),
+        # Served by the intent router
+        ('Take me to the blog', '/contact', None, None),
+        # Scrolls twice to the same section
+        ('Subscribe me to the newsletter', '/blog',
+         [[('scroll_to_section', {'selector_id': 'newsletter'})],
+          [('scroll_to_section', {'selector_id': 'newsletter'})],
+          [('click_element', {'selector': '#newsletter-subscribe-btn'})]],
+         "You're subscribed."),
+    ],
+    [
+        # Clicks a button of the home page from /services, without scrolling
+        ('I want to schedule a demo', '/services',
+         [[('click_element', {'selector': '#cta-schedule-demo-btn'})]],
+         "Let's get your demo booked."),
+        # An invalid selector, corrected on the next hop
+        ('Search the blog for AI', '/',
+         [[('navigate_to_page', {'path': '/blog'})],
+          [('scroll_to_section', {'selector_id': 'search-filter'})],
+          [('fill_input', {'selector': '#blog_search', 'value': 'AI'})],
+          [('fill_input', {'selector': '#blog-search', 'value': 'AI'})]],
+         "I've searched the blog for AI."),
+        # Navigates to the page the user is on; the answer is cached
+        ('What are your business hours?', '/contact',
+         [[('navigate_to_page', {'path': '/contact'})],
+          [('scroll_to_section', {'selector_id': 'business-hours'})]],
+         "We're open Monday to Friday, 9 AM to 6 PM."),
+        # Answered from the response cache, which replays the same commands
+        ('What are your business hours?', '/contact', None, None),
+    ],
+]
+# Expected scores of the built-in sessions as recorded
+EXPECTED = {'tasks': 8, 'tool_calls': 17, 'redundant_navigations': 3, 'redundant_scrolls': 1,
+            'missing_scrolls': 2, 'invalid_arguments': 1, 'off_page_actions': 1, 'failed_calls': 1}
+REPORTED = ['tool_calls', 'model_hops', 'redundant_navigations', 'redundant_scrolls', 'missing_scrolls',
+            'invalid_arguments', 'off_page_actions', 'failed_calls', 'wasted_calls']
+QUERY_PATTERN = re.compile(r"User's query: (.*)\. Location:", re.DOTALL)
+
+
+def log_records(text):
+    for line in text.splitlines():
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            yield json.loads(line[start:])
+        except ValueError:
+            continue
+
+
+def turn_recordings(text):
+    return [record for record in log_records(text) if record.get('event') == 'turn_recording']
+
+
+def by_session(recordings):
+    """Recordings grouped by session, in recorded order."""
+    sessions = {}
+    for record in recordings:
+        sessions.setdefault((record.get('site'), record.get('session_id')), []).append(record)
+    return list(sessions.values())
+
+
+class Replay:
+    """
+    Runs turns through invoke one at a time; the model plays the hops that
+    plan(turn) returns for the turn being run.
+    """
+
+    def __init__(self, agent_module, plan, model_latency):
+        self.agent_module = agent_module
+        self.plan = plan
+        self.turn = None
+        self.table = FakeConnectionsTable()
+        self.model = ScriptedModel(self.script, latency=model_latency)
+        install_fakes(agent_module, self.table, FakeManagementApi(), self.model)
+        agent_module.record_turns = True
+
+    def script(self, prompt):
+        if self.turn is None:
+            match = QUERY_PATTERN.search(prompt)
+            return [], f"No recording for {match.group(1) if match else prompt!r}"
+        return self.plan(self.turn)
+
+    async def run(self, sessions):
+        """
+        Args:
+            sessions: list of lists of turns, each {"query", "location", "site"} plus what plan reads
+
+        Returns:
+            tuple: (recordings of the replayed turns, seconds)
+        """
+        logs = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(logs):
+            for index, turns in enumerate(sessions):
+                client_id = f'replay-{index}'
+                self.table.connect(client_id)
+                for turn in turns:
+                    self.turn = turn
+                    location = turn.get('location')
+                    await self.agent_module.invoke({
+                        'client_id': client_id,
+                        'site': turn.get('site'),
+                        'prompt': f"User's query: {turn['query']}. Location: {location}",
+                        'query': turn['query'],
+                        'location': location
+                    }, None)
+                    self.turn = None
+        return turn_recordings(logs.getvalue()), time.perf_counter() - started
+
+
+def recorded_plan(turn):
+    """The model tool calls of a recorded turn, grouped into their hops."""
+    hops = {}
+    for call in turn['tool_calls']:
+        if call.get('source') == 'model':
+            hops.setdefault(call['hop'], []).append((call['tool'], call['args']))
+    return [hops[hop] for hop in sorted(hops)], turn.get('reply') or 'Done.'
+
+
+def rules_plan(scorer):
+    """
+    A model that performs a recorded turn's valid actions by the guide's
+    rules: navigate only when not on the target page, scroll to the target
+    section unless just scrolled there, then fill or click.
+    """
+    def plan(turn):
+        page, scrolled, hops = turn.get('location'), None, []
+        for name, args in [call for hop in recorded_plan(turn)[0] for call in hop]:
+            if name == 'navigate_to_page':
+                if scorer.index.contains('path', args.get('path')) and args['path'] != page:
+                    hops.append([(name, args)])
+                    page, scrolled = args['path'], None
+                continue
+            if name not in ('scroll_to_section', 'fill_input', 'click_element'):
+                hops.append([(name, args)])
+                continue
+            if name == 'scroll_to_section':
+                if not scorer.index.contains('section', args.get('selector_id')):
+                    continue
+                sections, pages = {args['selector_id']}, scorer.index.sections[args['selector_id']]
+            else:
+                if not scorer.index.contains('selector', args.get('selector')):
+                    continue
+                sections, pages = scorer.selector_sections[args['selector']], scorer.index.selectors[args['selector']]
+            if page not in pages:
+                page, scrolled = sorted(pages)[0], None
+                hops.append([('navigate_to_page', {'path': page})])
+            section = next(s for s in sorted(sections) if page in scorer.index.sections[s])
+            if section != scrolled:
+                hops.append([('scroll_to_section', {'selector_id': section})])
+                scrolled = section
+            if name != 'scroll_to_section':
+                hops.append([(name, args)])
+        return hops, turn.get('reply') or 'Done.'
+    return plan
+
+
+def builtin_turns():
+    """The built-in SESSIONS as replayable turns, model hops in recording form."""
+    sessions = []
+    for session in SESSIONS:
+        turns = []
+        for query, location, hops, reply in session:
+            calls = [{'tool': name, 'args': args, 'source': 'model', 'hop': hop}
+                     for hop, step in enumerate(hops or [], 1) for name, args in step]
+            turns.append({'query': query, 'location': location, 'tool_calls': calls, 'reply': reply})
+        sessions.append(turns)
+    return sessions
+
+
+def score(scorer, summarize, recordings):
+    scores = [scorer.score_turn(r['tool_calls'], r['location'], r['model_hops']) for r in recordings]
+    tool_ms = sum(call['ms'] for r in recordings for call in r['tool_calls'])
+    return summarize(scores, tool_ms)
+
+
+def check_recordings(recordings, scorer, failures):
+    for record in recordings:
+        missing = [key for key in ('trace_id', 'session_id', 'site', 'query', 'location', 'tool_calls',
+                                   'model_hops', 'model_ms', 'duration_ms', 'path', 'reply', 'score')
+                   if key not in record]
+        if missing:
+            failures.append(f"recording of {record.get('query')!r} lacks {missing}")
+            continue
+        for call in record['tool_calls']:
+            if not isinstance(call.get('ms'), (int, float)) or call['source'] == 'model' and not call['hop']:
+                failures.append(f"tool call without timing or hop: {call}")
+        offline = scorer.score_turn(record['tool_calls'], record['location'], record['model_hops'])
+        if offline != record['score']:
+            failures.append(f"logged score of {record['query']!r} differs from the offline score")
+
+
+def run(recordings_path, model, model_latency, limits):
+    agent_module = load_agent_module()
+    from tool_efficiency import summarize
+    scorer = agent_module.default_site.tool_scorer
+    failures = []
+
+    if recordings_path:
+        with open(recordings_path) as f:
+            recorded = turn_recordings(f.read())
+        assert recorded, f'no turn_recording lines in {recordings_path}'
+        sessions = by_session(recorded)
+    else:
+        recorded, _ = asyncio.run(Replay(agent_module, recorded_plan, model_latency).run(builtin_turns()))
+        check_recordings(recorded, scorer, failures)
+        sessions = by_session(recorded)
+
+    original = score(scorer, summarize, recorded)
+    modes = [model] if recordings_path else ['recorded', 'rules']
+    replays = {}
+    for mode in modes:
+        plan = recorded_plan if mode == 'recorded' else rules_plan(scorer)
+        replayed, seconds = asyncio.run(Replay(agent_module, plan, model_latency).run(sessions))
+        replays[mode] = score(scorer, summarize, replayed)
+        replays[mode]['seconds_per_task'] = seconds / max(len(replayed), 1)
+
+    print(f'sessions={len(sessions)} tasks={original["tasks"]} model_latency={model_latency}s')
+    columns = [('recorded', original)] + [(f'replay/{mode}', replays[mode]) for mode in modes]
+    print(f'{"per task":24}' + ''.join(f'{name:>16}' for name, _ in columns))
+    for counter in REPORTED:
+        print(f'{counter:24}' + ''.join(f'{summary[f"{counter}_per_task"]:>16.2f}' for _, summary in columns))
+    print(f'{"tool_ms":24}' + ''.join(f'{summary["tool_ms_per_task"]:>16.1f}' for _, summary in columns))
+    print(f'{"efficiency":24}' + ''.join(f'{summary["efficiency"]:>16.0%}' for _, summary in columns))
+    print(f'{"seconds (replay)":24}{"":>16}' + ''.join(f'{replays[mode]["seconds_per_task"]:>16.2f}'
+                                                      for mode in modes))
+
+    if not recordings_path:
+        for counter, expected in EXPECTED.items():
+            if original[counter] != expected:
+                failures.append(f'recorded {counter} = {original[counter]}, expected {expected}')
+        for counter in REPORTED:
+            if replays['recorded'][counter] != original[counter]:
+                failures.append(f"recorded-model replay changed {counter}: "
+                                f"{original[counter]} -> {replays['recorded'][counter]}")
+        for counter in ('wasted_calls', 'missing_scrolls', 'off_page_actions', 'invalid_arguments', 'failed_calls'):
+            if replays['rules'][counter]:
+                failures.append(f"rules-model replay has {replays['rules'][counter]} {counter}")
+
+    gated = replays[modes[0]]
+    for counter, limit in limits.items():
+        if limit is not None and gated[f'{counter}_per_task'] > limit:
+            failures.append(f'{counter} per task {gated[f"{counter}_per_task"]:.2f} > {limit}')
+    for failure in failures:
+        print(f'FAILED {failure}')
+    assert not failures, f'{len(failures)} checks failed'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recordings', help='File of turn_recording log lines; the built-in sessions if omitted')
+    parser.add_argument('--model', choices=['recorded', 'rules'], default='recorded',
+                        help='Model used to replay --recordings')
+    parser.add_argument('--model-latency', type=float, default=0.02)
+    parser.add_argument('--max-wasted-per-task', type=float)
+    parser.add_argument('--max-missing-scrolls-per-task', type=float)
+    parser.add_argument('--max-tool-calls-per-task', type=float)
+    parser.add_argument('--max-model-hops-per-task', type=float)
+    args = parser.parse_args()
+    run(args.recordings, args.model, args.model_latency, {
+        'wasted_calls': args.max_wasted_per_task,
+        'missing_scrolls': args.max_missing_scrolls_per_task,
+        'tool_calls': args.max_tool_calls_per_task,
+        'model_hops': args.max_model_hops_per_task,
+    })
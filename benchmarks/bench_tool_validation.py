@@ -0,0 +1,65 @@
+"""
+Tool-argument validation against the site-map index.
+
+A stub model first issues hallucinated paths and selectors, then the
+corrected ones. Rejected calls must never reach the browser. Each rejection
+must name the intended value among its candidates. The benchmark reports the
+rejection counters and the sends avoided.
+
+    python benchmarks/bench_tool_validation.py
+"""
+import asyncio
+import contextlib
+import io
+
+from fakes import (FakeConnectionsTable, FakeManagementApi, ScriptedModel,
+                   install_fakes, load_agent_module)
+
+# (hallucinated call, the valid value the rejection should suggest, corrected call)
+CASES = [
+    (('navigate_to_page', {'path': '/service'}), '/services', ('navigate_to_page', {'path': '/services'})),
+    (('scroll_to_section', {'selector_id': '#contact-form'}), 'contact-form',
+     ('scroll_to_section', {'selector_id': 'contact-form'})),
+    (('click_element', {'selector': '#hero-cta-button'}), '#hero-cta-btn',
+     ('click_element', {'selector': '#hero-cta-btn'})),
+    (('fill_input', {'selector': '#agent_email', 'value': 'jane@example.com'}), '#agent-email',
+     ('fill_input', {'selector': '#agent-email', 'value': 'jane@example.com'})),
+]
+
+
+def script(prompt):
+    return [[bad for bad, _, _ in CASES], [good for _, _, good in CASES]], 'Done.'
+
+
+async def run():
+    agent_module = load_agent_module()
+    table = FakeConnectionsTable()
+    api = FakeManagementApi(latency=0.05)
+    install_fakes(agent_module, table, api, ScriptedModel(script))
+    connection_id = table.connect('client-0')
+
+    from site_map import SiteMapIndex
+    index = SiteMapIndex(agent_module.default_site.knowledge)
+    for (name, args), expected, _ in CASES:
+        value = next(iter(args.values()))
+        check = {'navigate_to_page': index.check_path, 'scroll_to_section': index.check_section}.get(
+            name, index.check_selector)(value)
+        assert not check['success'], f'{value} should be rejected'
+        assert expected in check['candidates'], f'{value}: {expected} not in {check["candidates"]}'
+        print(f'{name:<18} {value!r:<22} -> {check["candidates"]}')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await agent_module.invoke({'client_id': 'client-0', 'prompt': 'do it'}, None)
+
+    delivered = api.commands(connection_id)
+    expected = [{'tool': name, 'args': args} for _, _, (name, args) in CASES]
+    assert delivered == expected, f'browser received {delivered}'
+
+    stats = agent_module.default_site.site_map_index.stats()
+    print(f"rejections: {stats['rejected']} rate={stats['rejection_rate']:.0%}")
+    assert sum(stats['rejected'].values()) == len(CASES)
+    print(f'browser commands: {len(delivered)} (all valid), sends avoided: {len(CASES)}')
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,654 @@
+"""
+Local stand-ins for the AWS services and the Bedrock model, so the agent
+can be exercised offline.
+
+- FakeConnectionsTable: the WebSocketConnections table with its clientId-index
+- FakeClientConnectionsTable: the clientConnections table (clientId, connectionId)
+- FakeRequestTable: the invocation Lambda's per-client request table (conditional puts)
+- FakeDynamoDB: dynamodb resource for BatchWriteItem, with optional unprocessed items
+- FakeManagementApi: apigatewaymanagementapi client that records frames
+- FakeBrowser: the frontend behind FakeManagementApi, running commands and sending acks
+- ScriptedModel: strands Model that plays back a scripted tool-call plan
+- FakeAgentRuntime: bedrock-agentcore client that runs the agent's invoke in-process
+"""
+import asyncio
+import importlib
+import io
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+from strands.models.model import Model
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENT_DIR = os.path.join(REPO_ROOT, 'WebsiteGuidingAgent')
+
+
+def load_agent_module():
+    """Import WebsiteGuidingAgent.py without AWS credentials or network."""
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    if AGENT_DIR not in sys.path:
+        sys.path.insert(0, AGENT_DIR)
+    import WebsiteGuidingAgent
+    return WebsiteGuidingAgent
+
+
+def load_lambda_module(folder, name, **env):
+    """Import one of the serverless-backend Lambda modules with the given env vars."""
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    for key, value in env.items():
+        os.environ.setdefault(key, value)
+    path = os.path.join(REPO_ROOT, 'serverless-backend', folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return importlib.import_module(name)
+
+
+def _condition_value(condition):
+    """Extract the value from a boto3 Key(...).eq(value) condition."""
+    return condition.get_expression()['values'][1]
+
+
+def _apply_update(item, UpdateExpression, ExpressionAttributeValues):
+    """Apply a 'SET a = :x, b = :y' update expression to an item."""
+    assignments = UpdateExpression.strip()[len('SET '):].split(',')
+    for assignment in assignments:
+        name, value = (part.strip() for part in assignment.split('='))
+        item[name] = ExpressionAttributeValues[value]
+
+
+def _conditional_check_failed():
+    return ClientError(
+        {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}},
+        'UpdateItem'
+    )
+
+
+class FakeConnectionsTable:
+    """
+    In-memory WebSocketConnections table keyed on connectionId.
+
+    gsi_lag models the eventual consistency of the clientId-index: a row only
+    shows up in index queries that many seconds after it was written.
+    """
+
+    def __init__(self, latency=0.0, gsi_lag=0.0, name='webSocketConnections'):
+        self.name = name
+        self.items = {}
+        self.latency = latency
+        self.gsi_lag = gsi_lag
+        self.calls = {'query': 0, 'get_item': 0, 'put_item': 0, 'delete_item': 0, 'update_item': 0, 'scan': 0}
+        self._written_at = {}
+        self._lock = threading.Lock()
+
+    def connect(self, client_id, connection_id=None):
+        connection_id = connection_id or f'conn-{uuid.uuid4().hex[:8]}'
+        self.put_item(Item={'connectionId': connection_id, 'clientId': client_id})
+        return connection_id
+
+    def query(self, IndexName=None, KeyConditionExpression=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['query'] += 1
+            client_id = _condition_value(KeyConditionExpression)
+            visible_before = time.perf_counter() - self.gsi_lag
+            items = [dict(i) for key, i in self.items.items()
+                     if i.get('clientId') == client_id and self._written_at[key] <= visible_before]
+        return {'Items': items, 'Count': len(items)}
+
+    def get_item(self, Key, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['get_item'] += 1
+            item = self.items.get(Key['connectionId'])
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['put_item'] += 1
+            self.items[Item['connectionId']] = dict(Item)
+            self._written_at[Item['connectionId']] = time.perf_counter()
+        return {}
+
+    def scan(self, Segment=0, TotalSegments=1, Limit=None, ExclusiveStartKey=None, **kwargs):
+        """Parallel-scan page; rows are assigned to segments by a hash of connectionId."""
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['scan'] += 1
+            keys = sorted(k for k in self.items if zlib.crc32(k.encode()) % TotalSegments == Segment)
+            if ExclusiveStartKey:
+                keys = [k for k in keys if k > ExclusiveStartKey['connectionId']]
+            page = keys[:Limit] if Limit else keys
+            items = [dict(self.items[k]) for k in page]
+        response = {'Items': items, 'Count': len(items),
+                    'ConsumedCapacity': {'TableName': self.name, 'CapacityUnits': max(len(items) * 0.5 / 40, 0.5)}}
+        if Limit and len(keys) > Limit:
+            response['LastEvaluatedKey'] = {'connectionId': page[-1]}
+        return response
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ConditionExpression=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['update_item'] += 1
+            item = self.items.get(Key['connectionId'])
+            if item is None:
+                if ConditionExpression:
+                    raise _conditional_check_failed()
+                item = self.items[Key['connectionId']] = dict(Key)
+                self._written_at[Key['connectionId']] = time.perf_counter()
+            _apply_update(item, UpdateExpression, ExpressionAttributeValues)
+        return {}
+
+    def delete_item(self, Key, ReturnValues=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['delete_item'] += 1
+            old = self.items.pop(Key['connectionId'], None)
+            self._written_at.pop(Key['connectionId'], None)
+        return {'Attributes': old} if old and ReturnValues == 'ALL_OLD' else {}
+
+
+class FakeClientConnectionsTable:
+    """In-memory clientConnections table: partition key clientId, sort key connectionId."""
+
+    def __init__(self, latency=0.0, name='clientConnections'):
+        self.name = name
+        self.items = {}
+        self.latency = latency
+        self.calls = {'query': 0, 'put_item': 0, 'delete_item': 0, 'update_item': 0}
+        self._lock = threading.Lock()
+
+    def query(self, KeyConditionExpression=None, ConsistentRead=False, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['query'] += 1
+            client_id = _condition_value(KeyConditionExpression)
+            items = [dict(i) for (c, _), i in sorted(self.items.items()) if c == client_id]
+        return {'Items': items, 'Count': len(items)}
+
+    def put_item(self, Item, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['put_item'] += 1
+            self.items[(Item['clientId'], Item['connectionId'])] = dict(Item)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ConditionExpression=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['update_item'] += 1
+            key = (Key['clientId'], Key['connectionId'])
+            if key not in self.items:
+                if ConditionExpression:
+                    raise _conditional_check_failed()
+                self.items[key] = dict(Key)
+            _apply_update(self.items[key], UpdateExpression, ExpressionAttributeValues)
+        return {}
+
+    def delete_item(self, Key, ReturnValues=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['delete_item'] += 1
+            old = self.items.pop((Key['clientId'], Key['connectionId']), None)
+        return {'Attributes': old} if old and ReturnValues == 'ALL_OLD' else {}
+
+
+class FakeRequestTable:
+    """
+    In-memory per-client request table (partition key clientId) for
+    request_gate.DynamoDBRequestStore. put_item honours the two conditions
+    the store uses: attribute_not_exists(clientId) and version = :version.
+    """
+
+    def __init__(self, latency=0.0, name='agentRequests'):
+        self.name = name
+        self.items = {}
+        self.latency = latency
+        self.calls = {'get_item': 0, 'put_item': 0, 'conflicts': 0}
+        self._lock = threading.Lock()
+
+    def get_item(self, Key, ConsistentRead=False, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['get_item'] += 1
+            item = self.items.get(Key['clientId'])
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['put_item'] += 1
+            current = self.items.get(Item['clientId'])
+            if ConditionExpression == 'attribute_not_exists(clientId)':
+                ok = current is None
+            elif ConditionExpression == 'version = :version':
+                ok = current is not None and current.get('version') == ExpressionAttributeValues[':version']
+            else:
+                ok = True
+            if not ok:
+                self.calls['conflicts'] += 1
+                raise _conditional_check_failed()
+            self.items[Item['clientId']] = dict(Item)
+        return {}
+
+
+class FakeDynamoDB:
+    """
+    dynamodb service resource stand-in for BatchWriteItem over fake tables.
+
+    unprocessed_rate is the chance that each request in a batch comes back
+    in UnprocessedItems, as under throttling.
+    """
+
+    def __init__(self, *tables, latency=0.0, unprocessed_rate=0.0):
+        self.tables = {t.name: t for t in tables}
+        self.latency = latency
+        self.unprocessed_rate = unprocessed_rate
+        self.calls = {'batch_write_item': 0}
+        self.requests = 0
+
+    def Table(self, name):
+        return self.tables[name]
+
+    def batch_write_item(self, RequestItems):
+        time.sleep(self.latency)
+        self.calls['batch_write_item'] += 1
+        count = sum(len(r) for r in RequestItems.values())
+        assert count <= 25, f'BatchWriteItem accepts at most 25 requests, got {count}'
+        unprocessed = {}
+        for name, requests in RequestItems.items():
+            table = self.tables[name]
+            for request in requests:
+                self.requests += 1
+                if random.random() < self.unprocessed_rate:
+                    unprocessed.setdefault(name, []).append(request)
+                    continue
+                key = request['DeleteRequest']['Key']
+                with table._lock:
+                    if isinstance(table, FakeClientConnectionsTable):
+                        table.items.pop((key['clientId'], key['connectionId']), None)
+                    else:
+                        table.items.pop(key['connectionId'], None)
+                        table._written_at.pop(key['connectionId'], None)
+        return {'UnprocessedItems': unprocessed}
+
+
+class FakeManagementApi:
+    """
+    apigatewaymanagementapi stand-in that records every frame per connection.
+    Every listener(connection_id, frame) is called after a frame is recorded.
+    Connections in gone answer 410; get_connection on a connection in
+    unreachable fails with a 500.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.frames = {}
+        self.log = []
+        self.gone = set()
+        self.unreachable = set()
+        self.calls = 0
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def post_to_connection(self, ConnectionId, Data):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        with self._lock:
+            self.calls += 1
+            if ConnectionId in self.gone:
+                raise ClientError(
+                    {'Error': {'Code': 'GoneException', 'Message': 'Gone'},
+                     'ResponseMetadata': {'HTTPStatusCode': 410}},
+                    'PostToConnection'
+                )
+            frame = json.loads(Data)
+            self.frames.setdefault(ConnectionId, []).append(frame)
+            self.log.append((time.perf_counter(), ConnectionId, frame))
+        for listener in self.listeners:
+            listener(ConnectionId, frame)
+        return {}
+
+    def get_connection(self, ConnectionId):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        with self._lock:
+            self.calls += 1
+            if ConnectionId in self.gone:
+                raise ClientError(
+                    {'Error': {'Code': 'GoneException', 'Message': 'Gone'},
+                     'ResponseMetadata': {'HTTPStatusCode': 410}},
+                    'GetConnection'
+                )
+            if ConnectionId in self.unreachable:
+                raise ClientError(
+                    {'Error': {'Code': 'InternalServerErrorException', 'Message': 'Internal error'},
+                     'ResponseMetadata': {'HTTPStatusCode': 500}},
+                    'GetConnection'
+                )
+        return {'ConnectionId': ConnectionId}
+
+    def commands(self, connection_id):
+        """
+        UI commands received by a connection in delivery order, with batched
+        command-channel frames flattened and sequence metadata stripped.
+        """
+        commands = []
+        for frame in self.frames.get(connection_id, []):
+            batch = frame['commands'] if 'commands' in frame else [frame]
+            for command in batch:
+                if 'tool' in command:
+                    commands.append({k: v for k, v in command.items() if k in ('tool', 'args')})
+        return commands
+
+
+class FakeBrowser:
+    """
+    The frontend (Chatbot.jsx) behind a FakeManagementApi.
+
+    pages maps a path to the section IDs and selectors present on it. Each
+    connection is one tab with its own location. Commands run one at a time
+    per tab, with the frontend's delays: navigate_delay for a navigation
+    and tool_delay after every command that ran. A scroll, fill or click
+    whose target is not on the current page fails with the frontend's error
+    message; fill and click first poll for it, like the frontend, for
+    element_wait seconds, or acked_element_wait for a sequenced command.
+    After each sequenced command, the tab sends {"action": "ack", ...} through
+    send_ack(connection_id, message), ack_latency seconds later (the
+    WebSocket leg), without holding up the next command. Without send_ack
+    it never acknowledges, like a frontend from before acks.
+    """
+
+    def __init__(self, management_api, pages, send_ack=None, location='/',
+                 navigate_delay=0.3, tool_delay=0.3, ack_latency=0.05, element_wait=5.0,
+                 acked_element_wait=0.8):
+        self.pages = pages
+        self.send_ack = send_ack
+        self.start_location = location
+        self.navigate_delay = navigate_delay
+        self.tool_delay = tool_delay
+        self.ack_latency = ack_latency
+        self.element_wait = element_wait
+        self.acked_element_wait = acked_element_wait
+        self.locations = {}
+        # connectionId -> completed actions, e.g. ('fill_input', '#agent-email', 'jane@example.com')
+        self.done = {}
+        self.failures = 0
+        self._queues = {}
+        self._lock = threading.Lock()
+        management_api.listeners.append(self.receive)
+
+    def open(self, connection_id, location=None):
+        with self._lock:
+            self.locations[connection_id] = location or self.start_location
+            self.done[connection_id] = []
+
+    def receive(self, connection_id, frame):
+        batch = [dict(c, channel=frame['channel']) for c in frame['commands']] if 'commands' in frame else [frame]
+        commands = [c for c in batch if 'tool' in c]
+        if not commands:
+            return
+        with self._lock:
+            tab = self._queues.get(connection_id)
+            if tab is None:
+                tab = self._queues[connection_id] = queue.Queue()
+                threading.Thread(target=self._run, args=(connection_id, tab), daemon=True).start()
+        for command in commands:
+            tab.put(command)
+
+    def _run(self, connection_id, tab):
+        while True:
+            command = tab.get()
+            wait = self.acked_element_wait if 'seq' in command else self.element_wait
+            error = self._execute(connection_id, command['tool'], command.get('args') or {}, wait)
+            if self.send_ack is not None and 'seq' in command:
+                ack = {'action': 'ack', 'channel': command['channel'], 'seq': command['seq'],
+                       'ok': error is None, 'error': error, 'location': self.locations[connection_id]}
+                threading.Timer(self.ack_latency, self.send_ack, args=(connection_id, ack)).start()
+            if error:
+                with self._lock:
+                    self.failures += 1
+            else:
+                time.sleep(self.tool_delay)
+            tab.task_done()
+
+    def settle(self, connection_id):
+        """Wait until the tab has run every command it received."""
+        with self._lock:
+            tab = self._queues.get(connection_id)
+        if tab is not None:
+            tab.join()
+
+    def _execute(self, connection_id, tool, args, element_wait):
+        """Returns the error message, or None if the command ran."""
+        location = self.locations.setdefault(connection_id, self.start_location)
+        on_page = self.pages.get(location, set())
+        if tool == 'navigate_to_page':
+            time.sleep(self.navigate_delay)
+            self.locations[connection_id] = args['path']
+            action = (tool, args['path'])
+        elif tool == 'scroll_to_section':
+            if args['selector_id'].lstrip('#') not in on_page:
+                return f"Section not found: {args['selector_id']}"
+            action = (tool, args['selector_id'])
+        elif tool in ('fill_input', 'click_element'):
+            if args['selector'] not in on_page:
+                # The frontend polls for the element before giving up
+                time.sleep(element_wait)
+                return f"Element not found: {args['selector']}"
+            action = (tool, args['selector'], args.get('value'))
+        else:
+            action = (tool,)
+        self.done.setdefault(connection_id, []).append(action)
+        return None
+
+
+def _last_user_text(messages):
+    for message in reversed(messages):
+        if message['role'] != 'user':
+            continue
+        texts = [c['text'] for c in message['content'] if 'text' in c]
+        if texts:
+            return ' '.join(texts)
+    return ''
+
+
+def _hop_errors(messages):
+    """For each model hop since the last plain user prompt, its failed tool results' texts."""
+    hops = []
+    for message in reversed(messages):
+        if message['role'] != 'user':
+            continue
+        results = [c['toolResult'] for c in message['content'] if 'toolResult' in c]
+        if not results:
+            break
+        texts = [t.get('text', '') for r in results for t in r.get('content', [])]
+        hops.append([t for t in texts if t.startswith('Error')])
+    return hops[::-1]
+
+
+def _steps_taken(messages):
+    """Number of assistant messages since the last plain user prompt."""
+    steps = 0
+    for message in reversed(messages):
+        if message['role'] == 'assistant':
+            steps += 1
+        elif any('text' in c for c in message['content']):
+            break
+    return steps
+
+
+class ScriptedModel(Model):
+    """
+    Strands model that replays a scripted plan instead of calling Bedrock.
+
+    script(prompt) returns (tool_steps, reply) where tool_steps is a list of
+    model hops, each a list of (tool_name, args) tuples, and reply is the
+    final text. A hop may start with a string, text the model says before
+    that hop's tool calls. latency is added before every hop to simulate inference.
+    Input tokens are estimated at four characters per token.
+    With chunk_chars set, the reply is streamed in chunks of that size with
+    chunk_delay seconds between them, like token-by-token generation.
+    With recover set, the model reacts to a failed tool call like a real one:
+    recover(prompt, hop, errors) returns the hops to play right after the
+    first hop of the turn whose tool results start with "Error".
+    """
+
+    def __init__(self, script, latency=0.0, chunk_chars=None, chunk_delay=0.0, recover=None):
+        self.script = script
+        self.recover = recover
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.input_tokens = 0
+        self.config = {'model_id': 'scripted'}
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        raise NotImplementedError
+        yield
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        prompt = _last_user_text(messages)
+        tool_steps, reply = self.script(prompt)
+        step = _steps_taken(messages)
+        if self.recover is not None:
+            failed = [i for i, errors in enumerate(_hop_errors(messages)) if errors]
+            if failed and failed[0] < len(tool_steps):
+                i = failed[0]
+                tool_steps = (tool_steps[:i + 1] + self.recover(prompt, tool_steps[i], _hop_errors(messages)[i])
+                              + tool_steps[i + 1:])
+
+        yield {'messageStart': {'role': 'assistant'}}
+        if step < len(tool_steps):
+            calls = tool_steps[step]
+            if calls and isinstance(calls[0], str):
+                async for event in self._text(calls[0]):
+                    yield event
+                calls = calls[1:]
+            for name, args in calls:
+                yield {'contentBlockStart': {'start': {'toolUse': {
+                    'toolUseId': f'tool-{uuid.uuid4().hex[:8]}', 'name': name}}}}
+                yield {'contentBlockDelta': {'delta': {'toolUse': {'input': json.dumps(args)}}}}
+                yield {'contentBlockStop': {}}
+            stop_reason = 'tool_use'
+        else:
+            async for event in self._text(reply):
+                yield event
+            stop_reason = 'end_turn'
+        yield {'messageStop': {'stopReason': stop_reason}}
+        prompt_chars = len(system_prompt or '') + len(json.dumps(messages, default=str))
+        self.input_tokens += prompt_chars // 4
+        yield {'metadata': {
+            'usage': {'inputTokens': prompt_chars // 4, 'outputTokens': len(reply) // 4,
+                      'totalTokens': (prompt_chars + len(reply)) // 4},
+            'metrics': {'latencyMs': int(self.latency * 1000)}
+        }}
+
+
+    async def _text(self, text):
+        """One text content block, in chunk_chars chunks when set."""
+        size = self.chunk_chars or max(len(text), 1)
+        for start in range(0, len(text), size):
+            if start and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield {'contentBlockDelta': {'delta': {'text': text[start:start + size]}}}
+        yield {'contentBlockStop': {}}
+
+
+def install_fakes(agent_module, table, management_api, model, client_table=None, light_model=None):
+    """
+    Point the agent module at the local stand-ins and reset its state.
+    model serves both tiers unless a separate light_model is given.
+    """
+    agent_module.connections_table = table
+    agent_module.client_connections_table = client_table
+    agent_module.apigateway_client = management_api
+    agent_module.agent_model = model
+    agent_module.light_model = light_model or model
+    agent_module.model_tier_router.__init__(agent_module.model_tier_router.max_light_words)
+    agent_module.response_cache.__init__(
+        agent_module.response_cache.max_entries,
+        agent_module.response_cache.ttl_seconds
+    )
+    agent_module.session_pool.clear()
+    # FakeManagementApi alone has no browser to acknowledge commands (see FakeBrowser)
+    agent_module.tool_acks_enabled = False
+    agent_module.connection_cache.__init__(
+        agent_module.connection_cache.max_entries,
+        agent_module.connection_cache.ttl_seconds
+    )
+
+
+class QueueBody:
+    """StreamingBody stand-in whose lines are produced by another thread."""
+
+    def __init__(self):
+        self.lines = queue.Queue()
+
+    def iter_lines(self):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                return
+            yield line
+
+
+class FakeAgentRuntime:
+    """
+    bedrock-agentcore client stand-in that runs the agent's invoke in-process.
+
+    Like the AgentCore runtime, all invocations share one event loop (on a
+    background thread) and the runtimeSessionId is passed as
+    context.session_id. A streaming result is served as server-sent events.
+    """
+
+    def __init__(self, agent_module):
+        self.agent_module = agent_module
+        self.calls = 0
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def invoke_agent_runtime(self, agentRuntimeArn, runtimeSessionId, payload, **kwargs):
+        self.calls += 1
+        context = SimpleNamespace(session_id=runtimeSessionId)
+        request = json.loads(payload)
+        result = asyncio.run_coroutine_threadsafe(
+            self.agent_module.invoke(request, context), self.loop).result()
+        if hasattr(result, '__aiter__'):
+            body = QueueBody()
+            asyncio.run_coroutine_threadsafe(self._produce(result, body), self.loop)
+            return {'contentType': 'text/event-stream', 'response': body}
+        return {'contentType': 'application/json',
+                'response': io.BytesIO(json.dumps(result, default=str).encode('utf-8'))}
+
+    @staticmethod
+    async def _produce(stream, body):
+        try:
+            async for event in stream:
+                body.lines.put(f'data: {json.dumps(event, default=str)}'.encode('utf-8'))
+        except Exception as e:
+            body.lines.put(f'data: {json.dumps({"error": str(e)})}'.encode('utf-8'))
+        finally:
+            body.lines.put(None)
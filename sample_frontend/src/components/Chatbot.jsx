@@ -9,6 +9,9 @@ const AGENT_API_URL =
 // const WS_URL = "ws://127.0.0.1:8000/ws";
 const WS_URL =
   "wss://zqkltcnh87.execute-api.us-east-1.amazonaws.com/development";
+// Site whose knowledge the agent uses (a file in the agent's sites/ folder);
+// "default" is the bundled site_knowledge.json
+const SITE_KEY = "default";
 
 // Voice Activity Detection Configuration
 const VAD_CONFIG = {
@@ -21,6 +24,13 @@ const VAD_CONFIG = {
   RECONNECT_DELAY: 500, // Delay before reconnecting speech recognition (reduced for faster response)
 };
 
+// How long fill_input / click_element wait for their element to appear.
+// The agent waits AGENT_TOOL_ACK_TIMEOUT_MS (default 1500) for the ack of a
+// sequenced command, so its wait must end well before that for a missing
+// element to be reported back in time.
+const ELEMENT_WAIT_MS = 5000;
+const ACKED_ELEMENT_WAIT_MS = 800;
+
 // Tool Registry - Safe, whitelisted functions
 const createToolRegistry = (
   navigate,
@@ -38,10 +48,9 @@ const createToolRegistry = (
     return `Highlighted element ${selector} for ${duration}ms`;
   },
 
-  fill_input: async ({ selector, value }) => {
-    // Wait for element to be available (up to 5 seconds)
+  fill_input: async ({ selector, value }, { maxWaitTime = ELEMENT_WAIT_MS } = {}) => {
+    // Wait for element to be available
     let el = null;
-    const maxWaitTime = 5000;
     const startTime = Date.now();
 
     while (!el && Date.now() - startTime < maxWaitTime) {
@@ -107,10 +116,9 @@ const createToolRegistry = (
     return `Scrolled to section ${selector_id}`;
   },
 
-  click_element: async ({ selector }) => {
-    // Wait for element to be available (up to 5 seconds)
+  click_element: async ({ selector }, { maxWaitTime = ELEMENT_WAIT_MS } = {}) => {
+    // Wait for element to be available
     let el = null;
-    const maxWaitTime = 5000;
     const startTime = Date.now();
 
     while (!el && Date.now() - startTime < maxWaitTime) {
@@ -284,6 +292,8 @@ const Chatbot = () => {
   const lastProcessedTranscriptRef = useRef("");
   const handleMessageRef = useRef(null);
   const speakTextRef = useRef(null);
+  // Sentences relayed over the WebSocket while the agent is still generating
+  const speechStreamActiveRef = useRef(false);
   const stopConversationRef = useRef(null);
   const safeStartRecognitionRef = useRef(null);
   const pauseConversationRef = useRef(null);
@@ -373,15 +383,23 @@ const Chatbot = () => {
             location: currentLocation,
             query: messageText,
             client_id: memoryEnabled ? clientId : null, // Only send client_id if memory is enabled
+            site: SITE_KEY,
+            stream: true, // Sentences are relayed over the WebSocket as they are generated
           }),
         });
 
-        if (!response.ok) {
+        // 429 carries a spoken "try again" message
+        if (!response.ok && response.status !== 429) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
 
         const agentResponse = await response.json();
 
+        // Another copy of this utterance, or a newer one, is being answered
+        if (agentResponse.coalesced || agentResponse.superseded) {
+          return;
+        }
+
         if (!agentResponse.content) {
           throw new Error("Invalid response format: missing content");
         }
@@ -396,8 +414,8 @@ const Chatbot = () => {
         setMessages((prev) => [...prev, aiResponse]);
         setIsConnected(true);
 
-        // Automatically speak the AI response
-        if (autoSpeak && agentResponse.content) {
+        // Automatically speak the AI response (already spoken if it was streamed)
+        if (autoSpeak && agentResponse.content && !agentResponse.streamed) {
           setTimeout(() => {
             if (speakTextRef.current) {
               speakTextRef.current(agentResponse.content);
@@ -727,6 +745,13 @@ const Chatbot = () => {
       };
 
       utterance.onend = () => {
+        // Continue with the next streamed sentence before handing back to listening
+        if (speechQueueRef.current.length > 0) {
+          speakTextRef.current(speechQueueRef.current.shift());
+          return;
+        }
+        speechStreamActiveRef.current = false;
+
         setIsSpeaking(false);
         isSpeakingRef.current = false;
         currentUtteranceRef.current = null;
@@ -760,6 +785,8 @@ const Chatbot = () => {
       };
 
       utterance.onerror = (event) => {
+        speechQueueRef.current = [];
+        speechStreamActiveRef.current = false;
         setIsSpeaking(false);
         isSpeakingRef.current = false;
         setVoiceState("idle");
@@ -776,6 +803,19 @@ const Chatbot = () => {
   // Store the function in a ref so it can be called from event handlers
   speakTextRef.current = speakText;
 
+  // Speak a streamed sentence now, or after the sentences already queued
+  const enqueueSpeech = (text) => {
+    if (!autoSpeak) {
+      return;
+    }
+    if (speechStreamActiveRef.current) {
+      speechQueueRef.current.push(text);
+      return;
+    }
+    speechStreamActiveRef.current = true;
+    speakTextRef.current(text);
+  };
+
   // New conversation flow functions
 
   const speakWelcomeMessage = useCallback(() => {
@@ -1181,10 +1221,12 @@ const Chatbot = () => {
 
       try {
         await executeToolCall(toolCall);
+        sendToolAck(toolCall, true);
 
         // Add a small delay between tool executions to ensure DOM updates
         await new Promise((resolve) => setTimeout(resolve, 300));
       } catch (error) {
+        sendToolAck(toolCall, false, error.message);
         // Continue with next tool even if one fails
       }
     }
@@ -1193,6 +1235,25 @@ const Chatbot = () => {
     setIsProcessingQueue(false);
   };
 
+  // Report the outcome of a sequenced command to the agent, whose tool is
+  // waiting for it (the WebSocket API routes action "ack" to webSocketAck)
+  const sendToolAck = (toolCall, ok, error = null) => {
+    const ws = wsConnectionRef.current;
+    if (!toolCall.channel || !ws || ws.readyState !== WebSocket.OPEN) {
+      return;
+    }
+    ws.send(
+      JSON.stringify({
+        action: "ack",
+        channel: toolCall.channel,
+        seq: toolCall.seq,
+        ok,
+        error,
+        location: window.location.pathname,
+      })
+    );
+  };
+
   // Add tool to queue
   const addToolToQueue = (toolCall) => {
     toolQueueRef.current.push(toolCall);
@@ -1203,6 +1264,57 @@ const Chatbot = () => {
     }
   };
 
+  // Batched UI commands from the agent's command channel. Commands carry a
+  // per-channel sequence number; apply them strictly in order, drop
+  // duplicates, and give up waiting on a missing seq after a short grace
+  // period (a frame the agent failed to deliver).
+  const commandChannelRef = useRef({ id: null, lastSeq: 0, buffered: {}, gapTimer: null });
+
+  const releaseChannelCommands = () => {
+    const channel = commandChannelRef.current;
+    while (channel.buffered[channel.lastSeq + 1]) {
+      const command = channel.buffered[channel.lastSeq + 1];
+      delete channel.buffered[channel.lastSeq + 1];
+      channel.lastSeq += 1;
+      addToolToQueue({
+        tool: command.tool,
+        args: command.args,
+        channel: channel.id,
+        seq: command.seq,
+      });
+    }
+  };
+
+  const handleCommandBatch = (message) => {
+    const channel = commandChannelRef.current;
+    if (channel.id !== message.channel) {
+      // New agent session: its sequence starts over
+      clearTimeout(channel.gapTimer);
+      commandChannelRef.current = { id: message.channel, lastSeq: 0, buffered: {}, gapTimer: null };
+    }
+    const current = commandChannelRef.current;
+    message.commands.forEach((command) => {
+      if (command.seq > current.lastSeq) {
+        current.buffered[command.seq] = command;
+      }
+    });
+    releaseChannelCommands();
+
+    clearTimeout(current.gapTimer);
+    current.gapTimer = null;
+    if (Object.keys(current.buffered).length > 0) {
+      current.gapTimer = setTimeout(() => {
+        current.gapTimer = null;
+        let pending = Object.keys(current.buffered).map(Number);
+        while (pending.length > 0) {
+          current.lastSeq = Math.min(...pending) - 1;
+          releaseChannelCommands();
+          pending = Object.keys(current.buffered).map(Number);
+        }
+      }, 500);
+    }
+  };
+
   // WebSocket connection management
   const connectWebSocketRef = useRef(null);
   const isConnectingRef = useRef(false);
@@ -1265,13 +1377,34 @@ const Chatbot = () => {
         setIsConnected(true);
         isConnectingRef.current = false;
         connectionAttemptsRef.current = 0;
+
+        // Have the agent set up this client's session before the first query
+        fetch(AGENT_API_URL, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({
+            warmup: true,
+            client_id: memoryEnabled ? clientId : null,
+            site: SITE_KEY,
+          }),
+        }).catch(() => {});
       };
 
       ws.onmessage = (event) => {
         try {
           const message = JSON.parse(event.data);
 
-          if (message.tool && message.args) {
+          if (message.type === "speech") {
+            // Streamed reply sentence relayed by the agent invocation API
+            if (message.text) {
+              enqueueSpeech(message.text);
+            }
+          } else if (Array.isArray(message.commands)) {
+            // Batched, sequenced commands from the agent's command channel
+            handleCommandBatch(message);
+          } else if (message.tool && message.args) {
             // Add tool to queue for sequential execution
             addToolToQueue({
               tool: message.tool,
@@ -1422,15 +1555,23 @@ const Chatbot = () => {
           location: currentLocation,
           query: currentInput,
           client_id: memoryEnabled ? clientId : null, // Only send client_id if memory is enabled
+          site: SITE_KEY,
+          stream: true, // Sentences are relayed over the WebSocket as they are generated
         }),
       });
 
-      if (!response.ok) {
+      // 429 carries a spoken "try again" message
+      if (!response.ok && response.status !== 429) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
       const agentResponse = await response.json();
 
+      // Another copy of this message, or a newer one, is being answered
+      if (agentResponse.coalesced || agentResponse.superseded) {
+        return;
+      }
+
       // Validate the response format
       if (!agentResponse.content) {
         throw new Error("Invalid response format: missing content");
@@ -1447,8 +1588,8 @@ const Chatbot = () => {
       setMessages((prev) => [...prev, aiResponse]);
       setIsConnected(true);
 
-      // Automatically speak the AI response
-      if (autoSpeak && agentResponse.content) {
+      // Automatically speak the AI response (already spoken if it was streamed)
+      if (autoSpeak && agentResponse.content && !agentResponse.streamed) {
         setTimeout(() => {
           if (speakTextRef.current) {
             speakTextRef.current(agentResponse.content);
@@ -1488,7 +1629,9 @@ const Chatbot = () => {
     }
 
     try {
-      const result = await toolRegistry[toolCall.tool](toolCall.args);
+      // The agent may be waiting for the ack of a sequenced command
+      const maxWaitTime = toolCall.channel ? ACKED_ELEMENT_WAIT_MS : ELEMENT_WAIT_MS;
+      const result = await toolRegistry[toolCall.tool](toolCall.args, { maxWaitTime });
       return result;
     } catch (error) {
       throw error;
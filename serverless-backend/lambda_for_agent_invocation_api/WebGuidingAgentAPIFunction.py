@@ -1,26 +1,397 @@
 import json
 import boto3
-import base64
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 import os
 import logging
 import re
+import time
+import uuid
+
+from request_gate import DynamoDBRequestStore, LocalRequestStore, RequestGate
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Clients are built once per execution environment, during init. Keep-alive
+# lets warm invocations reuse their connections; the agent runtime gets a read
+# timeout long enough for a full turn, the relay calls fail fast.
+runtime_config = Config(
+    connect_timeout=2,
+    read_timeout=int(os.environ.get('AGENT_READ_TIMEOUT', '120')),
+    tcp_keepalive=True
+)
+relay_config = Config(
+    connect_timeout=2,
+    read_timeout=5,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+
 # Initialize Bedrock AgentCore client once (outside handler for efficiency)
-client = boto3.client('bedrock-agentcore')
+client = boto3.client('bedrock-agentcore', config=runtime_config)
 agent_arn = os.environ['AGENT_ARN']
 
+# Optional: relay streamed sentences to the browser over the WebSocket API so
+# speech can start before the agent has finished the whole reply.
+websocket_url = os.environ.get('WEBSOCKET_URL')
+connection_table_name = os.environ.get('CONNECTION_TABLE')
+
+# Optional clientId -> connections table (consistent reads, no GSI lag)
+client_connection_table_name = os.environ.get('CLIENT_CONNECTION_TABLE')
+
+# Optional per-client request table shared by all instances (see request_gate.py)
+request_table_name = os.environ.get('REQUEST_TABLE')
+
+dynamodb = (
+    boto3.resource('dynamodb', config=relay_config)
+    if (websocket_url and connection_table_name) or request_table_name else None
+)
+if websocket_url and connection_table_name:
+    apigateway_client = boto3.client('apigatewaymanagementapi', endpoint_url=websocket_url, config=relay_config)
+    connections_table = dynamodb.Table(connection_table_name)
+else:
+    apigateway_client = None
+    connections_table = None
+client_connections_table = (
+    dynamodb.Table(client_connection_table_name)
+    if apigateway_client is not None and client_connection_table_name else None
+)
+
+# Duplicate utterances, superseded queries and per-client bursts are handled
+# before the agent is invoked. Without REQUEST_TABLE the state is local to
+# this execution environment.
+request_gate = RequestGate(
+    DynamoDBRequestStore(dynamodb.Table(request_table_name)) if request_table_name else LocalRequestStore(),
+    coalesce_seconds=float(os.environ.get('REQUEST_COALESCE_SECONDS', '3')),
+    rate=float(os.environ.get('CLIENT_RATE_PER_SECOND', '1')),
+    burst=int(os.environ.get('CLIENT_BURST', '10')),
+    max_turn_seconds=runtime_config.read_timeout
+)
+request_gate_enabled = os.environ.get('REQUEST_GATE', '1') != '0'
+
+# Site keys the agent accepts (site_registry.SITE_KEY_PATTERN in the agent)
+SITE_KEY_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+
+# Sentence boundary: terminal punctuation followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'WebsiteGuidingAgent')
+
+
+class TurnTrace:
+    """
+    Spans and timings of one request, emitted as a single JSON line.
+
+    The trace ID is passed to the agent in the payload, so this record and the
+    agent's own turn trace correlate. The record includes a CloudWatch embedded
+    metric format block and is printed (not logged) so the line is pure JSON.
+    """
+
+    def __init__(self, trace_id, **attrs):
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def span(self, name, **attrs):
+        return _Span(self, name, attrs)
+
+    def finish(self, **attrs):
+        duration = round((time.perf_counter() - self.start) * 1000, 1)
+        metrics = {'RequestLatency': duration}
+        for span in self.spans:
+            metric = ''.join(part.capitalize() for part in span['name'].split('_')) + 'Latency'
+            metrics[metric] = round(metrics.get(metric, 0) + span['duration_ms'], 1)
+        print(json.dumps({
+            'trace': 'api_request',
+            'trace_id': self.trace_id,
+            **self.attrs,
+            **attrs,
+            'duration_ms': duration,
+            'spans': self.spans,
+            **metrics,
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [[]],
+                    'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in metrics]
+                }]
+            }
+        }, default=str))
+
+
+class _Span:
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.attrs['error'] = str(exc)
+        self.trace.spans.append({
+            'name': self.name,
+            'offset_ms': round((self.started - self.trace.start) * 1000, 1),
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 1),
+            **self.attrs
+        })
+        return False
+
+
+class ThinkingFilter:
+    """
+    Streaming-safe removal of <thinking>...</thinking> spans.
+
+    Chunks are fed in as they arrive. Text outside reasoning spans is returned
+    immediately; only a possible partial tag at the end of a chunk (at most
+    len('</thinking>') - 1 characters) is held back until the next chunk.
+    """
+    OPEN_TAG = '<thinking>'
+    CLOSE_TAG = '</thinking>'
+
+    def __init__(self):
+        self._inside = False
+        self._pending = ''
+
+    def feed(self, chunk):
+        text = self._pending + chunk
+        self._pending = ''
+        output = []
+        while text:
+            tag = self.CLOSE_TAG if self._inside else self.OPEN_TAG
+            index = text.find(tag)
+            if index >= 0:
+                if not self._inside:
+                    output.append(text[:index])
+                text = text[index + len(tag):]
+                self._inside = not self._inside
+                continue
+
+            # Hold back the longest suffix that could be the start of the tag
+            keep = 0
+            for size in range(min(len(tag) - 1, len(text)), 0, -1):
+                if text.endswith(tag[:size]):
+                    keep = size
+                    break
+            if not self._inside:
+                output.append(text[:len(text) - keep])
+            self._pending = text[len(text) - keep:]
+            break
+        return ''.join(output)
+
+    def flush(self):
+        rest = '' if self._inside else self._pending
+        self._pending = ''
+        return rest
+
+
+class SentenceBuffer:
+    """Accumulates streamed text and releases it one complete sentence at a time."""
+
+    def __init__(self):
+        self._buffer = ''
+
+    def feed(self, text):
+        self._buffer += text
+        parts = SENTENCE_END.split(self._buffer)
+        self._buffer = parts.pop()
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self):
+        rest = self._buffer.strip()
+        self._buffer = ''
+        return [rest] if rest else []
+
+
+def iter_stream_events(body):
+    """Parse the server-sent events returned by a streaming agent invocation."""
+    for line in body.iter_lines():
+        if not line:
+            continue
+        line = line.decode('utf-8')
+        if line.startswith('data: '):
+            yield json.loads(line[len('data: '):])
+
+
+def get_connection_id(client_id, trace):
+    if client_connections_table is not None:
+        with trace.span('dynamodb', op='query', consistent=True):
+            response = client_connections_table.query(
+                KeyConditionExpression=Key('clientId').eq(client_id),
+                ConsistentRead=True
+            )
+        now = time.time()
+        items = [i for i in response.get('Items', []) if int(i.get('expiresAt', now + 1)) > now]
+    else:
+        with trace.span('dynamodb', op='query'):
+            response = connections_table.query(
+                IndexName='clientId-index',
+                KeyConditionExpression=Key('clientId').eq(client_id)
+            )
+        items = response.get('Items', [])
+    # Speak in the most recently opened tab
+    items.sort(key=lambda i: i.get('connectedAt', ''), reverse=True)
+    return items[0]['connectionId'] if items else None
+
+
+def relay_stream(body, client_id, trace, is_current=None):
+    """
+    Relay a streamed agent reply to the client sentence by sentence.
+
+    Each complete sentence is posted to the client's WebSocket connection as
+    {"type": "speech", "seq": n, "text": sentence} as soon as it is available,
+    followed by {"type": "speech", "final": true}. Time to first sentence is
+    recorded on the trace. If is_current is given, it is checked before each
+    sentence; once it returns False (a newer query took over) no further
+    sentences are posted.
+
+    Returns:
+        tuple: (full cleaned reply text, whether speech frames were delivered)
+    """
+    connection_id = get_connection_id(client_id, trace)
+    thinking_filter = ThinkingFilter()
+    sentences = SentenceBuffer()
+    spoken = []
+    delivered = connection_id is not None
+    cut_short = False
+
+    def emit(sentence):
+        nonlocal delivered, cut_short
+        if delivered and is_current is not None and not is_current():
+            cut_short, delivered = bool(spoken), False
+        if delivered:
+            if not spoken:
+                trace.attrs['first_sentence_ms'] = round((time.perf_counter() - trace.start) * 1000, 1)
+            try:
+                with trace.span('post_to_connection', seq=len(spoken)):
+                    apigateway_client.post_to_connection(
+                        ConnectionId=connection_id,
+                        Data=json.dumps({'type': 'speech', 'seq': len(spoken), 'text': sentence}).encode('utf-8')
+                    )
+            except Exception as e:
+                logger.warning(f"Speech relay to {connection_id} failed: {e}")
+                delivered = False
+        spoken.append(sentence)
+
+    for event in iter_stream_events(body):
+        if 'error' in event:
+            raise RuntimeError(event['error'])
+        if 'text' in event:
+            for sentence in sentences.feed(thinking_filter.feed(event['text'])):
+                emit(sentence)
+
+    for sentence in sentences.feed(thinking_filter.flush()) + sentences.flush():
+        emit(sentence)
+
+    if delivered or cut_short:
+        # Also closes a reply cut short by a newer query
+        with trace.span('post_to_connection', final=True):
+            apigateway_client.post_to_connection(
+                ConnectionId=connection_id,
+                Data=json.dumps({'type': 'speech', 'final': True}).encode('utf-8')
+            )
+    return ' '.join(spoken), delivered
+
+
+def warm_up(client_id, site, session_id, trace):
+    """
+    Ask the agent runtime to initialize the client's site and session without
+    a model call (the agent's {"action": "ping"} path).
+
+    Returns:
+        dict: the agent's warm-up report
+    """
+    payload = json.dumps({'action': 'ping', 'client_id': client_id, 'site': site,
+                          'trace_id': trace.trace_id}).encode('utf-8')
+    with trace.span('invoke_agent_runtime', warmup=True):
+        response = client.invoke_agent_runtime(
+            agentRuntimeArn=agent_arn,
+            runtimeSessionId=session_id,
+            payload=payload
+        )
+        return json.loads(response['response'].read().decode('utf-8'))
+
+
+def admit_request(client_id, query, trace):
+    """
+    Run the request gate for a query; a failing gate store lets the request through.
+
+    Returns:
+        Admission | None
+    """
+    if not request_gate_enabled:
+        return None
+    try:
+        with trace.span('request_gate'):
+            admission = request_gate.admit(client_id, query)
+    except Exception as e:
+        logger.warning(f"Request gate unavailable: {e}")
+        return None
+    trace.attrs['gate'] = admission.decision
+    if admission.superseded:
+        trace.attrs['supersedes'] = True
+    return admission
+
+
+def finish_request(admission, trace):
+    """
+    Returns:
+        bool: False if a newer query of the client superseded this one
+    """
+    if admission is None:
+        return True
+    try:
+        with trace.span('request_gate', finish=True):
+            return request_gate.finish(admission)
+    except Exception as e:
+        logger.warning(f"Request gate unavailable: {e}")
+        return True
+
+
 def lambda_handler(event, context):
+    trace = TurnTrace(getattr(context, 'aws_request_id', None) or uuid.uuid4().hex)
     try:
         body = json.loads(event.get('body', '{}'))
         query = body.get('query')
         client_id = body.get('client_id', 'default-client')
         location = body.get('location', '')
+        # Website the widget is embedded in; the agent's default site when absent
+        site = body.get('site')
+        stream = bool(body.get('stream')) and apigateway_client is not None and client_id is not None
+
+        trace.attrs.update(client_id=client_id, site=site, stream=stream)
+
+        if site is not None and not (isinstance(site, str) and SITE_KEY_PATTERN.fullmatch(site)):
+            trace.finish(status=400)
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'content': 'Invalid site in request body'})
+            }
+
+        if body.get('warmup'):
+            # Sent by the frontend when its WebSocket opens, before the first query
+            session_id = f"{client_id}_session_id"
+            trace.attrs['session_id'] = session_id
+            report = warm_up(client_id, site, session_id, trace)
+            trace.finish(status=200, warmup=True)
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'warm': report.get('status') == 'warm'})
+            }
 
         if not query:
+            trace.finish(status=400)
             return {
                 'statusCode': 400,
                 'body': json.dumps({'content': 'Missing query in request body'})
@@ -28,39 +399,104 @@ def lambda_handler(event, context):
 
         # Generate a lightweight session ID
         session_id = f"{client_id}_session_id"
+        trace.attrs['session_id'] = session_id
+
+        admission = admit_request(client_id, query, trace)
+        if admission is not None and admission.decision == 'duplicate':
+            # The copy already in flight answers; this one must not be spoken
+            trace.finish(status=200)
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'content': '', 'coalesced': True})
+            }
+        if admission is not None and admission.decision == 'throttled':
+            trace.finish(status=429)
+            return {
+                'statusCode': 429,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Retry-After': str(max(1, round(admission.retry_after)))
+                },
+                'body': json.dumps({
+                    'content': "I'm getting a lot of requests right now. Please try again in a moment.",
+                    'throttled': True
+                })
+            }
 
         # Build prompt
         prompt = f"User's query: {query}. Location: {location}"
-        payload = json.dumps({'prompt': prompt, 'client_id': client_id}).encode('utf-8')
+        payload = json.dumps({
+            'prompt': prompt,
+            'query': query,
+            'location': location,
+            'client_id': client_id,
+            'site': site,
+            'stream': stream,
+            'trace_id': trace.trace_id
+        }).encode('utf-8')
 
-        # Invoke Bedrock AgentCore runtime
-        response = client.invoke_agent_runtime(
-            agentRuntimeArn=agent_arn,
-            runtimeSessionId=session_id,
-            payload=payload
-        )
-        
-        raw_result = response['response'].read().decode('utf-8').strip()
-        parsed = json.loads(raw_result)
+        try:
+            # Invoke Bedrock AgentCore runtime
+            with trace.span('invoke_agent_runtime'):
+                response = client.invoke_agent_runtime(
+                    agentRuntimeArn=agent_arn,
+                    runtimeSessionId=session_id,
+                    payload=payload
+                )
 
-        # Extract the text content
-        text_content = parsed.get("result", {}).get("content", [{}])[0].get("text", "")
+            if 'text/event-stream' in response.get('contentType', ''):
+                # Relay sentences to the browser as they are generated
+                is_current = (lambda: request_gate.is_current(admission)) if admission is not None else None
+                with trace.span('relay_stream'):
+                    clean_content, streamed = relay_stream(response['response'], client_id, trace, is_current)
+            else:
+                with trace.span('read_response'):
+                    raw_result = response['response'].read().decode('utf-8').strip()
+                with trace.span('parse_response'):
+                    parsed = json.loads(raw_result)
+
+                    # Extract the text content
+                    text_content = parsed.get("result", {}).get("content", [{}])[0].get("text", "")
+
+                    # Remove <thinking>...</thinking> parts and extra newlines
+                    clean_content = re.sub(r"<thinking>.*?</thinking>", "", text_content, flags=re.DOTALL).strip()
+                streamed = False
+        finally:
+            current = finish_request(admission, trace)
+
+        if not current:
+            # A newer query of this client took over; its reply is the one to speak
+            trace.finish(status=200, streamed=streamed, superseded=True)
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'content': '', 'superseded': True})
+            }
 
-        # Remove <thinking>...</thinking> parts and extra newlines
-        clean_content = re.sub(r"<thinking>.*?</thinking>", "", text_content, flags=re.DOTALL).strip()
+        trace.finish(status=200, streamed=streamed)
 
-        # Return only the final response in "content"
+        # Return only the final response in "content"; "streamed" tells the
+        # frontend the sentences were already delivered for speech
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'content': clean_content})
+            'body': json.dumps({'content': clean_content, 'streamed': streamed})
         }
 
     except Exception as e:
         logger.exception(f"Error: {e}")
+        trace.finish(status=500, error=str(e))
         return {
             'statusCode': 500,
             'body': json.dumps({'content': 'Internal server error'})
@@ -0,0 +1,186 @@
+import hashlib
+import re
+import threading
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+
+def query_key(query):
+    """Case, punctuation and whitespace-insensitive fingerprint of an utterance."""
+    text = ' '.join(re.sub(r"[^\w\s']", ' ', query.lower()).split())
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+class Admission:
+    """
+    Outcome of RequestGate.admit.
+
+    decision is 'run' (invoke the agent), 'duplicate' (an identical query of
+    this client is already in flight) or 'throttled' (token bucket empty;
+    retry_after seconds until the next token). superseded is True when a run
+    replaced a different query still in flight, whose reply is then dropped.
+    """
+
+    def __init__(self, decision, client_id, request_id=None, superseded=False, retry_after=0.0):
+        self.decision = decision
+        self.client_id = client_id
+        self.request_id = request_id
+        self.superseded = superseded
+        self.retry_after = retry_after
+
+
+class LocalRequestStore:
+    """
+    In-memory stand-in for DynamoDBRequestStore, for tests and single-process
+    use. State is per execution environment, so concurrent Lambda instances
+    do not see each other's requests.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, client_id):
+        with self._lock:
+            item = self._items.get(client_id)
+            return dict(item) if item else None
+
+    def put(self, item, expected_version):
+        with self._lock:
+            current = self._items.get(item['clientId'])
+            if (current or {}).get('version') != expected_version:
+                return False
+            self._items[item['clientId']] = dict(item)
+            return True
+
+
+class DynamoDBRequestStore:
+    """
+    Per-client gate state in a DynamoDB table (partition key clientId, TTL on
+    expiresAt), shared by every Lambda instance. Writes are compare-and-set
+    on a version attribute, so concurrent requests of one client serialize.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, client_id):
+        response = self.table.get_item(Key={'clientId': client_id}, ConsistentRead=True)
+        return response.get('Item')
+
+    def put(self, item, expected_version):
+        if expected_version is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(clientId)'}
+        else:
+            condition = {
+                'ConditionExpression': 'version = :version',
+                'ExpressionAttributeValues': {':version': expected_version}
+            }
+        try:
+            self.table.put_item(Item=item, **condition)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+
+class RequestGate:
+    """
+    Per-client in-flight tracking and admission control in front of the agent.
+
+    Each client has one record: its token bucket (capacity burst, refilled at
+    rate tokens per second) and its latest request. An identical query
+    arriving within coalesce_seconds of the latest one is a duplicate and
+    does not reach the agent. A different query takes over the
+    in-flight slot; the older request is superseded and its reply is not
+    delivered (is_current turns False). Every admitted request takes a token;
+    without one the request is throttled. A request older than
+    max_turn_seconds no longer counts as in flight.
+    """
+
+    def __init__(self, store, coalesce_seconds=3.0, rate=1.0, burst=10, max_turn_seconds=120.0, retries=5):
+        self.store = store
+        self.coalesce_seconds = coalesce_seconds
+        self.rate = rate
+        self.burst = burst
+        self.max_turn_seconds = max_turn_seconds
+        self.retries = retries
+        self._stats_lock = threading.Lock()
+        self.counts = {'run': 0, 'duplicate': 0, 'throttled': 0, 'superseded': 0}
+
+    def admit(self, client_id, query):
+        """
+        Returns:
+            Admission
+        """
+        key = query_key(query)
+        for _ in range(self.retries):
+            now = time.time()
+            item = self.store.get(client_id) or {'clientId': client_id}
+            version = item.get('version')
+            started = now - float(item.get('startedAt', 0))
+            in_flight = bool(item.get('requestId')) and started < self.max_turn_seconds
+            # Also after the first copy has finished: its reply was already delivered
+            if item.get('queryKey') == key and started <= self.coalesce_seconds:
+                return self._count(Admission('duplicate', client_id, item.get('requestId')))
+
+            elapsed = now - float(item.get('refilledAt', now))
+            tokens = min(float(self.burst), float(item.get('tokens', self.burst)) + elapsed * self.rate)
+            if tokens < 1:
+                return self._count(Admission('throttled', client_id, retry_after=(1 - tokens) / self.rate))
+
+            request_id = uuid.uuid4().hex
+            # Fractional values are stored as strings; boto3 rejects float attributes
+            updated = dict(item, requestId=request_id, queryKey=key, startedAt=str(now),
+                           tokens=str(tokens - 1), refilledAt=str(now), version=uuid.uuid4().hex,
+                           expiresAt=int(now + self.max_turn_seconds + self.burst / self.rate))
+            if self.store.put(updated, version):
+                return self._count(Admission('run', client_id, request_id, superseded=in_flight))
+        # Lost every race to other requests of this client: let it through untracked
+        return self._count(Admission('run', client_id))
+
+    def is_current(self, admission):
+        """False once a newer query of the client has taken over the in-flight slot."""
+        if admission.request_id is None:
+            return True
+        item = self.store.get(admission.client_id) or {}
+        return item.get('requestId') == admission.request_id
+
+    def finish(self, admission):
+        """
+        Clear the in-flight slot if it still belongs to this request.
+
+        Returns:
+            bool: False if the request was superseded while it ran
+        """
+        if admission.request_id is None:
+            return True
+        for _ in range(self.retries):
+            item = self.store.get(admission.client_id)
+            if item is None or item.get('requestId') != admission.request_id:
+                return False
+            # queryKey and startedAt stay, so late copies within the window still coalesce
+            updated = {k: v for k, v in item.items() if k != 'requestId'}
+            updated['version'] = uuid.uuid4().hex
+            if self.store.put(updated, item['version']):
+                return True
+        return True
+
+    def _count(self, admission):
+        with self._stats_lock:
+            self.counts[admission.decision] += 1
+            if admission.superseded:
+                self.counts['superseded'] += 1
+        return admission
+
+    def stats(self):
+        """
+        Returns:
+            dict: requests run, coalesced as duplicates, throttled, and runs
+                that superseded an older query
+        """
+        with self._stats_lock:
+            return dict(self.counts)
@@ -0,0 +1,70 @@
+"""
+Backfill the clientId -> connections table from WebSocketConnections.
+
+Run once after deploying the connect/disconnect Lambdas with
+CLIENT_CONNECTION_TABLE set (they dual-write from then on) and before
+pointing the agent at the new table. Safe to re-run: rows are keyed on
+(clientId, connectionId) so a second pass overwrites with the same data.
+
+    python migrate_connections.py --source webSocketConnections --target clientConnections --enable-ttl
+"""
+import argparse
+import time
+
+import boto3
+
+
+def enable_ttl(client, table_name):
+    """Turn on DynamoDB TTL for expiresAt (no-op if it is already enabled)."""
+    status = client.describe_time_to_live(TableName=table_name)['TimeToLiveDescription']
+    if status.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        return
+    client.update_time_to_live(
+        TableName=table_name,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expiresAt'}
+    )
+
+
+def migrate(source, target, ttl_seconds, dry_run=False):
+    """
+    Copy every connection row into the target table, adding expiresAt to
+    rows that predate it.
+
+    Returns:
+        dict: rows scanned and written
+    """
+    expires_at = int(time.time()) + ttl_seconds
+    scanned = written = 0
+    kwargs = {}
+    with target.batch_writer(overwrite_by_pkeys=['clientId', 'connectionId']) as batch:
+        while True:
+            page = source.scan(ConsistentRead=True, **kwargs)
+            for item in page['Items']:
+                scanned += 1
+                if 'clientId' not in item:
+                    continue
+                item.setdefault('expiresAt', expires_at)
+                if not dry_run:
+                    batch.put_item(Item=item)
+                written += 1
+            if 'LastEvaluatedKey' not in page:
+                break
+            kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+    return {'scanned': scanned, 'written': written}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default='webSocketConnections')
+    parser.add_argument('--target', default='clientConnections')
+    parser.add_argument('--ttl-seconds', type=int, default=3600)
+    parser.add_argument('--enable-ttl', action='store_true', help='Enable TTL on expiresAt for both tables')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb')
+    if args.enable_ttl and not args.dry_run:
+        for name in (args.source, args.target):
+            enable_ttl(dynamodb.meta.client, name)
+    result = migrate(dynamodb.Table(args.source), dynamodb.Table(args.target), args.ttl_seconds, args.dry_run)
+    print(f"Scanned {result['scanned']} rows, wrote {result['written']}{' (dry run)' if args.dry_run else ''}")
@@ -0,0 +1,80 @@
+import json
+import boto3
+from botocore.config import Config
+import os
+import time
+
+# Same DynamoDB client settings as webSocketConnect
+client_config = Config(
+    connect_timeout=2,
+    read_timeout=5,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+# The agent only waits AGENT_TOOL_ACK_TIMEOUT_MS for an ack, so a slow or
+# failed relay is not retried: a late ack is useless
+agent_config = Config(
+    connect_timeout=1,
+    read_timeout=3,
+    tcp_keepalive=True,
+    retries={'max_attempts': 1, 'mode': 'standard'}
+)
+dynamodb = boto3.resource('dynamodb', config=client_config)
+table = dynamodb.Table(os.environ['CONNECTION_TABLE'])
+agent_client = boto3.client('bedrock-agentcore', config=agent_config)
+agent_arn = os.environ['AGENT_ARN']
+
+def lambda_handler(event, context):
+    """
+    Handles the "ack" route - relays the browser's result for one UI command
+    to the agent runtime session that issued it
+
+    The browser sends {"action": "ack", "channel", "seq", "ok", "error",
+    "location"} after running each sequenced command. The clientId comes from
+    the connection row written on $connect, not from the message, so a
+    client can only acknowledge its own commands. The runtime session ID is
+    the one the invocation Lambda uses, so the ack reaches the container
+    holding the waiting tool.
+    """
+    connection_id = event['requestContext']['connectionId']
+    started = time.perf_counter()
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        item = table.get_item(Key={'connectionId': connection_id}).get('Item')
+        if not item:
+            print(json.dumps({'event': 'ack_unknown_connection', 'connection_id': connection_id}))
+            return {'statusCode': 410, 'body': json.dumps({'error': 'Unknown connection'})}
+        client_id = item['clientId']
+
+        payload = {
+            'action': 'ack',
+            'client_id': client_id,
+            'channel': body.get('channel'),
+            'seq': body.get('seq'),
+            'ok': bool(body.get('ok')),
+            'error': body.get('error'),
+            'location': body.get('location')
+        }
+        response = agent_client.invoke_agent_runtime(
+            agentRuntimeArn=agent_arn,
+            runtimeSessionId=f"{client_id}_session_id",
+            payload=json.dumps(payload).encode('utf-8')
+        )
+        result = json.loads(response['response'].read().decode('utf-8'))
+
+        print(json.dumps({'event': 'ack_relayed', 'client_id': client_id, 'channel': payload['channel'],
+                          'seq': payload['seq'], 'ok': payload['ok'], 'status': result.get('status'),
+                          'relay_ms': round((time.perf_counter() - started) * 1000, 1)}))
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps(result)
+        }
+
+    except Exception as e:
+        print(json.dumps({'event': 'ack_failed', 'connection_id': connection_id, 'error': str(e)}))
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'Failed to relay ack'})
+        }
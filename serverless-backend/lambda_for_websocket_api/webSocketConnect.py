@@ -1,15 +1,37 @@
 import json
 import boto3
+from botocore.config import Config
 import os
+import time
 from datetime import datetime
 
-dynamodb = boto3.resource('dynamodb')
+# Built once per execution environment during init. Connect and disconnect
+# each make one or two small DynamoDB writes: fail fast and reuse the
+# connection on warm invocations.
+client_config = Config(
+    connect_timeout=2,
+    read_timeout=5,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+dynamodb = boto3.resource('dynamodb', config=client_config)
 table = dynamodb.Table(os.environ['CONNECTION_TABLE'])
+# Optional clientId -> connections table (PK clientId, SK connectionId) for
+# strongly consistent lookups by clientId; see README "Key schema"
+client_table_name = os.environ.get('CLIENT_CONNECTION_TABLE')
+client_table = dynamodb.Table(client_table_name) if client_table_name else None
+# Rows expire through DynamoDB TTL on expiresAt unless refreshed by activity
+CONNECTION_TTL_SECONDS = int(os.environ.get('CONNECTION_TTL_SECONDS', '3600'))
 
 def lambda_handler(event, context):
     """
     Handles WebSocket connection - stores AWS-generated connectionId 
     mapped to client's custom client_id
+
+    Both directions are written: connectionId -> clientId (used by
+    $disconnect) and, when CLIENT_CONNECTION_TABLE is set, clientId ->
+    connectionId (used by the agent). The clientId row is written first so
+    a command sent right after connect always finds it.
     """
     # AWS automatically generates this connectionId
     connection_id = event['requestContext']['connectionId']
@@ -20,7 +42,8 @@ def lambda_handler(event, context):
     
     # Validate client_id is provided
     if not client_id:
-        print("Error: client_id is required")
+        print(json.dumps({'event': 'connect_rejected', 'connection_id': connection_id,
+                          'error': 'client_id is required'}))
         return {
             'statusCode': 400,
             'body': json.dumps({'error': 'client_id query parameter is required'})
@@ -31,12 +54,16 @@ def lambda_handler(event, context):
         item = {
             'connectionId': connection_id,  # Primary key (AWS-generated)
             'clientId': client_id,           # Your custom identifier
-            'connectedAt': datetime.utcnow().isoformat()
+            'connectedAt': datetime.utcnow().isoformat(),
+            'expiresAt': int(time.time()) + CONNECTION_TTL_SECONDS  # TTL attribute (epoch seconds)
         }
-        print(f"Storing item: {item}")
+        started = time.perf_counter()
+        if client_table is not None:
+            client_table.put_item(Item=item)
         table.put_item(Item=item)
         
-        print(f"Connection established: clientId={client_id}, connectionId={connection_id}")
+        print(json.dumps({'event': 'connected', 'client_id': client_id, 'connection_id': connection_id,
+                          'dynamodb_ms': round((time.perf_counter() - started) * 1000, 1)}))
         
         return {
             'statusCode': 200,
@@ -44,7 +71,8 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
-        print(f"Error storing connection: {str(e)}")
+        print(json.dumps({'event': 'connect_failed', 'client_id': client_id, 'connection_id': connection_id,
+                          'error': str(e)}))
         return {
             'statusCode': 500,
             'body': json.dumps({'error': 'Failed to establish connection'})
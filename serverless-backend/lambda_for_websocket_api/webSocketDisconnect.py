@@ -1,19 +1,34 @@
 import json
 import boto3
+from botocore.config import Config
 import os
+import time
 
-dynamodb = boto3.resource('dynamodb')
+# Same client settings as webSocketConnect: short timeouts, keep-alive
+client_config = Config(
+    connect_timeout=2,
+    read_timeout=5,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+dynamodb = boto3.resource('dynamodb', config=client_config)
 table = dynamodb.Table(os.environ['CONNECTION_TABLE'])
+client_table_name = os.environ.get('CLIENT_CONNECTION_TABLE')
+client_table = dynamodb.Table(client_table_name) if client_table_name else None
 
 def lambda_handler(event, context):
     """
     Handles WebSocket disconnection - removes connectionId from DynamoDB
+
+    The connectionId row returns the clientId, which keys the matching row
+    in CLIENT_CONNECTION_TABLE, so both directions are removed.
     """
     # Get the connectionId from the event
     connection_id = event['requestContext']['connectionId']
     
     try:
         # Delete the connection from DynamoDB
+        started = time.perf_counter()
         response = table.delete_item(
             Key={'connectionId': connection_id},
             ReturnValues='ALL_OLD'
@@ -22,8 +37,11 @@ def lambda_handler(event, context):
         # Log the disconnection
         deleted_item = response.get('Attributes', {})
         client_id = deleted_item.get('clientId', 'unknown')
+        if client_table is not None and 'clientId' in deleted_item:
+            client_table.delete_item(Key={'clientId': client_id, 'connectionId': connection_id})
         
-        print(f"Connection removed: clientId={client_id}, connectionId={connection_id}")
+        print(json.dumps({'event': 'disconnected', 'client_id': client_id, 'connection_id': connection_id,
+                          'dynamodb_ms': round((time.perf_counter() - started) * 1000, 1)}))
         
         return {
             'statusCode': 200,
@@ -31,7 +49,7 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
-        print(f"Error removing connection: {str(e)}")
+        print(json.dumps({'event': 'disconnect_failed', 'connection_id': connection_id, 'error': str(e)}))
         return {
             'statusCode': 500,
             'body': json.dumps({'error': 'Failed to disconnect'})
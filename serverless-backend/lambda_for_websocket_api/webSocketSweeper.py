@@ -0,0 +1,206 @@
+import json
+import boto3
+from botocore.config import Config
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Parallel scan segments (one worker thread each)
+SCAN_SEGMENTS = int(os.environ.get('SWEEP_SEGMENTS', '4'))
+# Rows per scan page; each page is probed and cleaned before the next is read
+SCAN_PAGE_SIZE = int(os.environ.get('SWEEP_PAGE_SIZE', '200'))
+# Concurrent GetConnection probes against the Management API
+PROBE_PARALLELISM = int(os.environ.get('SWEEP_PROBE_PARALLELISM', '16'))
+
+# botocore keeps 10 connections per client by default; size the pools to the
+# worker threads so probes and segment scans never queue for a connection.
+client_config = Config(
+    max_pool_connections=max(PROBE_PARALLELISM, SCAN_SEGMENTS),
+    connect_timeout=2,
+    read_timeout=5,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+dynamodb = boto3.resource('dynamodb', config=client_config)
+table = dynamodb.Table(os.environ['CONNECTION_TABLE'])
+client_table_name = os.environ.get('CLIENT_CONNECTION_TABLE')
+client_table = dynamodb.Table(client_table_name) if client_table_name else None
+apigateway_client = boto3.client('apigatewaymanagementapi', endpoint_url=os.environ['WEBSOCKET_URL'],
+                                 config=client_config)
+# Throughput budget: capacity units per second the sweep may consume
+READ_UNITS_PER_SECOND = float(os.environ.get('SWEEP_READ_UNITS_PER_SECOND', '100'))
+WRITE_UNITS_PER_SECOND = float(os.environ.get('SWEEP_WRITE_UNITS_PER_SECOND', '50'))
+# Stop scanning when the invocation has less time left than this
+TIME_RESERVE_SECONDS = float(os.environ.get('SWEEP_TIME_RESERVE_SECONDS', '10'))
+
+BATCH_WRITE_LIMIT = 25
+MAX_UNPROCESSED_RETRIES = 8
+
+
+class TokenBucket:
+    """Thread-safe rate limiter; acquire(n) blocks until n units are available."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Requests larger than the bucket go through once it is full
+                if self.tokens >= min(units, self.capacity):
+                    self.tokens -= units
+                    return
+                wait = (min(units, self.capacity) - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_gone(error):
+    response = getattr(error, 'response', {}) or {}
+    return (response.get('Error', {}).get('Code') == 'GoneException'
+            or response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 410)
+
+
+def probe(item, now):
+    """
+    Probe a connection with GetConnection. expiresAt is only a hint: it is
+    not refreshed on every path, and API Gateway keeps connections open for
+    up to two hours, so a row past it can still be live.
+
+    Returns:
+        bool: True if the connection is dead: gone at API Gateway, or expired
+            when the probe is inconclusive
+    """
+    try:
+        apigateway_client.get_connection(ConnectionId=item['connectionId'])
+        return False
+    except Exception as e:
+        if is_gone(e):
+            return True
+        # Unknown probe failure: keep an unexpired row, the next sweep will retry
+        return int(item.get('expiresAt', now + 1)) <= now
+
+
+def delete_rows(items, write_budget, stats):
+    """
+    Delete dead connections (both directions) with BatchWriteItem.
+
+    Unprocessed items are retried with exponential backoff and jitter; each
+    request is charged against the write budget before it is sent.
+    """
+    per_batch = BATCH_WRITE_LIMIT // 2 if client_table is not None else BATCH_WRITE_LIMIT
+    for start in range(0, len(items), per_batch):
+        batch = items[start:start + per_batch]
+        pending = {table.name: [{'DeleteRequest': {'Key': {'connectionId': i['connectionId']}}} for i in batch]}
+        if client_table is not None:
+            pending[client_table.name] = [
+                {'DeleteRequest': {'Key': {'clientId': i['clientId'], 'connectionId': i['connectionId']}}}
+                for i in batch if 'clientId' in i
+            ]
+        for attempt in range(MAX_UNPROCESSED_RETRIES + 1):
+            write_budget.acquire(sum(len(r) for r in pending.values()))
+            response = dynamodb.batch_write_item(RequestItems=pending)
+            pending = {name: r for name, r in (response.get('UnprocessedItems') or {}).items() if r}
+            if not pending:
+                break
+            stats.add('unprocessed_retries', sum(len(r) for r in pending.values()))
+            time.sleep(min(0.05 * 2 ** attempt, 2.0) * random.uniform(0.5, 1.0))
+        failed = len(pending.get(table.name, []))
+        stats.add('deleted', len(batch) - failed)
+        stats.add('delete_failures', failed)
+
+
+class SweepStats:
+    def __init__(self):
+        self.counts = {'scanned': 0, 'dead': 0, 'deleted': 0, 'unprocessed_retries': 0, 'delete_failures': 0}
+        self._lock = threading.Lock()
+
+    def add(self, name, value):
+        with self._lock:
+            self.counts[name] += value
+
+
+def sweep_segment(segment, total_segments, probe_pool, read_budget, write_budget, stats, deadline):
+    """
+    Scan one segment page by page; probe each page in parallel and delete
+    the dead rows before reading the next page.
+
+    Returns:
+        bool: True if the segment was scanned to the end
+    """
+    kwargs = {}
+    while True:
+        if time.monotonic() > deadline:
+            return False
+        page = table.scan(
+            Segment=segment,
+            TotalSegments=total_segments,
+            Limit=SCAN_PAGE_SIZE,
+            ProjectionExpression='connectionId, clientId, expiresAt',
+            ReturnConsumedCapacity='TOTAL',
+            **kwargs
+        )
+        read_budget.acquire(page.get('ConsumedCapacity', {}).get('CapacityUnits', 1))
+        items = page.get('Items', [])
+        stats.add('scanned', len(items))
+
+        now = time.time()
+        dead = [item for item, is_dead in zip(items, probe_pool.map(lambda i: probe(i, now), items)) if is_dead]
+        if dead:
+            stats.add('dead', len(dead))
+            delete_rows(dead, write_budget, stats)
+
+        if 'LastEvaluatedKey' not in page:
+            return True
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled sweep of connections that vanished without a clean $disconnect.
+
+    Scans the connections table in parallel segments, probes every
+    connection with the Management API (GetConnection) and deletes dead
+    ones, plus their clientId rows, with BatchWriteItem. Reads and writes
+    stay within the configured capacity budget. The sweep stops early, and
+    reports complete=false, when the invocation is close to its timeout.
+    """
+    event = event or {}
+    segments = int(event.get('segments', SCAN_SEGMENTS))
+    remaining = context.get_remaining_time_in_millis() / 1000 if context else 900
+    deadline = time.monotonic() + remaining - TIME_RESERVE_SECONDS
+
+    stats = SweepStats()
+    read_budget = TokenBucket(READ_UNITS_PER_SECOND)
+    write_budget = TokenBucket(WRITE_UNITS_PER_SECOND)
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=PROBE_PARALLELISM) as probe_pool, \
+                ThreadPoolExecutor(max_workers=segments) as segment_pool:
+            finished = list(segment_pool.map(
+                lambda s: sweep_segment(s, segments, probe_pool, read_budget, write_budget, stats, deadline),
+                range(segments)
+            ))
+    except Exception as e:
+        print(json.dumps({'event': 'sweep_failed', 'error': str(e), **stats.counts}))
+        return {'statusCode': 500, 'body': json.dumps({'error': 'Sweep failed', **stats.counts})}
+
+    elapsed = time.perf_counter() - started
+    report = {
+        **stats.counts,
+        'segments': segments,
+        'complete': all(finished),
+        'elapsed_s': round(elapsed, 3),
+        'scanned_per_second': round(stats.counts['scanned'] / elapsed, 1) if elapsed else 0.0,
+        'deleted_per_second': round(stats.counts['deleted'] / elapsed, 1) if elapsed else 0.0
+    }
+    print(json.dumps({'event': 'sweep_finished', **report}))
+    return {'statusCode': 200, 'body': json.dumps(report)}